@@ -0,0 +1,50 @@
+"""
+Time the analytics Report at increasing database sizes: grouped inside
+SQLite, accumulated from streamed entries, and the summary panel overview.
+
+    python benchmarks/bench_analytics.py --rows 100000 1000000 2000000
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from common import fill_database
+
+from hourtracker.analytics import Accumulator, database_report, overview
+from hourtracker.database import Repository
+
+
+def timed(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def accumulate(repo):
+    accumulator = Accumulator()
+    for entry in repo.iter_entries():
+        accumulator.add(entry)
+    return accumulator.report()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[100000, 1000000],
+                        help="database sizes to measure")
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'sql report':>12} {'accumulated':>12} {'overview':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in args.rows:
+            repo = Repository(Path(tmp) / f"hours-{rows}.db")
+            fill_database(repo, rows)
+            sql = timed(lambda: database_report(repo))
+            streamed = timed(lambda: accumulate(repo))
+            panel = timed(lambda: overview(repo))
+            print(f"{rows:>10} {sql:>11.2f}s {streamed:>11.2f}s {panel * 1000:>8.1f}ms")
+            repo.close()
+
+
+if __name__ == "__main__":
+    main()
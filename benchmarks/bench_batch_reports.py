@@ -0,0 +1,66 @@
+"""
+Time per-cadet Excel reports in workbooks per second: export_to_excel()
+for each cadet, the precompiled WorkbookTemplate in one process, and the
+template across a process pool.
+
+    python benchmarks/bench_batch_reports.py --cadets 300 --rows 60000 --workers 4
+"""
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from common import SRC_DIR  # noqa: F401 - puts src on sys.path
+from synthetic import build_database
+
+from hourtracker.batch_reports import WorkbookTemplate, cadet_names, generate_reports
+from hourtracker.database import EntryFilter
+from hourtracker.excel_exporter import export_to_excel
+
+
+def rate(count, func):
+    start = time.perf_counter()
+    func()
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--cadets", type=int, default=300, help="distinct names in the database")
+    parser.add_argument("--rows", type=int, default=60000, help="entries, spread evenly over the cadets")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="pool size for the last case")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "unit.db"
+        # One more name than asked for, as the first synthetic name is blank
+        repo = build_database(db_path, args.rows, names=args.cadets + 1)
+        names = cadet_names(repo)
+        output = str(Path(tmp) / "{case}" / "{{name}}.xlsx")
+
+        def openpyxl_each():
+            folder = Path(tmp) / "openpyxl"
+            folder.mkdir()
+            for name in names:
+                export_to_excel(folder / f"{name}.xlsx", repo.iter_entries(entry_filter=EntryFilter(name=name)))
+
+        template_start = time.perf_counter()
+        template = WorkbookTemplate()
+        template_ms = (time.perf_counter() - template_start) * 1000
+        cases = [
+            ("export_to_excel per cadet", openpyxl_each),
+            ("template, 1 process", lambda: generate_reports(
+                db_path, output.format(case="serial"), names, workers=1, template=template)),
+            (f"template, {args.workers} processes", lambda: generate_reports(
+                db_path, output.format(case="pool"), names, workers=args.workers, template=template)),
+        ]
+        print(f"{len(names)} cadets, {args.rows} entries; template built in {template_ms:.1f}ms")
+        print(f"{'case':<28} {'workbooks/s':>12}")
+        for label, func in cases:
+            print(f"{label:<28} {rate(len(names), func):>12.1f}")
+        repo.close()
+
+
+if __name__ == "__main__":
+    main()
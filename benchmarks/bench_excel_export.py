@@ -0,0 +1,68 @@
+"""
+Peak RSS and wall time of export_to_excel: the in-memory workbook fed from
+a fully fetched entry list versus the streaming write-only export fed from
+a database cursor.
+
+    python benchmarks/bench_excel_export.py --sizes 10000,100000,1000000
+
+Each measurement runs in a fresh subprocess so peak RSS isn't shared.
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from common import fill_database
+
+from hourtracker.database import Repository
+
+MODES = ("in-memory", "streaming")
+
+
+def run_child(db_file, mode, out_file):
+    from hourtracker.excel_exporter import export_to_excel
+
+    repo = Repository(db_file)
+    start = time.perf_counter()
+    if mode == "streaming":
+        export_to_excel(out_file, repo.iter_entries(), write_only=True)
+    else:
+        export_to_excel(out_file, repo.fetch_entries(), write_only=False)
+    elapsed = time.perf_counter() - start
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_mb = peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    print(json.dumps({"seconds": elapsed, "peak_rss_mb": peak_mb}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="comma-separated row counts")
+    parser.add_argument("--child", nargs=3, metavar=("DB", "MODE", "OUT"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(*args.child)
+        return
+
+    print(f"{'rows':>10} {'mode':>10} {'seconds':>10} {'peak RSS':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in (int(s) for s in args.sizes.split(",")):
+            db_file = Path(tmp) / f"hours-{size}.db"
+            repo = Repository(db_file)
+            fill_database(repo, size)
+            repo.close()
+            for mode in MODES:
+                out = subprocess.run(
+                    [sys.executable, __file__, "--child", str(db_file), mode, str(Path(tmp) / "out.xlsx")],
+                    check=True, capture_output=True, text=True)
+                result = json.loads(out.stdout.strip().splitlines()[-1])
+                print(f"{size:>10} {mode:>10} {result['seconds']:>10.2f} {result['peak_rss_mb']:>9.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
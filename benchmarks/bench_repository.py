@@ -0,0 +1,87 @@
+"""
+Per-operation latency of the database layer: the old connect-per-call
+functions versus the long-lived Repository.
+
+    python benchmarks/bench_repository.py --rows 20000
+"""
+import argparse
+import sqlite3
+import tempfile
+from pathlib import Path
+
+from common import fill_database, time_per_call
+
+from hourtracker.database import Repository
+
+
+class ConnectPerCall:
+    """The pre-Repository access pattern: open, execute, commit, close."""
+
+    def __init__(self, db_file):
+        self.db_file = db_file
+
+    def _run(self, sql, params=(), fetch=False):
+        conn = sqlite3.connect(self.db_file)
+        cursor = conn.execute(sql, params)
+        result = cursor.fetchall() if fetch else None
+        conn.commit()
+        conn.close()
+        return result
+
+    def add_entry(self):
+        self._run("INSERT INTO entries (date, name, type, hours, travel_time, recorded, notes) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                  ("2024-01-01", "", "Other", 1.0, 0.0, 0, None))
+
+    def toggle_recorded(self):
+        self._run("UPDATE entries SET recorded = 1 - recorded WHERE id = ?", (1,))
+
+    def get_summary(self):
+        self._run("SELECT type, SUM(hours), SUM(travel_time) FROM entries GROUP BY type", fetch=True)
+        self._run("SELECT SUM(hours), SUM(travel_time) FROM entries", fetch=True)
+
+
+class UsingRepository:
+    def __init__(self, repo):
+        self.repo = repo
+
+    def add_entry(self):
+        self.repo.add_entry("2024-01-01", "", "Other", 1.0, 0.0)
+
+    def toggle_recorded(self):
+        self.repo.connection().execute("UPDATE entries SET recorded = 1 - recorded WHERE id = ?", (1,))
+
+    def get_summary(self):
+        # Time the query, not a hit in the result cache
+        self.repo.results.clear()
+        self.repo.get_summary()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=20000, help="rows in the synthetic database")
+    parser.add_argument("--repeat", type=int, default=200, help="calls per operation")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_file = Path(tmp) / "hours.db"
+        repo = Repository(db_file)
+        fill_database(repo, args.rows)
+
+        # The legacy pattern runs against the same file, but in rollback
+        # journal mode as the old code did.
+        legacy_file = Path(tmp) / "legacy.db"
+        legacy_repo = Repository(legacy_file)
+        fill_database(legacy_repo, args.rows)
+        legacy_repo.connection().execute("PRAGMA journal_mode = DELETE")
+        legacy_repo.close()
+
+        candidates = [("connect-per-call", ConnectPerCall(legacy_file)), ("repository", UsingRepository(repo))]
+        print(f"{'operation':<18}" + "".join(f"{label:>20}" for label, _ in candidates))
+        for op in ("add_entry", "toggle_recorded", "get_summary"):
+            timings = [time_per_call(getattr(impl, op), args.repeat) for _, impl in candidates]
+            print(f"{op:<18}" + "".join(f"{t:>17.1f} us" for t in timings))
+        repo.close()
+
+
+if __name__ == "__main__":
+    main()
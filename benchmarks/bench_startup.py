@@ -0,0 +1,95 @@
+"""
+Cold-start time of the GUI: importing hourtracker.ui_main, running init_db,
+and constructing TimeTrackerUI up to its first paint event.
+
+    python benchmarks/bench_startup.py --runs 10 --rows 20000
+
+Every run is a fresh interpreter pointed at a synthetic database through
+HOME/LOCALAPPDATA, with Qt on the offscreen platform, so nothing is cached
+in-process between runs.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def run_child():
+    t0 = time.perf_counter()
+    from PySide6.QtCore import QEvent, QObject
+    from PySide6.QtWidgets import QApplication
+    from hourtracker import ui_main
+    from hourtracker.database import init_db
+    t_import = time.perf_counter()
+    loaded_openpyxl = "openpyxl" in sys.modules
+
+    init_db()
+    t_init = time.perf_counter()
+
+    app = QApplication([])
+    painted = []
+
+    class FirstPaint(QObject):
+        def eventFilter(self, obj, event):
+            if event.type() == QEvent.Paint and not painted:
+                painted.append(time.perf_counter())
+            return False
+
+    window = ui_main.TimeTrackerUI()
+    watcher = FirstPaint()
+    window.installEventFilter(watcher)
+    window.show()
+    while not painted:
+        app.processEvents()
+    print(json.dumps({
+        "import": t_import - t0,
+        "init_db": t_init - t_import,
+        "first_paint": painted[0] - t_init,
+        "total": painted[0] - t0,
+        "openpyxl_loaded": loaded_openpyxl,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--rows", type=int, default=20000, help="entries in the synthetic database")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child()
+        return
+
+    from common import SRC_DIR, fill_database
+    from hourtracker.database import Repository
+
+    with tempfile.TemporaryDirectory() as home:
+        env = dict(os.environ, HOME=home, LOCALAPPDATA=home, QT_QPA_PLATFORM="offscreen",
+                   PYTHONPATH=os.pathsep.join(filter(None, [str(SRC_DIR), os.environ.get("PYTHONPATH")])))
+        # Build the database where the child's get_db_file() will look
+        db_file = subprocess.run(
+            [sys.executable, "-c", "from hourtracker.database import get_db_file; print(get_db_file())"],
+            env=env, check=True, capture_output=True, text=True).stdout.strip()
+        repo = Repository(db_file)
+        fill_database(repo, args.rows)
+        repo.close()
+
+        results = []
+        for _ in range(args.runs):
+            out = subprocess.run([sys.executable, __file__, "--child"], env=env,
+                                 check=True, capture_output=True, text=True)
+            results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    for key in ("import", "init_db", "first_paint", "total"):
+        values = [r[key] * 1000 for r in results]
+        print(f"{key:<12} median {statistics.median(values):8.1f} ms   min {min(values):8.1f} ms")
+    print(f"openpyxl loaded at startup: {any(r['openpyxl_loaded'] for r in results)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,334 @@
+"""
+Benchmark suite: time the database layer, headless table population, CSV
+import/export and Excel export at several data sizes, and save the results
+as JSON so runs can be compared.
+
+    python benchmarks/bench_suite.py --sizes 1000,10000,100000 --out after.json --baseline before.json
+
+Every size gets a fresh synthetic database from synthetic.py, so two runs
+with the same --sizes and --seed measure identical data. With --baseline,
+any case slower than the baseline by more than --threshold is flagged and
+the script exits with status 1. Cases whose dependencies (PySide6,
+openpyxl) are missing are recorded as skipped.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from common import SRC_DIR  # noqa: F401 - puts src on sys.path
+from synthetic import build_database
+
+from hourtracker.database import Repository
+
+# The table cases build Qt widgets without a display
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+# Timed calls per case for the cheap per-operation cases
+OPERATION_REPEAT = 200
+# Rows re-inserted by the bulk database cases
+BULK_ROWS = 1000
+
+
+class Skipped(Exception):
+    """Raised by a case whose optional dependency isn't installed."""
+
+
+def timed(func, runs):
+    """Run func() runs times and return the wall time of each run in seconds."""
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def per_call(func, repeat=OPERATION_REPEAT):
+    """A case body that calls func() repeat times; timings are divided by repeat."""
+    def run():
+        for _ in range(repeat):
+            func()
+    run.repeat = repeat
+    return run
+
+
+class Bench:
+    """The database, scratch directory and sample rows shared by the cases at one size."""
+
+    def __init__(self, tmp, rows, seed):
+        self.tmp = Path(tmp)
+        self.rows = rows
+        self.db_file = self.tmp / f"hours-{rows}.db"
+        self.repo = build_database(self.db_file, rows, seed)
+        self.some_id = self.repo.connection().execute("SELECT MIN(id) FROM entries").fetchone()[0]
+        self.sample = self.repo.fetch_entries_page(limit=BULK_ROWS)
+        self.csv_file = self.tmp / f"entries-{rows}.csv"
+
+    def close(self):
+        self.repo.close()
+
+
+# --- database
+
+def case_fetch_entries(bench):
+    return bench.repo.fetch_entries
+
+
+def case_iter_entries(bench):
+    return lambda: sum(1 for _ in bench.repo.iter_entries())
+
+
+def case_first_page(bench):
+    return per_call(bench.repo.fetch_entries_page)
+
+
+def case_get_summary(bench):
+    # Dropping the result cache first keeps this timing the query itself,
+    # comparable with baselines from before the cache
+    def uncached():
+        bench.repo.results.clear()
+        bench.repo.get_summary()
+    return per_call(uncached)
+
+
+def case_get_summary_cached(bench):
+    bench.repo.get_summary()
+    return per_call(bench.repo.get_summary)
+
+
+def case_count_entries(bench):
+    return per_call(bench.repo.count_entries)
+
+
+def case_add_entry(bench):
+    # Each add is undone so the database doesn't grow between runs
+    def add_and_delete():
+        bench.repo.delete_entry(bench.repo.add_entry("2024-01-01", "", "Other", 1.0, 0.0))
+    return per_call(add_and_delete)
+
+
+def case_update_entry(bench):
+    _, date, name, type_, hours, travel, recorded, notes = bench.repo.fetch_entry(bench.some_id)
+    return per_call(lambda: bench.repo.update_entry(bench.some_id, date, name, type_, hours, travel, recorded, notes))
+
+
+def case_set_recorded(bench):
+    recorded = bench.repo.fetch_entry(bench.some_id)[6]
+    return per_call(lambda: bench.repo.set_recorded(bench.some_id, recorded))
+
+
+def case_bulk_delete_restore(bench):
+    ids = [entry[0] for entry in bench.sample]
+
+    def run():
+        bench.repo.delete_entries(ids)
+        bench.repo.restore_entries(bench.sample)
+    return run
+
+
+def case_init_db(bench):
+    return per_call(bench.repo.init_db)
+
+
+# --- table
+
+def _qt():
+    try:
+        from PySide6.QtWidgets import QApplication, QTableView
+    except ImportError:
+        raise Skipped("PySide6 is not installed")
+    app = QApplication.instance() or QApplication([])
+    return app, QTableView
+
+
+def case_table_first_page(bench):
+    app, QTableView = _qt()
+    from hourtracker.entry_model import EntryTableModel
+    model = EntryTableModel(bench.repo.fetch_entries_page)
+    view = QTableView()
+    view.setModel(model)
+
+    def run():
+        model.reload()
+        app.processEvents()
+    return run
+
+
+def case_table_scroll_all(bench):
+    app, QTableView = _qt()
+    from hourtracker.entry_model import EntryTableModel
+    model = EntryTableModel(bench.repo.fetch_entries_page)
+    view = QTableView()
+    view.setModel(model)
+
+    def run():
+        model.reload()
+        while model.canFetchMore():
+            model.fetchMore()
+        app.processEvents()
+    return run
+
+
+def case_table_set_entries(bench):
+    app, QTableView = _qt()
+    from hourtracker.entry_model import EntryTableModel
+    model = EntryTableModel()
+    view = QTableView()
+    view.setModel(model)
+
+    def run():
+        model.set_entries(bench.repo.fetch_entries())
+        app.processEvents()
+    return run
+
+
+# --- CSV
+
+def case_csv_export(bench):
+    from hourtracker.csv_exporter import export_to_csv
+    return lambda: export_to_csv(bench.csv_file, bench.repo.iter_entries())
+
+
+def case_csv_import(bench):
+    from hourtracker.csv_exporter import export_to_csv
+    from hourtracker.importer import import_csv
+    if not bench.csv_file.exists():
+        export_to_csv(bench.csv_file, bench.repo.iter_entries())
+    target = Repository(bench.tmp / f"import-{bench.rows}.db")
+    target.init_db()
+
+    def run():
+        target.reset_all_entries()
+        import_csv(bench.csv_file, target)
+    run.close = target.close
+    return run
+
+
+# --- Excel
+
+def case_excel_export(bench):
+    try:
+        from hourtracker.excel_exporter import export_to_excel
+    except ImportError:
+        raise Skipped("openpyxl is not installed")
+    return lambda: export_to_excel(bench.tmp / "out.xlsx", bench.repo.iter_entries())
+
+
+CASES = {
+    "db.fetch_entries": case_fetch_entries,
+    "db.iter_entries": case_iter_entries,
+    "db.fetch_entries_page": case_first_page,
+    "db.get_summary": case_get_summary,
+    "db.get_summary_cached": case_get_summary_cached,
+    "db.count_entries": case_count_entries,
+    "db.add_entry": case_add_entry,
+    "db.update_entry": case_update_entry,
+    "db.set_recorded": case_set_recorded,
+    "db.delete_restore_1000": case_bulk_delete_restore,
+    "db.init_db": case_init_db,
+    "table.first_page": case_table_first_page,
+    "table.scroll_all": case_table_scroll_all,
+    "table.set_entries": case_table_set_entries,
+    "csv.export": case_csv_export,
+    "csv.import": case_csv_import,
+    "excel.export": case_excel_export,
+}
+
+
+def run_case(make, bench, runs):
+    """Time one case; returns its result dict."""
+    try:
+        body = make(bench)
+    except Skipped as e:
+        return {"skipped": str(e)}
+    try:
+        body()  # warm-up, not counted
+        repeat = getattr(body, "repeat", 1)
+        times = [t / repeat for t in timed(body, runs)]
+    finally:
+        getattr(body, "close", lambda: None)()
+    return {"median": statistics.median(times), "min": min(times), "runs": runs, "calls": repeat}
+
+
+def compare(results, baseline, threshold):
+    """Return (key, old, new, ratio) for every case slower than baseline by more than threshold."""
+    regressions = []
+    for key, new in results.items():
+        old = baseline.get(key)
+        if not old or "median" not in old or "median" not in new or old["median"] <= 0:
+            continue
+        ratio = new["median"] / old["median"]
+        if ratio > 1 + threshold:
+            regressions.append((key, old["median"], new["median"], ratio))
+    return regressions
+
+
+def format_seconds(seconds):
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:8.1f} us"
+    if seconds < 1:
+        return f"{seconds * 1e3:8.1f} ms"
+    return f"{seconds:8.2f} s "
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="1000,10000,100000", help="comma-separated row counts")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--runs", type=int, default=5, help="timed runs per case")
+    parser.add_argument("--only", action="append", metavar="PREFIX",
+                        help="run only cases starting with PREFIX, e.g. db or csv.import (repeatable)")
+    parser.add_argument("--out", type=Path, help="write results to this JSON file")
+    parser.add_argument("--baseline", type=Path, help="JSON results of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="fractional slowdown against the baseline that counts as a regression")
+    args = parser.parse_args()
+
+    names = [name for name in CASES if not args.only or any(name.startswith(p) for p in args.only)]
+    if not names:
+        parser.error("--only matched no cases")
+    sizes = [int(s) for s in args.sizes.split(",")]
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            bench = Bench(tmp, size, args.seed)
+            try:
+                for name in names:
+                    key = f"{name}@{size}"
+                    results[key] = result = run_case(CASES[name], bench, args.runs)
+                    shown = result.get("skipped") or format_seconds(result["median"])
+                    print(f"{key:<32} {shown}", flush=True)
+            finally:
+                bench.close()
+
+    if args.out:
+        args.out.write_text(json.dumps({
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "sizes": sizes,
+            "seed": args.seed,
+            "results": results,
+        }, indent=2) + "\n")
+        print(f"results written to {args.out}")
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())["results"]
+        regressions = compare(results, baseline, args.threshold)
+        for key, old, new, ratio in regressions:
+            print(f"REGRESSION {key:<32} {format_seconds(old)} -> {format_seconds(new)} ({ratio:.2f}x)")
+        if regressions:
+            sys.exit(1)
+        print(f"no regressions beyond {args.threshold:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
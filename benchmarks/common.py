@@ -0,0 +1,35 @@
+"""Shared helpers for the benchmark scripts in this directory."""
+import sys
+import time
+from datetime import date
+from pathlib import Path
+
+# Benchmarks run from a source checkout, so make the package importable
+SRC_DIR = Path(__file__).resolve().parent.parent / "src"
+if str(SRC_DIR) not in sys.path:
+    sys.path.insert(0, str(SRC_DIR))
+
+from synthetic import NAMES, TYPES, generate_rows  # noqa: E402
+
+
+def make_rows(count, seed=0, start=date(2018, 1, 1), days=365 * 6):
+    """Yield deterministic (date, name, type, hours, travel, recorded, notes) rows."""
+    return generate_rows(count, seed, TYPES, NAMES, start, days)
+
+
+def fill_database(repo, count, seed=0):
+    """Create the schema in repo and insert count synthetic rows."""
+    repo.init_db()
+    with repo.transaction() as conn:
+        conn.executemany(
+            "INSERT INTO entries (date, name, type, hours, travel_time, recorded, notes) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            make_rows(count, seed),
+        )
+
+
+def time_per_call(func, repeat):
+    """Return the mean wall time of func() in microseconds over repeat calls."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1e6
@@ -0,0 +1,77 @@
+"""
+Deterministic synthetic hours.db generator for the benchmarks.
+
+    python benchmarks/synthetic.py out.db --rows 100000 --types 8 --names 20 --days 1095
+
+The same arguments and seed always give the same rows, so timings from
+different runs and machines are measured against identical data.
+"""
+import argparse
+import random
+from datetime import date, timedelta
+from pathlib import Path
+
+TYPES = ["Event Cover", "Community Outreach", "Unit Running", "Other", "First Aid Training"]
+NAMES = ["", "Alex", "Sam", "Jordan", "Riley", "Casey"]
+START = date(2018, 1, 1)
+DAYS = 365 * 6
+NOTE_RATE = 0.2
+RECORDED_RATE = 0.6
+
+
+def pick(pool, count, prefix):
+    """The first count items of pool, extended with numbered names if it is too short."""
+    return list(pool[:count]) + [f"{prefix} {i}" for i in range(len(pool) + 1, count + 1)]
+
+
+def generate_rows(count, seed=0, types=TYPES, names=NAMES, start=START, days=DAYS):
+    """Yield count deterministic (date, name, type, hours, travel, recorded, notes) rows."""
+    rng = random.Random(seed)
+    for i in range(count):
+        day = start + timedelta(days=rng.randrange(days))
+        yield (
+            day.isoformat(),
+            rng.choice(names),
+            rng.choice(types),
+            round(rng.uniform(0.5, 8), 2),
+            round(rng.choice([0, 0, 0.5, 1, 1.5]), 2),
+            int(rng.random() < RECORDED_RATE),
+            f"note {i}" if rng.random() < NOTE_RATE else None,
+        )
+
+
+def build_database(path, rows, seed=0, types=len(TYPES), names=len(NAMES), start=START, days=DAYS):
+    """Create (or extend) the database at path with synthetic rows and return its Repository."""
+    from hourtracker.database import Repository
+
+    repo = Repository(path)
+    repo.init_db()
+    with repo.transaction() as conn:
+        conn.executemany(
+            "INSERT INTO entries (date, name, type, hours, travel_time, recorded, notes) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            generate_rows(rows, seed, pick(TYPES, types, "Type"), pick(NAMES, names, "Person"), start, days))
+    return repo
+
+
+def main():
+    import common  # noqa: F401 - puts src on sys.path
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("path", type=Path, help="database file to create")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--types", type=int, default=len(TYPES), help="distinct entry types")
+    parser.add_argument("--names", type=int, default=len(NAMES), help="distinct names (the first is blank)")
+    parser.add_argument("--start", type=date.fromisoformat, default=START, help="first possible date")
+    parser.add_argument("--days", type=int, default=DAYS, help="span of dates, in days")
+    args = parser.parse_args()
+
+    if args.path.exists():
+        parser.error(f"{args.path} already exists")
+    repo = build_database(args.path, args.rows, args.seed, args.types, args.names, args.start, args.days)
+    print(f"{args.path}: {repo.count_entries()} entries")
+    repo.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,9 @@
-from .main import main
+import sys
 
-if __name__ == "__main__":
-    main()
\ No newline at end of file
+if len(sys.argv) > 1 and not sys.argv[1].startswith("--profile"):
+    # Any other arguments select the headless command line interface
+    from .cli import main as cli_main
+    sys.exit(cli_main())
+else:
+    from .main import main
+    main()
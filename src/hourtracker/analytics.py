@@ -0,0 +1,240 @@
+# analytics.py
+"""
+Hour statistics shared by the Excel Summary sheet and the summary panel.
+
+Totals are grouped by month, week, type, name and recorded status into a
+Report. A Report can be computed inside SQLite with database_report(),
+which reads only pre-grouped rows, or built by an Accumulator that is fed
+entries one at a time while they are being streamed somewhere else, as the
+Excel export does. Either way the rolling averages, year-to-date and
+year-over-year figures are derived from the grouped rows, never by walking
+the entries again.
+
+The functions taking a repo cache their results in repo.results until the
+entries change, so the Reports, Buckets and Overviews they return are
+shared and must not be modified.
+"""
+from datetime import date, timedelta
+from typing import NamedTuple
+
+# One scan grouped finely enough to fold into every dimension; the row count
+# depends on days x types x names, not on the number of entries.
+SQL_GROUPED = """
+    SELECT date, COALESCE(name, ''), type, recorded != 0,
+           SUM(hours), SUM(COALESCE(travel_time, 0)), COUNT(*)
+    FROM entries GROUP BY 1, 2, 3, 4
+"""
+SQL_MONTH = """
+    SELECT COALESCE(SUM(hours), 0), COALESCE(SUM(travel_time), 0), COUNT(*)
+    FROM entries WHERE substr(date, 1, 7) = ?
+"""
+SQL_TYPES = """
+    SELECT type, SUM(hours), SUM(travel), SUM(entries)
+    FROM summary_totals GROUP BY type ORDER BY type
+"""
+# An index-only range scan over idx_entries_day; see database.DAY_SCHEMA
+SQL_DAY_RANGE = """
+    SELECT COALESCE(SUM(hours), 0), COALESCE(SUM(travel_time), 0), COUNT(*)
+    FROM entries WHERE day >= ? AND day < ?
+"""
+
+
+class Bucket(NamedTuple):
+    key: object
+    hours: float
+    travel: float
+    entries: int
+
+    @property
+    def total(self):
+        return self.hours + self.travel
+
+
+class Overview(NamedTuple):
+    """Figures for the on-screen summary panel."""
+    summary: list  # (type, hours, travel)
+    totals: tuple  # (hours, travel)
+    recorded_totals: dict  # True/False -> (hours, travel)
+    year: Bucket  # year to date
+    month: Bucket  # month to date
+
+
+def _shift_month(month, delta):
+    year, number = divmod(int(month[:4]) * 12 + int(month[5:7]) - 1 + delta, 12)
+    return f"{year:04d}-{number + 1:02d}"
+
+
+def _is_month(key):
+    return isinstance(key, str) and len(key) == 7 and key[4] == "-" and key[:4].isdigit() and key[5:].isdigit()
+
+
+def _buckets(groups):
+    # groups maps key -> [hours, travel, entries]; None keys (bad dates) sort first
+    keys = sorted(groups, key=lambda k: (k is not None, "" if k is None else k))
+    return [Bucket(key, *groups[key]) for key in keys]
+
+
+class Report:
+    """Grouped totals: each attribute is a list of Buckets sorted by key."""
+
+    def __init__(self, months, weeks, types, names, recorded):
+        self.months = months
+        self.weeks = weeks
+        self.types = types
+        self.names = names
+        self.recorded = recorded  # keyed by True/False
+
+    def ytd(self, year=None):
+        """Bucket totalling the months of year (default: the current year)."""
+        year = date.today().year if year is None else year
+        prefix = f"{year}-"
+        hours = travel = 0.0
+        entries = 0
+        for bucket in self.months:
+            if bucket.key.startswith(prefix):
+                hours += bucket.hours
+                travel += bucket.travel
+                entries += bucket.entries
+        return Bucket(year, hours, travel, entries)
+
+    def rolling_average(self, window=3):
+        """
+        Return (month, average) for every month, where average is the mean
+        monthly total (hours plus travel) over that month and the window - 1
+        calendar months before it. Months with no entries count as zero;
+        months that aren't YYYY-MM get None.
+        """
+        totals = {bucket.key: bucket.total for bucket in self.months}
+        averages = []
+        for bucket in self.months:
+            if not _is_month(bucket.key):
+                averages.append((bucket.key, None))
+                continue
+            window_total = sum(totals.get(_shift_month(bucket.key, -k), 0.0) for k in range(window))
+            averages.append((bucket.key, window_total / window))
+        return averages
+
+    def year_over_year(self, year=None):
+        """
+        Return (month number, this year's total, last year's total, change)
+        for the twelve months of year, where change is the fractional
+        difference or None when last year's month was empty.
+        """
+        year = date.today().year if year is None else year
+        totals = {bucket.key: bucket.total for bucket in self.months}
+        rows = []
+        for number in range(1, 13):
+            current = totals.get(f"{year}-{number:02d}", 0.0)
+            previous = totals.get(f"{year - 1}-{number:02d}", 0.0)
+            change = (current - previous) / previous if previous else None
+            rows.append((number, current, previous, change))
+        return rows
+
+
+class Accumulator:
+    """
+    Builds a Report from (id, date, name, type, hours, travel, recorded,
+    notes) entries fed to add(), for callers that already iterate entries.
+    Weeks start on Monday and are keyed by that Monday's date.
+    """
+
+    def __init__(self):
+        self._groups = {name: {} for name in ("months", "weeks", "types", "names", "recorded")}
+        self._week_of = {}  # date text -> week key, since dates repeat heavily
+
+    @staticmethod
+    def _add(groups, key, hours, travel, count):
+        totals = groups.get(key)
+        if totals is None:
+            groups[key] = [hours, travel, count]
+        else:
+            totals[0] += hours
+            totals[1] += travel
+            totals[2] += count
+
+    def _week(self, date_text):
+        week = self._week_of.get(date_text, False)
+        if week is False:
+            try:
+                day = date.fromisoformat(date_text)
+                week = (day - timedelta(days=day.weekday())).isoformat()
+            except (TypeError, ValueError):
+                week = None
+            self._week_of[date_text] = week
+        return week
+
+    def add(self, entry):
+        _, date_text, name, type_, hours, travel, recorded = entry[:7]
+        self.add_group(date_text, name, type_, recorded, hours, travel, 1)
+
+    def add_group(self, date_text, name, type_, recorded, hours, travel, count):
+        """Add the totals of count entries that share a date, name, type and recorded flag."""
+        hours = hours or 0.0
+        travel = travel or 0.0
+        groups = self._groups
+        self._add(groups["months"], (date_text or "")[:7], hours, travel, count)
+        self._add(groups["weeks"], self._week(date_text), hours, travel, count)
+        self._add(groups["types"], type_, hours, travel, count)
+        self._add(groups["names"], name or "", hours, travel, count)
+        self._add(groups["recorded"], bool(recorded), hours, travel, count)
+
+    def report(self):
+        return Report(**{name: _buckets(groups) for name, groups in self._groups.items()})
+
+
+def database_report(repo):
+    """Compute a Report from one GROUP BY scan, without loading any entries."""
+    return repo.results.get("report", lambda: _database_report(repo))
+
+
+def _database_report(repo):
+    accumulator = Accumulator()
+    for row in repo.connection().execute(SQL_GROUPED):
+        accumulator.add_group(*row)
+    return accumulator.report()
+
+
+def _date_range_bucket(conn, key, start, end):
+    return Bucket(key, *conn.execute(SQL_DAY_RANGE, (start.toordinal(), end.toordinal())).fetchone())
+
+
+def month_buckets(repo, months):
+    """
+    Buckets for just the given month keys, leaving out months with no
+    entries. Real YYYY-MM months are range scans over the day index.
+    """
+    buckets = [repo.results.get(("month", key), lambda: _month_bucket(repo.connection(), key))
+               for key in sorted(months)]
+    return [bucket for bucket in buckets if bucket.entries]
+
+
+def _month_bucket(conn, key):
+    if _is_month(key):
+        start = date(int(key[:4]), int(key[5:7]), 1)
+        end = date.fromisoformat(_shift_month(key, 1) + "-01")
+        return _date_range_bucket(conn, key, start, end)
+    return Bucket(key, *conn.execute(SQL_MONTH, (key,)).fetchone())
+
+
+def type_buckets(repo):
+    """Per-type Buckets read from summary_totals rather than the entries."""
+    return repo.results.get("types", lambda: [Bucket(*row) for row in repo.connection().execute(SQL_TYPES)])
+
+
+def overview(repo, today=None):
+    """
+    Return the summary panel's Overview. The all-time figures come from
+    the summary_totals table; year and month to date are range scans over
+    the day index.
+    """
+    today = today or date.today()
+    return repo.results.get(("overview", today), lambda: _overview(repo, today))
+
+
+def _overview(repo, today):
+    summary, totals, recorded_totals = repo.get_summary()
+    conn = repo.connection()
+    tomorrow = today + timedelta(days=1)
+    year = _date_range_bucket(conn, today.year, today.replace(month=1, day=1), tomorrow)
+    month = _date_range_bucket(conn, today.strftime("%Y-%m"), today.replace(day=1), tomorrow)
+    return Overview(summary, totals, recorded_totals, year, month)
@@ -0,0 +1,235 @@
+# batch_reports.py
+"""
+One Excel workbook per cadet from a unit database, for handing out
+individual hour reports.
+
+    python -m hourtracker --db unit.db report-batch "reports/{name}.xlsx"
+
+The workbooks have the same Hours and Summary sheets and charts as
+export_to_excel(), but openpyxl only runs once: a WorkbookTemplate renders
+a sample workbook and keeps its package parts (styles, theme, drawings,
+chart definitions, sheet layout) as bytes. Each cadet's workbook is then
+those parts plus two sheets of rows serialised directly, with the chart
+ranges filled in. Cadets are spread over a process pool; the template is
+built in the parent and handed to every worker.
+"""
+import io
+import re
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import NamedTuple
+from xml.sax.saxutils import escape
+
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+from openpyxl.compat import safe_string
+from openpyxl.utils.exceptions import IllegalCharacterError
+
+from .analytics import Accumulator
+from .database import EntryFilter, Repository
+from .excel_exporter import export_to_excel, hours_row, sheet_part, summary_layout
+from .instrumentation import instrumented
+
+# Cadets handed to a worker process at a time
+CHUNK_SIZE = 4
+# Hours rows joined into one write to the zip stream
+ROWS_PER_WRITE = 1000
+COLUMN_LETTERS = "ABCDEFGHIJ"
+# Two months and two types, so every chart range in the template spans rows
+SAMPLE_ENTRIES = [
+    (1, "2000-01-01", "", "Sample", 1.0, 0.0, False, None),
+    (2, "2000-02-01", "", "Other", 1.0, 0.0, False, None),
+]
+
+_FORMULA = re.compile(rb"<f>[^<]*</f>")
+_STYLE = re.compile(rb' s="([0-9]+)"')
+
+
+def _cell_xml(ref, value, style):
+    if isinstance(value, bool):
+        return f'<c r="{ref}"{style} t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float)):
+        return f'<c r="{ref}"{style} t="n"><v>{safe_string(value)}</v></c>'
+    text = str(value)
+    if ILLEGAL_CHARACTERS_RE.search(text):
+        raise IllegalCharacterError(f"{text!r} cannot be used in worksheets.")
+    space = ' xml:space="preserve"' if text != text.strip() else ""
+    return f'<c r="{ref}"{style} t="inlineStr"><is><t{space}>{escape(text)}</t></is></c>'
+
+
+def _row_xml(number, values, style=""):
+    """One <row> as written by openpyxl's write-only mode; None cells are left out."""
+    cells = "".join(_cell_xml(f"{column}{number}", value, style)
+                    for column, value in zip(COLUMN_LETTERS, values) if value is not None)
+    return f'<row r="{number}">{cells}</row>'
+
+
+def _column_range(column, first, last):
+    """A chart reference to rows first..last of column, a single cell when they're the same like openpyxl's."""
+    if first == last:
+        return f"'Summary'!${column}${first}"
+    return f"'Summary'!${column}${first}:${column}${last}"
+
+
+class WorkbookTemplate:
+    """
+    The data-independent parts of an export_to_excel() workbook, rendered
+    once. Plain data (bytes and strings), so it pickles cheaply to worker
+    processes.
+    """
+
+    def __init__(self):
+        buffer = io.BytesIO()
+        export_to_excel(buffer, SAMPLE_ENTRIES)
+        accumulator = Accumulator()
+        for entry in SAMPLE_ENTRIES:
+            accumulator.add(entry)
+        sample_layout = summary_layout(accumulator.report())
+
+        with zipfile.ZipFile(buffer) as archive:
+            self.parts = [(info.filename, archive.read(info.filename)) for info in archive.infolist()]
+            self.hours_part = sheet_part(archive, "Hours")
+            self.summary_part = sheet_part(archive, "Summary")
+        parts = dict(self.parts)
+
+        # The Hours header row never changes, so it stays in the head
+        hours = parts[self.hours_part]
+        header_end = hours.index(b"</row>") + len(b"</row>")
+        self.hours_head, self.hours_tail = hours[:header_end], hours[hours.index(b"</sheetData>"):]
+
+        summary = parts[self.summary_part]
+        self.summary_head = summary[:summary.index(b"<sheetData>") + len(b"<sheetData>")]
+        self.summary_tail = summary[summary.index(b"</sheetData>"):]
+        bold_row = re.search(rb'<row r="%d">.*?</row>' % sample_layout.bold_row, summary).group()
+        self.bold_style = f' s="{_STYLE.search(bold_row).group(1).decode()}"'
+
+        # Chart XML split around its series title, category and value formulas
+        self.charts = {}
+        for name, data in self.parts:
+            if name.startswith("xl/charts/"):
+                kind = "bar" if b"<barChart>" in data else "pie"
+                self.charts[name] = (kind, _FORMULA.split(data))
+
+    def _chart(self, kind, pieces, layout, type_count):
+        if kind == "bar":
+            title, first, last = "'Summary'!B1", 2, layout.last_month_row
+        else:
+            start = layout.type_start_row
+            title, first, last = f"'Summary'!B{start}", start + 1, start + type_count
+        formulas = [title, _column_range("A", first, last), _column_range("B", first, last)]
+        xml = [pieces[0]]
+        for formula, piece in zip(formulas, pieces[1:]):
+            xml += [b"<f>", escape(formula).encode("utf-8"), b"</f>", piece]
+        return b"".join(xml)
+
+    def _summary(self, layout):
+        rows = [_row_xml(number, row, self.bold_style if number == layout.bold_row else "")
+                for number, row in enumerate(layout.rows, start=1)]
+        return self.summary_head + "".join(rows).encode("utf-8") + self.summary_tail
+
+    @instrumented("excel.template_write", rows=lambda written, *_: written)
+    def write(self, path, entries):
+        """
+        Write the workbook export_to_excel() would make from entries, an
+        iterable of entry tuples consumed once. Returns the number of rows
+        written.
+        """
+        accumulator = Accumulator()
+        written = 0
+        with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+            for name, data in self.parts:
+                if name == self.hours_part:
+                    with archive.open(name, "w") as out:
+                        out.write(self.hours_head)
+                        rows = []
+                        for entry in entries:
+                            written += 1
+                            rows.append(_row_xml(written + 1, hours_row(entry)))
+                            accumulator.add(entry)
+                            if len(rows) == ROWS_PER_WRITE:
+                                out.write("".join(rows).encode("utf-8"))
+                                rows = []
+                        out.write("".join(rows).encode("utf-8"))
+                        out.write(self.hours_tail)
+                    report = accumulator.report()
+                    layout = summary_layout(report)
+                elif name == self.summary_part:
+                    archive.writestr(name, self._summary(layout))
+                elif name in self.charts:
+                    kind, pieces = self.charts[name]
+                    archive.writestr(name, self._chart(kind, pieces, layout, len(report.types)))
+                else:
+                    archive.writestr(name, data)
+        return written
+
+
+class ReportOutcome(NamedTuple):
+    name: str
+    path: str
+    rows: int
+    error: str  # None when the workbook was written
+
+
+def cadet_names(repo):
+    """Every non-blank name in repo's entries, sorted."""
+    return [name for (name,) in repo.connection().execute(
+        "SELECT DISTINCT name FROM entries WHERE name IS NOT NULL AND name != '' ORDER BY name")]
+
+
+def report_path(template, name):
+    """Fill the {name} placeholder of template with name, made safe for a file name."""
+    return template.format(name=re.sub(r'[\\/:*?"<>|\x00-\x1f]', "_", name).strip(" .") or "_")
+
+
+# Per worker process: (repo, template), set up by _start_worker
+_worker = None
+
+
+def _start_worker(db_path, template):
+    global _worker
+    _worker = (Repository(db_path), template)
+
+
+def _write_report(job):
+    name, path = job
+    repo, template = _worker
+    try:
+        rows = template.write(path, repo.iter_entries(entry_filter=EntryFilter(name=name)))
+    except (OSError, ValueError, IllegalCharacterError) as e:
+        return ReportOutcome(name, path, 0, str(e))
+    return ReportOutcome(name, path, rows, None)
+
+
+def generate_reports(db_path, output, names=None, workers=None, template=None):
+    """
+    Write one workbook per cadet in the database at db_path, to output
+    with {name} replaced by the cadet's name. names defaults to every
+    non-blank name; entries without a name are in no report. workers > 1
+    spreads the cadets over a process pool (default: one per CPU), 1 or
+    less writes them in this process. Returns a ReportOutcome per cadet,
+    in names order; failures are reported there rather than raised.
+    """
+    if "{name}" not in output:
+        raise ValueError("the output path needs a {name} placeholder")
+    if names is None:
+        repo = Repository(db_path)
+        try:
+            names = cadet_names(repo)
+        finally:
+            repo.close()
+    template = template or WorkbookTemplate()
+    jobs = [(name, report_path(output, name)) for name in names]
+    for parent in {Path(path).parent for _, path in jobs}:
+        parent.mkdir(parents=True, exist_ok=True)
+
+    if workers is not None and workers <= 1:
+        global _worker
+        _start_worker(db_path, template)
+        try:
+            return list(map(_write_report, jobs))
+        finally:
+            _worker[0].close()
+            _worker = None
+    with ProcessPoolExecutor(max_workers=workers, initializer=_start_worker,
+                             initargs=(str(db_path), template)) as pool:
+        return list(pool.map(_write_report, jobs, chunksize=CHUNK_SIZE))
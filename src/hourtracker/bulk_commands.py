@@ -0,0 +1,111 @@
+# bulk_commands.py
+"""
+Undoable changes to many entries at once.
+
+Each command keeps the affected entries as they were before, applies its
+change with set-based SQL in a single transaction and then brings the table
+up to date through TimeTrackerUI.sync_entries in one pass. Undo puts back
+only the column the command changed, so edits made to the entries since
+(which aren't on the undo stack) survive it; undoing a delete re-creates
+the entries under their old ids with Repository.restore_entries. Edits
+still waiting in the window's save queue are flushed first, so they can't
+land on top of a batch.
+
+Single checkbox clicks are ToggleRecordedCommands instead, which go
+through the save queue themselves.
+"""
+from abc import ABCMeta, abstractmethod
+
+from PySide6.QtGui import QUndoCommand
+
+
+def _entries(count):
+    return f"{count} {'entry' if count == 1 else 'entries'}"
+
+
+class _AbstractCommandMeta(ABCMeta, type(QUndoCommand)):
+    # Shiboken's constructor doesn't refuse abstract classes the way
+    # object() does, so the check is made here
+    def __call__(cls, *args, **kwargs):
+        if cls.__abstractmethods__:
+            missing = ", ".join(sorted(cls.__abstractmethods__))
+            raise TypeError(f"Can't instantiate abstract class {cls.__name__} without {missing}")
+        return super().__call__(*args, **kwargs)
+
+
+class BulkCommand(QUndoCommand, metaclass=_AbstractCommandMeta):
+    def __init__(self, window, text, entries):
+        super().__init__(text)
+        self.window = window
+        self.before = list(entries)  # (id, date, name, type, hours, travel, recorded, notes)
+        self.entry_ids = [entry[0] for entry in self.before]
+
+    @abstractmethod
+    def apply(self, repo):
+        """Make the change to every entry in entry_ids."""
+
+    @abstractmethod
+    def revert(self, repo):
+        """Put back what apply() changed, from before."""
+
+    def redo(self):
+        self.window.flush_edits()
+        self.apply(self.window.repo)
+        self.window.sync_entries(self.entry_ids)
+
+    def undo(self):
+        self.window.flush_edits()
+        self.revert(self.window.repo)
+        self.window.sync_entries(self.entry_ids)
+
+
+class SetRecordedCommand(BulkCommand):
+    def __init__(self, window, entries, recorded):
+        state = "recorded" if recorded else "unrecorded"
+        super().__init__(window, f"Mark {_entries(len(entries))} {state}", entries)
+        self.recorded = recorded
+
+    def apply(self, repo):
+        repo.set_recorded_many(self.entry_ids, self.recorded)
+
+    def revert(self, repo):
+        repo.restore_recorded((entry[0], entry[6]) for entry in self.before)
+
+
+class SetTypeCommand(BulkCommand):
+    def __init__(self, window, entries, type_):
+        super().__init__(window, f"Set type of {_entries(len(entries))} to {type_}", entries)
+        self.type = type_
+
+    def apply(self, repo):
+        repo.set_type_many(self.entry_ids, self.type)
+
+    def revert(self, repo):
+        repo.restore_types((entry[0], entry[3]) for entry in self.before)
+
+
+class DeleteEntriesCommand(BulkCommand):
+    def __init__(self, window, entries):
+        super().__init__(window, f"Delete {_entries(len(entries))}", entries)
+
+    def apply(self, repo):
+        repo.delete_entries(self.entry_ids)
+
+    def revert(self, repo):
+        repo.restore_entries(self.before)
+
+
+class ToggleRecordedCommand(QUndoCommand):
+    """One click on a Recorded checkbox, saved through the window's save queue."""
+
+    def __init__(self, window, entry_id, recorded):
+        super().__init__(f"Mark 1 entry {'recorded' if recorded else 'unrecorded'}")
+        self.window = window
+        self.entry_id = entry_id
+        self.recorded = recorded
+
+    def redo(self):
+        self.window.queue_recorded(self.entry_id, self.recorded)
+
+    def undo(self):
+        self.window.queue_recorded(self.entry_id, not self.recorded)
@@ -0,0 +1,385 @@
+"""
+Command line interface for batch jobs that don't need the GUI. Nothing
+here imports Qt, so it runs on machines without a display server.
+
+    python -m hourtracker --db unit/alex.db --db unit/sam.db summary
+    python -m hourtracker --db hours.db import hours.csv
+    python -m hourtracker --db a.db --db b.db export-xlsx "reports/{db}.xlsx"
+    python -m hourtracker --db unit.db report-batch "reports/{name}.xlsx"
+
+Every command accepts several --db options and handles the databases one
+after another, streaming entries rather than loading them into memory.
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+from .csv_exporter import COLUMNS, DEFAULT_COLUMNS, check_columns
+from .database import DB_FILE, EntryFilter, Repository
+from .snapshot import CONFLICT_MODES
+
+
+def _open_repository(path, create=False):
+    if not create and not Path(path).exists():
+        raise SystemExit(f"{path}: no such database")
+    repo = Repository(path)
+    repo.init_db()
+    return repo
+
+
+def _each_repository(args, create=False):
+    """Yield (index, path, repo) for every --db, closing each one afterwards."""
+    for index, path in enumerate(args.db, start=1):
+        repo = _open_repository(path, create)
+        try:
+            yield index, path, repo
+        finally:
+            repo.close()
+
+
+def _output_path(template, index, db_path, count):
+    # {db} is the database file's stem, {index} its position on the command line
+    if count > 1 and "{" not in template:
+        raise SystemExit("with several --db options the output path needs a {db} or {index} placeholder")
+    return template.format(db=Path(db_path).stem, index=index)
+
+
+def _date_argument(text):
+    from .importer import parse_date
+
+    try:
+        return parse_date(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def _add_filter_arguments(parser):
+    group = parser.add_argument_group("filter", "export only the entries that match every option given")
+    group.add_argument("--search", help="words in the notes or name (prefix match)")
+    group.add_argument("--type", dest="type_", metavar="TYPE", help="entry type")
+    group.add_argument("--name", help="name")
+    recorded = group.add_mutually_exclusive_group()
+    recorded.add_argument("--recorded", action="store_const", const=True, help="only recorded entries")
+    recorded.add_argument("--unrecorded", dest="recorded", action="store_const", const=False,
+                          help="only unrecorded entries")
+    group.add_argument("--from", dest="date_from", type=_date_argument, metavar="DATE", help="earliest date")
+    group.add_argument("--to", dest="date_to", type=_date_argument, metavar="DATE", help="latest date")
+
+
+def _entry_filter(args):
+    return EntryFilter(text=args.search, type_=args.type_, name=args.name, recorded=args.recorded,
+                       date_from=args.date_from, date_to=args.date_to)
+
+
+def cmd_import(args):
+    from .importer import ImportAborted, import_csv
+
+    status = 0
+    for _, db_path, repo in _each_repository(args, create=True):
+        for path in args.files:
+            try:
+                result = import_csv(path, repo, batch_size=args.batch_size, strict=args.strict)
+            except ImportAborted as e:
+                print(f"{path}: {e}", file=sys.stderr)
+                status = 1
+                continue
+            print(f"{path} -> {db_path}: imported {result.imported} rows, skipped {len(result.problems)}")
+            for problem in result.problems:
+                print(f"  line {problem.line}: {problem.message}", file=sys.stderr)
+    return status
+
+
+def _columns_argument(text):
+    try:
+        return check_columns(column.strip().lower() for column in text.split(",") if column.strip())
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def cmd_export_csv(args):
+    from .csv_exporter import export_to_csv
+
+    for index, db_path, repo in _each_repository(args):
+        out = _output_path(args.output, index, db_path, len(args.db))
+        written = export_to_csv(out, repo.iter_entries(entry_filter=_entry_filter(args)), columns=args.columns,
+                                delimiter=args.delimiter, compress=args.gzip)
+        print(f"{db_path} -> {out}: {written} rows")
+    return 0
+
+
+def cmd_export_xlsx(args):
+    from .excel_exporter import export_to_excel, update_excel_export
+
+    entry_filter = _entry_filter(args)
+    if args.incremental and entry_filter:
+        raise SystemExit("--incremental exports every entry and can't be combined with filters")
+    for index, db_path, repo in _each_repository(args):
+        out = _output_path(args.output, index, db_path, len(args.db))
+        if args.incremental:
+            written = update_excel_export(out, repo)
+        else:
+            written = export_to_excel(out, repo.iter_entries(entry_filter=entry_filter))
+        print(f"{db_path} -> {out}: {written} rows")
+    return 0
+
+
+def cmd_report_batch(args):
+    import time
+
+    from .batch_reports import WorkbookTemplate, cadet_names, generate_reports
+
+    if "{name}" not in args.output:
+        raise SystemExit("the output path needs a {name} placeholder")
+    template = WorkbookTemplate()
+    status = 0
+    for index, db_path, repo in _each_repository(args):
+        # {name} is left for generate_reports to fill in per cadet
+        out = _output_path(args.output.replace("{name}", "{{name}}"), index, db_path, len(args.db))
+        start = time.perf_counter()
+        outcomes = generate_reports(db_path, out, names=args.name or cadet_names(repo), workers=args.workers,
+                                    template=template)
+        elapsed = time.perf_counter() - start
+        for outcome in outcomes:
+            if outcome.error is not None:
+                print(f"{outcome.path}: {outcome.error}", file=sys.stderr)
+                status = 1
+        written = sum(outcome.error is None for outcome in outcomes)
+        rate = written / elapsed if elapsed else 0.0
+        print(f"{db_path}: {written} workbooks, {sum(o.rows for o in outcomes)} rows ({rate:.1f} workbooks/s)")
+    return status
+
+
+def cmd_backup(args):
+    for index, db_path, repo in _each_repository(args):
+        out = _output_path(args.output, index, db_path, len(args.db))
+        repo.backup(out)
+        print(f"{db_path} -> {out}")
+    return 0
+
+
+def cmd_restore_backup(args):
+    if len(args.db) > 1:
+        raise SystemExit("restore-backup takes a single --db")
+    for _, db_path, repo in _each_repository(args, create=True):
+        try:
+            repo.restore_backup(args.backup)
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            return 1
+        print(f"{args.backup} -> {db_path}: {repo.count_entries()} entries")
+    return 0
+
+
+def cmd_export_snapshot(args):
+    from .snapshot import write_snapshot
+
+    for index, db_path, repo in _each_repository(args):
+        out = _output_path(args.output, index, db_path, len(args.db))
+        written = write_snapshot(out, repo.iter_entries(entry_filter=_entry_filter(args)))
+        print(f"{db_path} -> {out}: {written} rows")
+    return 0
+
+
+def cmd_import_snapshot(args):
+    from .snapshot import SnapshotError, restore_snapshot
+
+    status = 0
+    for _, db_path, repo in _each_repository(args, create=True):
+        for path in args.files:
+            try:
+                result = restore_snapshot(path, repo, on_conflict=args.on_conflict)
+            except SnapshotError as e:
+                print(e, file=sys.stderr)
+                status = 1
+                continue
+            print(f"{path} -> {db_path}: restored {result.restored} rows, skipped {result.skipped}")
+    return status
+
+
+def cmd_serve(args):
+    from .entry_service import DEFAULT_PORT, READ_WORKERS, EntryServer
+
+    if len(args.db) > 1:
+        raise SystemExit("serve takes a single --db")
+    for _, db_path, repo in _each_repository(args, create=True):
+        server = EntryServer(repo, args.host, args.port or DEFAULT_PORT, read_workers=args.workers or READ_WORKERS,
+                             verbose=args.verbose)
+        print(f"serving {db_path} at {server.url}; set HOURTRACKER_SERVER={server.url} on clients")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+    return 0
+
+
+def cmd_summary(args):
+    reports = []
+    for _, db_path, repo in _each_repository(args):
+        summary, totals, recorded_totals = repo.get_summary()
+        reports.append({
+            "db": str(db_path),
+            "entries": repo.count_entries(),
+            "types": {type_: {"hours": h, "travel": t} for type_, h, t in summary},
+            "hours": totals[0],
+            "travel": totals[1],
+            "recorded": {"hours": recorded_totals[True][0], "travel": recorded_totals[True][1]},
+            "unrecorded": {"hours": recorded_totals[False][0], "travel": recorded_totals[False][1]},
+        })
+
+    if args.json:
+        json.dump(reports, sys.stdout, indent=2)
+        print()
+        return 0
+    for report in reports:
+        print(f"{report['db']} ({report['entries']} entries)")
+        for type_, t in report["types"].items():
+            print(f"  {type_}: {t['hours']:.2f} hrs + {t['travel']:.2f} travel")
+        print(f"  Recorded: {report['recorded']['hours']:.2f} hrs + {report['recorded']['travel']:.2f} travel")
+        print(f"  Unrecorded: {report['unrecorded']['hours']:.2f} hrs + {report['unrecorded']['travel']:.2f} travel")
+        print(f"  Total (including travel): {report['hours'] + report['travel']:.2f} hrs")
+    return 0
+
+
+def cmd_vacuum(args):
+    for _, db_path, repo in _each_repository(args):
+        before = Path(db_path).stat().st_size
+        repo.vacuum()
+        print(f"{db_path}: {before} -> {Path(db_path).stat().st_size} bytes")
+    return 0
+
+
+def cmd_check_summary(args):
+    status = 0
+    for _, db_path, repo in _each_repository(args):
+        mismatches = repo.verify_summary()
+        for type_, recorded, stored, actual in mismatches:
+            state = "recorded" if recorded else "unrecorded"
+            print(f"{db_path}: {type_} ({state}): stored {stored}, actual {actual}")
+        if not mismatches:
+            print(f"{db_path}: summary_totals is consistent")
+        elif args.rebuild:
+            repo.rebuild_summary()
+            print(f"{db_path}: rebuilt summary_totals ({len(mismatches)} rows were wrong)")
+        else:
+            status = 1
+    return status
+
+
+def cmd_consolidate(args):
+    from .consolidate import consolidate
+
+    result = consolidate(args.paths, workers=args.workers)
+    for path, error in result.failures:
+        print(f"{path}: {error}", file=sys.stderr)
+    if args.csv:
+        result.export_csv(args.csv)
+    if args.xlsx:
+        result.export_xlsx(args.xlsx)
+
+    hours, travel, entries = result.grand_total()
+    print(f"{len(result.sources)} databases, {entries} entries")
+    print(f"{'Person':<24} {'Hours':>10} {'Travel':>10} {'Recorded':>10} {'Entries':>8}")
+    for person, h, t, recorded, count in result.by_person():
+        print(f"{person:<24} {h:>10.2f} {t:>10.2f} {recorded:>10.2f} {count:>8}")
+    print(f"{'Total':<24} {hours:>10.2f} {travel:>10.2f}")
+    return 1 if result.failures else 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="hourtracker", description="Hour Tracker batch commands")
+    parser.add_argument("--db", action="append",
+                        help=f"database file; repeat to process several (default: {DB_FILE})")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    import_cmd = commands.add_parser("import", help="import entries from CSV files")
+    import_cmd.add_argument("files", nargs="+", help="CSV files to import")
+    import_cmd.add_argument("--strict", action="store_true", help="abort a file on its first invalid row")
+    import_cmd.add_argument("--batch-size", type=int, default=1000, help="rows per executemany batch")
+    import_cmd.set_defaults(func=cmd_import)
+
+    csv_cmd = commands.add_parser("export-csv", help="export entries to CSV")
+    csv_cmd.add_argument("output", help="output file; may use {db} and {index} placeholders. "
+                         "A .tsv extension selects tabs and .gz selects gzip unless overridden")
+    csv_cmd.add_argument("--columns", type=_columns_argument, default=DEFAULT_COLUMNS,
+                         help=f"comma-separated columns to write, from {', '.join(COLUMNS)} "
+                              f"(default: {','.join(DEFAULT_COLUMNS)})")
+    csv_cmd.add_argument("--tsv", dest="delimiter", action="store_const", const="\t",
+                         help="separate columns with tabs")
+    csv_cmd.add_argument("--gzip", action="store_const", const=True, help="gzip the output")
+    _add_filter_arguments(csv_cmd)
+    csv_cmd.set_defaults(func=cmd_export_csv)
+
+    xlsx_cmd = commands.add_parser("export-xlsx", help="export entries and summary charts to Excel")
+    xlsx_cmd.add_argument("output", help="output file; may use {db} and {index} placeholders")
+    xlsx_cmd.add_argument("--incremental", action="store_true",
+                          help="update a previous --incremental export in place, writing only what changed")
+    _add_filter_arguments(xlsx_cmd)
+    xlsx_cmd.set_defaults(func=cmd_export_xlsx)
+
+    batch_cmd = commands.add_parser("report-batch", help="write a separate Excel report for every cadet")
+    batch_cmd.add_argument("output", help="output file; needs a {name} placeholder and may use {db} and {index}")
+    batch_cmd.add_argument("--name", action="append", help="only this cadet; repeat for several (default: everyone)")
+    batch_cmd.add_argument("--workers", type=int, help="worker processes (default: one per CPU)")
+    batch_cmd.set_defaults(func=cmd_report_batch)
+
+    backup_cmd = commands.add_parser("backup", help="copy whole databases with SQLite's online backup")
+    backup_cmd.add_argument("output", help="output file; may use {db} and {index} placeholders")
+    backup_cmd.set_defaults(func=cmd_backup)
+
+    restore_cmd = commands.add_parser("restore-backup", help="replace a database with a copy made by backup")
+    restore_cmd.add_argument("backup", help="database file written by the backup command")
+    restore_cmd.set_defaults(func=cmd_restore_backup)
+
+    snapshot_cmd = commands.add_parser("export-snapshot", help="write entries to a compact binary snapshot")
+    snapshot_cmd.add_argument("output", help="output file; may use {db} and {index} placeholders")
+    _add_filter_arguments(snapshot_cmd)
+    snapshot_cmd.set_defaults(func=cmd_export_snapshot)
+
+    merge_cmd = commands.add_parser("import-snapshot", help="merge binary snapshots into the database")
+    merge_cmd.add_argument("files", nargs="+", help="snapshot files to merge")
+    merge_cmd.add_argument("--on-conflict", choices=CONFLICT_MODES, default="renumber",
+                           help="what to do with a snapshot row whose id is taken (default: renumber)")
+    merge_cmd.set_defaults(func=cmd_import_snapshot)
+
+    serve_cmd = commands.add_parser(
+        "serve", help="share the database with other machines as an HTTP entry service (no authentication)")
+    serve_cmd.add_argument("--host", default="127.0.0.1", help="address to listen on (default: 127.0.0.1)")
+    serve_cmd.add_argument("--port", type=int, help="port (default: 8765)")
+    serve_cmd.add_argument("--workers", type=int, help="reader threads, each with its own connection (default: 4)")
+    serve_cmd.add_argument("--verbose", action="store_true", help="log every request")
+    serve_cmd.set_defaults(func=cmd_serve)
+
+    summary_cmd = commands.add_parser("summary", help="print hour totals")
+    summary_cmd.add_argument("--json", action="store_true", help="print JSON instead of text")
+    summary_cmd.set_defaults(func=cmd_summary)
+
+    vacuum_cmd = commands.add_parser("vacuum", help="compact the database files")
+    vacuum_cmd.set_defaults(func=cmd_vacuum)
+
+    check_cmd = commands.add_parser("check-summary", help="check summary_totals against the entries table")
+    check_cmd.add_argument("--rebuild", action="store_true", help="rebuild summary_totals if it is wrong")
+    check_cmd.set_defaults(func=cmd_check_summary)
+
+    consolidate_cmd = commands.add_parser(
+        "consolidate", help="total many people's database files (ignores --db)")
+    consolidate_cmd.add_argument("paths", nargs="+", help="database files or folders to search for .db files")
+    consolidate_cmd.add_argument("--workers", type=int, help="worker processes (default: one per CPU)")
+    consolidate_cmd.add_argument("--csv", help="write per person/type/month totals to this CSV file")
+    consolidate_cmd.add_argument("--xlsx", help="write People/Types/Months sheets to this Excel file")
+    consolidate_cmd.set_defaults(func=cmd_consolidate)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if not args.db:
+        args.db = [str(DB_FILE)]
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,163 @@
+# consolidate.py
+"""
+Combine many cadets' hours.db files into one set of totals.
+
+Each file is aggregated inside SQLite (GROUP BY type, month and recorded
+flag), optionally across a process pool, so only a few rows per file ever
+reach Python. The per-file aggregates are folded into an in-memory SQLite
+table, from which the per-person, per-type and per-month totals are read.
+"""
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+SQL_FILE_TOTALS = """
+    SELECT type, substr(date, 1, 7), COALESCE(recorded, 0) != 0,
+           SUM(hours), SUM(COALESCE(travel_time, 0)), COUNT(*)
+    FROM entries GROUP BY 1, 2, 3
+"""
+# Databases that were never opened by a version with the recorded column
+SQL_FILE_TOTALS_LEGACY = """
+    SELECT type, substr(date, 1, 7), 0,
+           SUM(hours), SUM(COALESCE(travel_time, 0)), COUNT(*)
+    FROM entries GROUP BY 1, 2
+"""
+
+
+def person_label(path):
+    """Name a file's owner: its stem, or the folder name for a plain hours.db."""
+    path = Path(path)
+    if path.stem == "hours" and path.parent.name:
+        return path.parent.name
+    return path.stem
+
+
+def find_databases(paths):
+    """Expand directories to the .db files under them."""
+    for path in map(Path, paths):
+        if path.is_dir():
+            yield from sorted(path.rglob("*.db"))
+        else:
+            yield path
+
+
+def aggregate_file(path):
+    """
+    Return (path, rows, error) where rows are (type, month, recorded, hours,
+    travel, entries) totals for one database. Runs in a worker process.
+    """
+    try:
+        conn = sqlite3.connect(f"{Path(path).resolve().as_uri()}?mode=ro", uri=True)
+        try:
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(entries)")}
+            sql = SQL_FILE_TOTALS if "recorded" in columns else SQL_FILE_TOTALS_LEGACY
+            return str(path), conn.execute(sql).fetchall(), None
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        return str(path), [], str(e)
+
+
+class Consolidation:
+    """Totals gathered from many databases, queryable by person, type and month."""
+
+    def __init__(self):
+        self.conn = sqlite3.connect(":memory:")
+        self.conn.execute("""
+            CREATE TABLE totals (
+                person TEXT NOT NULL,
+                source TEXT NOT NULL,
+                type TEXT NOT NULL,
+                month TEXT NOT NULL,
+                recorded INTEGER NOT NULL,
+                hours REAL NOT NULL,
+                travel REAL NOT NULL,
+                entries INTEGER NOT NULL
+            )""")
+        self.sources = []
+        self.failures = []  # (path, error message)
+
+    def add(self, path, rows, person=None):
+        person = person or person_label(path)
+        self.sources.append(str(path))
+        self.conn.executemany(
+            "INSERT INTO totals VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            ((person, str(path), type_, month or "", int(recorded), hours or 0, travel or 0, count)
+             for type_, month, recorded, hours, travel, count in rows))
+
+    def _grouped(self, column):
+        return self.conn.execute(f"""
+            SELECT {column},
+                   SUM(hours), SUM(travel),
+                   SUM(CASE WHEN recorded THEN hours + travel ELSE 0 END),
+                   SUM(entries)
+            FROM totals GROUP BY {column} ORDER BY {column}
+        """).fetchall()
+
+    # Each returns (key, hours, travel, recorded hours incl. travel, entries) rows
+    def by_person(self):
+        return self._grouped("person")
+
+    def by_type(self):
+        return self._grouped("type")
+
+    def by_month(self):
+        return self._grouped("month")
+
+    def grand_total(self):
+        """(hours, travel, entries) across every file."""
+        hours, travel, entries = self.conn.execute(
+            "SELECT SUM(hours), SUM(travel), SUM(entries) FROM totals").fetchone()
+        return hours or 0.0, travel or 0.0, entries or 0
+
+    def export_csv(self, path):
+        """Write one row per person, type and month."""
+        import csv
+
+        with open(path, "w", newline="", encoding="utf-8") as file:
+            writer = csv.writer(file)
+            writer.writerow(["Person", "Type", "Month", "Hours", "Travel", "Recorded (incl. travel)", "Entries"])
+            writer.writerows(self.conn.execute("""
+                SELECT person, type, month, SUM(hours), SUM(travel),
+                       SUM(CASE WHEN recorded THEN hours + travel ELSE 0 END), SUM(entries)
+                FROM totals GROUP BY person, type, month ORDER BY person, month, type
+            """))
+
+    def export_xlsx(self, path):
+        """Write People, Types and Months sheets of totals."""
+        import openpyxl
+
+        wb = openpyxl.Workbook(write_only=True)
+        headers = ["Hours", "Travel", "Recorded (incl. travel)", "Entries"]
+        for title, key, rows in (("People", "Person", self.by_person()),
+                                 ("Types", "Type", self.by_type()),
+                                 ("Months", "Month", self.by_month())):
+            ws = wb.create_sheet(title=title)
+            ws.append([key] + headers)
+            for row in rows:
+                ws.append(list(row))
+        wb.save(path)
+
+
+def consolidate(paths, workers=None):
+    """
+    Aggregate every database in paths (directories are searched for .db
+    files). workers > 1 spreads the files over a process pool; files that
+    can't be read are listed in the result's failures.
+    """
+    files = list(find_databases(paths))
+    result = Consolidation()
+    if workers is not None and workers <= 1:
+        _collect(result, map(aggregate_file, files))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            _collect(result, pool.map(aggregate_file, files, chunksize=8))
+    return result
+
+
+def _collect(result, outcomes):
+    for path, rows, error in outcomes:
+        if error:
+            result.failures.append((path, error))
+        else:
+            result.add(path, rows)
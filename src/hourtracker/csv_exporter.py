@@ -0,0 +1,73 @@
+# csv_exporter.py
+import csv
+import gzip
+from pathlib import Path
+
+# Exportable columns: name -> (header, value from an entry tuple). Headers
+# match the ones the importer recognises, so an export can be imported back.
+COLUMNS = {
+    "id": ("Id", lambda entry: entry[0]),
+    "date": ("Date", lambda entry: entry[1]),
+    "name": ("Name", lambda entry: entry[2] or ""),
+    "type": ("Type", lambda entry: entry[3]),
+    "hours": ("Hours", lambda entry: entry[4]),
+    "travel": ("Travel", lambda entry: entry[5]),
+    "total": ("Total", lambda entry: entry[4] + entry[5]),
+    "recorded": ("Recorded", lambda entry: 1 if entry[6] else 0),
+    "notes": ("Notes", lambda entry: entry[7] or ""),
+}
+DEFAULT_COLUMNS = ("date", "name", "type", "hours", "travel", "recorded", "notes")
+# gzip level for compressed exports; higher levels cost far more time than they save space
+GZIP_LEVEL = 6
+
+
+def check_columns(columns):
+    """Return columns as a tuple, raising ValueError if any name is not in COLUMNS."""
+    columns = tuple(columns)
+    unknown = [column for column in columns if column not in COLUMNS]
+    if unknown or not columns:
+        raise ValueError(f"unknown columns: {', '.join(unknown)}" if unknown else "no columns selected")
+    return columns
+
+
+def output_format(path):
+    """(delimiter, compress) implied by path's extension: .tsv for tabs, .gz for gzip."""
+    suffixes = [suffix.lower() for suffix in Path(path).suffixes]
+    compress = suffixes[-1:] == [".gz"]
+    if compress:
+        suffixes.pop()
+    delimiter = "\t" if suffixes[-1:] == [".tsv"] else ","
+    return delimiter, compress
+
+
+def export_to_csv(path, entries, progress=None, columns=DEFAULT_COLUMNS, delimiter=None, compress=None):
+    """
+    Write entries to a CSV file one row at a time. entries is any iterable
+    of (id, date, name, type, hours, travel, recorded, notes) tuples and is
+    consumed once, so memory stays constant when it is a database cursor
+    such as Repository.iter_entries(). progress, if given, is called with
+    the number of rows written after each row. Returns the number of rows
+    written.
+
+    columns picks and orders the COLUMNS to write. delimiter and compress
+    (gzip) default to what the file extension implies; see output_format().
+    """
+    columns = check_columns(columns)
+    getters = [COLUMNS[column][1] for column in columns]
+    implied_delimiter, implied_compress = output_format(path)
+    delimiter = implied_delimiter if delimiter is None else delimiter
+    compress = implied_compress if compress is None else compress
+
+    written = 0
+    if compress:
+        file = gzip.open(path, "wt", compresslevel=GZIP_LEVEL, newline="", encoding="utf-8")
+    else:
+        file = open(path, "w", newline="", encoding="utf-8")
+    with file:
+        writer = csv.writer(file, delimiter=delimiter)
+        writer.writerow([COLUMNS[column][0] for column in columns])
+        for written, entry in enumerate(entries, start=1):
+            writer.writerow([get(entry) for get in getters])
+            if progress is not None:
+                progress(written)
+    return written
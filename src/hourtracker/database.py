@@ -1,10 +1,19 @@
 import sqlite3
 import os
+import re
+import secrets
 import sys
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
 from pathlib import Path
-from datetime import datetime
+from datetime import date as _date, datetime
 
-# Get a platform-safe path for the database
+from .instrumentation import instrumented
+from .result_cache import ResultCache
+
+# Get a platform-safe path for the database. The directory is only created
+# when a connection is first opened, so importing this module does no I/O.
 def get_db_file():
     if sys.platform == "win32":
         base_dir = Path(os.getenv("LOCALAPPDATA")) / "HourTracker"
@@ -13,15 +22,352 @@ def get_db_file():
     else:
         base_dir = Path.home() / ".hourtracker"
 
-    base_dir.mkdir(parents=True, exist_ok=True)
     return base_dir / "hours.db"
 
 DB_FILE = get_db_file()
 
-def init_db():
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute("""
+# Set to the URL of an entry service (see entry_service) to have the
+# module-level helpers at the bottom of this file use it instead of DB_FILE
+SERVER_ENV = "HOURTRACKER_SERVER"
+
+# Pragmas applied to every connection the repository opens. WAL lets the UI
+# read while a write is in flight, and NORMAL sync is safe under WAL (a crash
+# can only lose the last commit, never corrupt the file).
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -16000",
+    "PRAGMA busy_timeout = 5000",
+)
+
+# Size of sqlite3's per-connection prepared statement cache. All SQL below is
+# kept as constant strings so repeated calls hit the cache.
+STATEMENT_CACHE_SIZE = 128
+
+ENTRY_COLUMNS = "id, date, name, type, hours, travel_time, recorded, notes"
+
+SQL_INSERT_ENTRY = """
+    INSERT INTO entries (date, name, type, hours, travel_time, recorded, notes)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+SQL_UPDATE_ENTRY = """
+    UPDATE entries
+    SET date = ?, name = ?, type = ?, hours = ?, travel_time = ?, recorded = ?, notes = ?
+    WHERE id = ?
+"""
+SQL_SET_RECORDED = "UPDATE entries SET recorded = ? WHERE id = ?"
+SQL_DELETE_ENTRY = "DELETE FROM entries WHERE id = ?"
+SQL_SELECT_ENTRIES = f"SELECT {ENTRY_COLUMNS} FROM entries ORDER BY date DESC, id DESC"
+# Keyset pagination over idx_entries_date_id, newest first
+SQL_SELECT_FIRST_PAGE = f"SELECT {ENTRY_COLUMNS} FROM entries ORDER BY date DESC, id DESC LIMIT ?"
+SQL_SELECT_NEXT_PAGE = f"""
+    SELECT {ENTRY_COLUMNS} FROM entries
+    WHERE (date, id) < (?, ?)
+    ORDER BY date DESC, id DESC LIMIT ?
+"""
+SQL_SELECT_ENTRY = f"SELECT {ENTRY_COLUMNS} FROM entries WHERE id = ?"
+# Puts entries back exactly as they were, ids included. Existing rows are
+# updated rather than replaced so the summary and search triggers see an
+# UPDATE instead of a silent REPLACE delete.
+SQL_RESTORE_ENTRY = f"""
+    INSERT INTO entries ({ENTRY_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (id) DO UPDATE SET
+        date = excluded.date, name = excluded.name, type = excluded.type, hours = excluded.hours,
+        travel_time = excluded.travel_time, recorded = excluded.recorded, notes = excluded.notes
+"""
+SQL_SUMMARY = "SELECT type, recorded, hours, travel FROM summary_totals ORDER BY type"
+# The same figures computed from scratch, for checking and rebuilding summary_totals
+SQL_SUMMARY_FROM_ENTRIES = """
+    SELECT type, recorded != 0, SUM(hours), SUM(COALESCE(travel_time, 0)), COUNT(*)
+    FROM entries GROUP BY type, recorded != 0
+"""
+
+PAGE_SIZE = 200
+# Database pages copied per step of an online backup or restore; progress is
+# reported between steps
+BACKUP_STEP_PAGES = 1024
+# Ids per "WHERE id IN (...)" statement, well under SQLite's bound
+# parameter limit on every version
+ID_CHUNK_SIZE = 500
+
+# summary_totals holds one row per (type, recorded) with running sums that
+# the triggers below keep in step with every insert, update and delete, so
+# reading the summary never scans entries.
+SUMMARY_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS summary_totals (
+        type TEXT NOT NULL,
+        recorded INTEGER NOT NULL,
+        hours REAL NOT NULL DEFAULT 0,
+        travel REAL NOT NULL DEFAULT 0,
+        entries INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (type, recorded)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS summary_after_insert AFTER INSERT ON entries
+    BEGIN
+        INSERT INTO summary_totals (type, recorded, hours, travel, entries)
+        VALUES (NEW.type, COALESCE(NEW.recorded, 0) != 0, NEW.hours, COALESCE(NEW.travel_time, 0), 1)
+        ON CONFLICT (type, recorded) DO UPDATE SET
+            hours = hours + excluded.hours,
+            travel = travel + excluded.travel,
+            entries = entries + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS summary_after_delete AFTER DELETE ON entries
+    BEGIN
+        UPDATE summary_totals SET
+            hours = hours - OLD.hours,
+            travel = travel - COALESCE(OLD.travel_time, 0),
+            entries = entries - 1
+        WHERE type = OLD.type AND recorded = (COALESCE(OLD.recorded, 0) != 0);
+        DELETE FROM summary_totals
+        WHERE type = OLD.type AND recorded = (COALESCE(OLD.recorded, 0) != 0) AND entries <= 0;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS summary_after_update
+    AFTER UPDATE OF type, recorded, hours, travel_time ON entries
+    BEGIN
+        UPDATE summary_totals SET
+            hours = hours - OLD.hours,
+            travel = travel - COALESCE(OLD.travel_time, 0),
+            entries = entries - 1
+        WHERE type = OLD.type AND recorded = (COALESCE(OLD.recorded, 0) != 0);
+        DELETE FROM summary_totals
+        WHERE type = OLD.type AND recorded = (COALESCE(OLD.recorded, 0) != 0) AND entries <= 0;
+        INSERT INTO summary_totals (type, recorded, hours, travel, entries)
+        VALUES (NEW.type, COALESCE(NEW.recorded, 0) != 0, NEW.hours, COALESCE(NEW.travel_time, 0), 1)
+        ON CONFLICT (type, recorded) DO UPDATE SET
+            hours = hours + excluded.hours,
+            travel = travel + excluded.travel,
+            entries = entries + 1;
+    END
+    """,
+)
+
+# Running sums pick up float rounding error; compare with some slack
+SUMMARY_TOLERANCE = 1e-6
+
+# entries_fts indexes notes and name for search. It is an external-content
+# FTS5 table, so the text lives only in entries and the triggers pass the
+# old and new values along on every change.
+NOTES_FTS_SCHEMA = (
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts
+    USING fts5(notes, name, content='entries', content_rowid='id')
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS entries_fts_after_insert AFTER INSERT ON entries
+    BEGIN
+        INSERT INTO entries_fts (rowid, notes, name) VALUES (NEW.id, NEW.notes, NEW.name);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS entries_fts_after_delete AFTER DELETE ON entries
+    BEGIN
+        INSERT INTO entries_fts (entries_fts, rowid, notes, name) VALUES ('delete', OLD.id, OLD.notes, OLD.name);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS entries_fts_after_update AFTER UPDATE OF notes, name ON entries
+    BEGIN
+        INSERT INTO entries_fts (entries_fts, rowid, notes, name) VALUES ('delete', OLD.id, OLD.notes, OLD.name);
+        INSERT INTO entries_fts (rowid, notes, name) VALUES (NEW.id, NEW.notes, NEW.name);
+    END
+    """,
+)
+
+
+# entries.modified_at holds the change generation of the row's last insert
+# or update: change_generation.value is bumped by every insert, update and
+# delete, so "modified_at > g" finds everything written since generation g
+# was read, regardless of the wall clock.
+MODIFIED_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS change_generation (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        value INTEGER NOT NULL
+    )
+    """,
+    "INSERT OR IGNORE INTO change_generation (id, value) VALUES (1, 0)",
+    "CREATE INDEX IF NOT EXISTS idx_entries_modified ON entries(modified_at)",
+    """
+    CREATE TRIGGER IF NOT EXISTS entries_modified_after_insert AFTER INSERT ON entries
+    BEGIN
+        UPDATE change_generation SET value = value + 1;
+        UPDATE entries SET modified_at = (SELECT value FROM change_generation) WHERE id = NEW.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS entries_modified_after_update
+    AFTER UPDATE OF date, name, type, hours, travel_time, recorded, notes ON entries
+    BEGIN
+        UPDATE change_generation SET value = value + 1;
+        UPDATE entries SET modified_at = (SELECT value FROM change_generation) WHERE id = NEW.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS entries_modified_after_delete AFTER DELETE ON entries
+    BEGIN
+        UPDATE change_generation SET value = value + 1;
+    END
+    """,
+)
+# entries.day is the date as a day number, date.toordinal() of its
+# YYYY-MM-DD text, so year and month totals are range scans over
+# idx_entries_day, which also covers the summed columns. The modified_at
+# triggers are replaced by ones that set day as well, keeping it in step
+# whichever path wrote the row; it is NULL for a date SQLite can't read.
+SQL_DAY = "CAST(julianday(NEW.date) - 1721424.5 AS INTEGER)"
+DAY_SCHEMA = (
+    "CREATE INDEX IF NOT EXISTS idx_entries_day ON entries(day, hours, travel_time)",
+    "DROP TRIGGER IF EXISTS entries_modified_after_insert",
+    "DROP TRIGGER IF EXISTS entries_modified_after_update",
+    f"""
+    CREATE TRIGGER entries_modified_after_insert AFTER INSERT ON entries
+    BEGIN
+        UPDATE change_generation SET value = value + 1;
+        UPDATE entries SET modified_at = (SELECT value FROM change_generation), day = {SQL_DAY}
+        WHERE id = NEW.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER entries_modified_after_update
+    AFTER UPDATE OF date, name, type, hours, travel_time, recorded, notes ON entries
+    BEGIN
+        UPDATE change_generation SET value = value + 1;
+        UPDATE entries SET modified_at = (SELECT value FROM change_generation), day = {SQL_DAY}
+        WHERE id = NEW.id;
+    END
+    """,
+)
+# A random token naming this database, so a tracked Excel export can tell
+# it from another database (or a restored backup) whose change generations
+# happen to overlap; see Repository.database_id()
+META_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)",
+)
+# Triggers bulk_load() may drop because it rebuilds what they maintain
+DERIVED_TRIGGER_PREFIXES = ("summary_", "entries_fts_")
+
+
+class EntryFilter:
+    """
+    Criteria for narrowing the entries listed or exported. Every argument
+    is optional; an EntryFilter with none set matches everything.
+
+    text matches words in the notes or name by prefix ("first aid" finds
+    "First Aid Training"), through entries_fts when SQLite has FTS5 and
+    with LIKE otherwise. date_from and date_to are inclusive YYYY-MM-DD
+    bounds.
+    """
+
+    def __init__(self, text=None, type_=None, name=None, recorded=None, date_from=None, date_to=None):
+        self.text = (text or "").strip()
+        self.type = type_ or None
+        self.name = name or None
+        self.recorded = recorded
+        self.date_from = date_from or None
+        self.date_to = date_to or None
+
+    def __bool__(self):
+        return bool(self.text) or any(value is not None for value in (
+            self.type, self.name, self.recorded, self.date_from, self.date_to))
+
+    def __eq__(self, other):
+        return isinstance(other, EntryFilter) and vars(self) == vars(other)
+
+    def __repr__(self):
+        fields = ", ".join(f"{key}={value!r}" for key, value in vars(self).items() if value not in (None, ""))
+        return f"EntryFilter({fields})"
+
+    def words(self):
+        return re.findall(r"\w+", self.text)
+
+    def where(self, use_fts=True):
+        """
+        Return (sql, params) for a WHERE clause over entries, or ("1", [])
+        when nothing is filtered. Equality conditions come first so the
+        (type|name|recorded, date, id) indexes can serve them.
+        """
+        clauses, params = [], []
+        for column, value in (("type", self.type), ("name", self.name)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if self.recorded is not None:
+            clauses.append("recorded = ?")
+            params.append(int(bool(self.recorded)))
+        if self.date_from is not None:
+            clauses.append("date >= ?")
+            params.append(self.date_from)
+        if self.date_to is not None:
+            clauses.append("date <= ?")
+            params.append(self.date_to)
+        words = self.words()
+        if words and use_fts:
+            clauses.append("id IN (SELECT rowid FROM entries_fts WHERE entries_fts MATCH ?)")
+            params.append(" ".join(f'"{word}"*' for word in words))
+        else:
+            for word in words:
+                pattern = "%" + word.replace("_", "\\_") + "%"
+                clauses.append("(notes LIKE ? ESCAPE '\\' OR name LIKE ? ESCAPE '\\')")
+                params.extend((pattern, pattern))
+        return " AND ".join(clauses) or "1", params
+
+
+def _entry_from_row(row):
+    # Convert recorded from int to bool
+    id_, date, name, type_, hours, travel, recorded, notes = row
+    return (id_, date, name, type_, hours, travel, bool(recorded), notes)
+
+
+def check_date(text):
+    """Raise ValueError unless text is a YYYY-MM-DD date, the only form stored in entries.date."""
+    if not (isinstance(text, str) and len(text) == 10 and text[4] == text[7] == "-"):
+        raise ValueError(f"invalid date {text!r}; expected YYYY-MM-DD")
+    try:
+        _date.fromisoformat(text)
+    except ValueError:
+        raise ValueError(f"invalid date {text!r}") from None
+
+
+def checked_dates(rows, position):
+    """Yield rows unchanged, calling check_date() on each one's date at index position first."""
+    for row in rows:
+        check_date(row[position])
+        yield row
+
+
+def _id_chunks(entry_ids):
+    entry_ids = list(entry_ids)
+    for start in range(0, len(entry_ids), ID_CHUNK_SIZE):
+        chunk = entry_ids[start:start + ID_CHUNK_SIZE]
+        yield chunk, ", ".join("?" * len(chunk))
+
+
+def _backup_progress(progress):
+    # sqlite3 reports (status, remaining, total) pages
+    if progress is None:
+        return None
+    return lambda status, remaining, total: progress(total - remaining, total)
+
+
+def _rebuild_summary(conn):
+    conn.execute("DELETE FROM summary_totals")
+    conn.execute("INSERT INTO summary_totals (type, recorded, hours, travel, entries) " + SQL_SUMMARY_FROM_ENTRIES)
+
+
+# --- Schema migrations, applied in order by Repository.init_db. Databases
+# created before user_version tracking start at version 0, so the early
+# migrations must cope with a schema that is already partly there.
+
+def _migrate_create_entries(conn):
+    conn.execute("""
     CREATE TABLE IF NOT EXISTS entries (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         date TEXT NOT NULL,
@@ -32,72 +378,640 @@ def init_db():
         recorded INTEGER DEFAULT 0,
         notes TEXT
     )""")
-    conn.commit()
 
     # Check for missing columns and add if needed
-    cursor.execute("PRAGMA table_info(entries)")
-    columns = [row[1] for row in cursor.fetchall()]
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(entries)")]
     if 'recorded' not in columns:
-        cursor.execute("ALTER TABLE entries ADD COLUMN recorded INTEGER DEFAULT 0")
-        conn.commit()
+        conn.execute("ALTER TABLE entries ADD COLUMN recorded INTEGER DEFAULT 0")
     if 'name' not in columns:
-        cursor.execute("ALTER TABLE entries ADD COLUMN name TEXT")
-        conn.commit()
+        conn.execute("ALTER TABLE entries ADD COLUMN name TEXT")
     if 'notes' not in columns:
-        cursor.execute("ALTER TABLE entries ADD COLUMN notes TEXT")
-        conn.commit()
+        conn.execute("ALTER TABLE entries ADD COLUMN notes TEXT")
+
+def _migrate_date_index(conn):
+    # Backs the (date, id) keyset pagination in fetch_entries_page
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_date_id ON entries(date, id)")
+
+def _migrate_summary_totals(conn):
+    for statement in SUMMARY_SCHEMA:
+        conn.execute(statement)
+    _rebuild_summary(conn)
+
+def _migrate_filter_indexes(conn):
+    # Each leads with the filtered column and ends with the page order, so a
+    # filtered page is an index range scan rather than a sort
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_type_date ON entries(type, date, id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_name_date ON entries(name, date, id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_recorded_date ON entries(recorded, date, id)")
+
+def _migrate_notes_fts(conn):
+    try:
+        conn.execute(NOTES_FTS_SCHEMA[0])
+    except sqlite3.OperationalError:
+        # SQLite built without FTS5; EntryFilter falls back to LIKE
+        return
+    for statement in NOTES_FTS_SCHEMA[1:]:
+        conn.execute(statement)
+    conn.execute("INSERT INTO entries_fts (entries_fts) VALUES ('rebuild')")
+
+def _migrate_modified_at(conn):
+    # Existing rows count as written at generation 0
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(entries)")]
+    if 'modified_at' not in columns:
+        conn.execute("ALTER TABLE entries ADD COLUMN modified_at INTEGER NOT NULL DEFAULT 0")
+    for statement in MODIFIED_SCHEMA:
+        conn.execute(statement)
+
+def _migrate_day(conn):
+    from .importer import parse_date
+
+    # Dates written before they were checked may be in an import format;
+    # rewrite what can be read, leave the rest for day to be NULL
+    for id_, text in conn.execute("SELECT id, date FROM entries WHERE date IS NOT date(date)").fetchall():
+        try:
+            conn.execute("UPDATE entries SET date = ? WHERE id = ?", (parse_date(str(text)), id_))
+        except ValueError:
+            pass
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(entries)")]
+    if 'day' not in columns:
+        conn.execute("ALTER TABLE entries ADD COLUMN day INTEGER")
+    conn.execute(f"UPDATE entries SET day = {SQL_DAY.replace('NEW.', '')}")
+    for statement in DAY_SCHEMA:
+        conn.execute(statement)
+
+def _migrate_meta(conn):
+    for statement in META_SCHEMA:
+        conn.execute(statement)
+    _new_database_id(conn)
+
+def _new_database_id(conn):
+    conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('database_id', ?)", (secrets.token_hex(16),))
+
+MIGRATIONS = [
+    _migrate_create_entries,
+    _migrate_date_index,
+    _migrate_summary_totals,
+    _migrate_filter_indexes,
+    _migrate_notes_fts,
+    _migrate_modified_at,
+    _migrate_day,
+    _migrate_meta,
+]
+
+
+class StorageBackend(ABC):
+    """
+    The entry calls every storage backend provides: Repository for a
+    SQLite file and entry_service.RemoteBackend for an entry service shared
+    over the network. Entries are (id, date, name, type, hours, travel,
+    recorded, notes) tuples; see Repository for what each call does.
+    """
+
+    @abstractmethod
+    def init_db(self):
+        ...
+
+    @abstractmethod
+    def add_entry(self, date, name, type_, hours, travel_time, recorded=False, notes=None):
+        ...
+
+    @abstractmethod
+    def add_entries(self, rows):
+        ...
+
+    @abstractmethod
+    def update_entry(self, entry_id, date, name, type_, hours, travel_time, recorded=False, notes=None):
+        ...
+
+    @abstractmethod
+    def set_recorded(self, entry_id, recorded):
+        ...
+
+    @abstractmethod
+    def delete_entry(self, entry_id):
+        ...
+
+    @abstractmethod
+    def delete_entries(self, entry_ids):
+        ...
+
+    @abstractmethod
+    def reset_all_entries(self):
+        ...
+
+    @abstractmethod
+    def fetch_entry(self, entry_id):
+        ...
 
-    conn.close()
+    @abstractmethod
+    def fetch_entries_by_id(self, entry_ids, entry_filter=None):
+        ...
+
+    @abstractmethod
+    def fetch_entries(self):
+        ...
+
+    @abstractmethod
+    def fetch_entries_page(self, after=None, limit=PAGE_SIZE, entry_filter=None):
+        ...
+
+    @abstractmethod
+    def count_entries(self, entry_filter=None):
+        ...
+
+    @abstractmethod
+    def get_summary(self):
+        ...
+
+    @abstractmethod
+    def change_generation(self):
+        ...
+
+    @abstractmethod
+    def close(self):
+        ...
+
+
+class Repository(StorageBackend):
+    """
+    Long-lived access to the entries database.
+
+    Each thread gets its own connection, opened on first use and kept until
+    close(). Connections run in autocommit mode; use transaction() to group
+    several writes into a single commit.
+    """
+
+    def __init__(self, db_file=None):
+        self.db_file = Path(db_file) if db_file is not None else DB_FILE
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        self._has_fts = None
+        self._trace_callback = None
+        # Summary and analytics results, reused until the entries change
+        self.results = ResultCache(self.change_generation)
+
+    def _connect(self):
+        self.db_file.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(
+            self.db_file,
+            isolation_level=None,
+            check_same_thread=False,
+            cached_statements=STATEMENT_CACHE_SIZE,
+        )
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        conn.set_trace_callback(self._trace_callback)
+        return conn
+
+    def connection(self):
+        """Return the calling thread's connection, opening it if needed."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def set_trace_callback(self, callback):
+        """
+        Pass every SQL statement run through this repository's connections,
+        open now or later, to callback(statement). None turns tracing off.
+        """
+        self._trace_callback = callback
+        with self._lock:
+            for conn in self._connections:
+                conn.set_trace_callback(callback)
+
+    def close(self):
+        """Close every connection opened by this repository."""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
+    @contextmanager
+    def transaction(self, durable=False):
+        """
+        Run the enclosed block as one transaction, rolling back on error.
+        Nested calls join the outer transaction.
+
+        Under synchronous = NORMAL (see CONNECTION_PRAGMAS) a WAL commit
+        can be lost to a power cut or OS crash. durable=True commits with
+        synchronous = FULL instead, so the commit is on disk when this
+        returns; only the outermost transaction's setting counts.
+        """
+        conn = self.connection()
+        if conn.in_transaction:
+            yield conn
+            return
+        if durable:
+            previous = conn.execute("PRAGMA synchronous").fetchone()[0]
+            conn.execute("PRAGMA synchronous = FULL")
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
+            else:
+                conn.commit()
+        finally:
+            if durable:
+                conn.execute(f"PRAGMA synchronous = {previous}")
+
+    @contextmanager
+    def bulk_load(self):
+        """
+        Like transaction(), for writing a large number of rows. The summary
+        and search triggers on entries are dropped for the duration and
+        summary_totals and entries_fts rebuilt once at the end, which is
+        far cheaper than the per-row trigger work past a few thousand rows.
+        The triggers come back even if the block fails, as the rollback
+        undoes the drop. modified_at is still maintained row by row.
+        """
+        with self.transaction() as conn:
+            triggers = [(name, sql) for name, sql in conn.execute(
+                "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'entries'")
+                if name.startswith(DERIVED_TRIGGER_PREFIXES)]
+            for name, _ in triggers:
+                conn.execute(f'DROP TRIGGER "{name}"')
+            yield conn
+            _rebuild_summary(conn)
+            if self.has_fts():
+                conn.execute("INSERT INTO entries_fts (entries_fts) VALUES ('rebuild')")
+            for _, sql in triggers:
+                conn.execute(sql)
+        # The rebuilt summary_totals isn't tracked by the change generation
+        self.results.clear()
+
+    def init_db(self):
+        """
+        Bring the schema up to date. Each migration runs once, in its own
+        transaction, and PRAGMA user_version records how many have been
+        applied, so an up-to-date database costs a single pragma read.
+        """
+        conn = self.connection()
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+            with self.transaction() as conn:
+                migration(conn)
+                conn.execute(f"PRAGMA user_version = {number}")
+
+    def add_entry(self, date, name, type_, hours, travel_time, recorded=False, notes=None):
+        """Insert one entry and return its id. date must be YYYY-MM-DD."""
+        check_date(date)
+        cursor = self.connection().execute(
+            SQL_INSERT_ENTRY, (date, name, type_, hours, travel_time, int(recorded), notes))
+        return cursor.lastrowid
+
+    def add_entries(self, rows):
+        """
+        Insert many (date, name, type, hours, travel_time, recorded, notes)
+        rows with one executemany. Callers wanting all-or-nothing semantics
+        should wrap this in transaction(). A row with a bad date raises
+        ValueError, after the rows before it were inserted.
+        """
+        cursor = self.connection().executemany(SQL_INSERT_ENTRY, checked_dates(rows, 0))
+        return cursor.rowcount
+
+    def update_entry(self, entry_id, date, name, type_, hours, travel_time, recorded=False, notes=None):
+        check_date(date)
+        self.connection().execute(
+            SQL_UPDATE_ENTRY, (date, name, type_, hours, travel_time, int(recorded), notes, entry_id))
+
+    def set_recorded(self, entry_id, recorded):
+        self.connection().execute(SQL_SET_RECORDED, (int(recorded), entry_id))
+
+    def delete_entry(self, entry_id):
+        self.connection().execute(SQL_DELETE_ENTRY, (entry_id,))
+
+    def set_recorded_many(self, entry_ids, recorded):
+        """Set the recorded flag of every entry in entry_ids in one transaction."""
+        with self.transaction() as conn:
+            for chunk, marks in _id_chunks(entry_ids):
+                conn.execute(f"UPDATE entries SET recorded = ? WHERE id IN ({marks})", [int(recorded)] + chunk)
+
+    def set_type_many(self, entry_ids, type_):
+        """Change the type of every entry in entry_ids in one transaction."""
+        with self.transaction() as conn:
+            for chunk, marks in _id_chunks(entry_ids):
+                conn.execute(f"UPDATE entries SET type = ? WHERE id IN ({marks})", [type_] + chunk)
+
+    def delete_entries(self, entry_ids):
+        """Delete every entry in entry_ids in one transaction."""
+        with self.transaction() as conn:
+            for chunk, marks in _id_chunks(entry_ids):
+                conn.execute(f"DELETE FROM entries WHERE id IN ({marks})", chunk)
+
+    def restore_recorded(self, values):
+        """Set the recorded flag back for each (id, recorded) pair, touching no other column."""
+        with self.transaction() as conn:
+            conn.executemany("UPDATE entries SET recorded = ? WHERE id = ?",
+                             ((int(recorded), id_) for id_, recorded in values))
+
+    def restore_types(self, values):
+        """Set the type back for each (id, type) pair, touching no other column."""
+        with self.transaction() as conn:
+            conn.executemany("UPDATE entries SET type = ? WHERE id = ?", ((type_, id_) for id_, type_ in values))
+
+    def restore_entries(self, entries):
+        """
+        Write back (id, date, name, type, hours, travel, recorded, notes)
+        entries, as fetched earlier, re-creating deleted ones under their
+        old ids. Used to undo bulk deletes. Dates aren't checked again:
+        these rows were stored already, and may hold a legacy date
+        _migrate_day couldn't read, which must come back as it was.
+        """
+        with self.transaction() as conn:
+            conn.executemany(SQL_RESTORE_ENTRY, (
+                (id_, date, name, type_, hours, travel, int(recorded), notes)
+                for id_, date, name, type_, hours, travel, recorded, notes in entries))
+
+    def fetch_entries_by_id(self, entry_ids, entry_filter=None):
+        """
+        Return the entries among entry_ids that still exist (and pass
+        entry_filter, if given), in fetch_entries() order.
+        """
+        where, params = self._where(entry_filter) if entry_filter else ("1", [])
+        rows = []
+        conn = self.connection()
+        for chunk, marks in _id_chunks(entry_ids):
+            rows += conn.execute(
+                f"SELECT {ENTRY_COLUMNS} FROM entries WHERE id IN ({marks}) AND {where}", chunk + params)
+        rows.sort(key=lambda row: (row[1], row[0]), reverse=True)
+        return [_entry_from_row(row) for row in rows]
+
+    def existing_ids(self, entry_ids):
+        """The set of ids among entry_ids that belong to an entry."""
+        conn = self.connection()
+        found = set()
+        for chunk, marks in _id_chunks(entry_ids):
+            found.update(id_ for (id_,) in conn.execute(f"SELECT id FROM entries WHERE id IN ({marks})", chunk))
+        return found
+
+    def fetch_entry(self, entry_id):
+        row = self.connection().execute(SQL_SELECT_ENTRY, (entry_id,)).fetchone()
+        return _entry_from_row(row) if row else None
+
+    @instrumented("database.fetch_entries", rows=lambda result, *_: len(result))
+    def fetch_entries(self):
+        rows = self.connection().execute(SQL_SELECT_ENTRIES).fetchall()
+        return [_entry_from_row(row) for row in rows]
+
+    def has_fts(self):
+        """Whether entries_fts exists, i.e. SQLite had FTS5 when the schema was migrated."""
+        if self._has_fts is None:
+            self._has_fts = self.connection().execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'entries_fts'").fetchone() is not None
+        return self._has_fts
+
+    def _where(self, entry_filter):
+        return entry_filter.where(use_fts=self.has_fts())
+
+    def change_generation(self):
+        """The current change generation; see MODIFIED_SCHEMA."""
+        return self.connection().execute("SELECT value FROM change_generation").fetchone()[0]
+
+    def database_id(self):
+        """
+        A random token set when the schema is created and replaced when a
+        backup is restored, so it only names one history of change
+        generations.
+        """
+        return self.connection().execute("SELECT value FROM meta WHERE key = 'database_id'").fetchone()[0]
+
+    def iter_entries_modified_since(self, generation, batch_size=1000):
+        """Yield every entry inserted or updated after generation, in fetch_entries() order."""
+        cursor = self.connection().execute(
+            f"SELECT {ENTRY_COLUMNS} FROM entries WHERE modified_at > ? ORDER BY date DESC, id DESC",
+            (generation,))
+        try:
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    return
+                for row in rows:
+                    yield _entry_from_row(row)
+        finally:
+            cursor.close()
+
+    def entry_ids(self):
+        """The set of every entry id."""
+        return {id_ for (id_,) in self.connection().execute("SELECT id FROM entries")}
+
+    def iter_entries(self, batch_size=1000, entry_filter=None):
+        """
+        Yield every entry in fetch_entries() order without materialising the
+        whole table; rows are pulled from the cursor batch_size at a time.
+        entry_filter, an EntryFilter, restricts which entries are yielded.
+        """
+        if entry_filter:
+            where, params = self._where(entry_filter)
+            cursor = self.connection().execute(
+                f"SELECT {ENTRY_COLUMNS} FROM entries WHERE {where} ORDER BY date DESC, id DESC", params)
+        else:
+            cursor = self.connection().execute(SQL_SELECT_ENTRIES)
+        try:
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    return
+                for row in rows:
+                    yield _entry_from_row(row)
+        finally:
+            cursor.close()
+
+    def fetch_entries_page(self, after=None, limit=PAGE_SIZE, entry_filter=None):
+        """
+        Return up to limit entries ordered by (date, id) descending.
+        after is the (date, id) key of the last entry already loaded; pass
+        None for the first page. entry_filter narrows the entries paged
+        through.
+        """
+        if entry_filter:
+            where, params = self._where(entry_filter)
+            if after is not None:
+                where += " AND (date, id) < (?, ?)"
+                params += list(after)
+            rows = self.connection().execute(
+                f"SELECT {ENTRY_COLUMNS} FROM entries WHERE {where} ORDER BY date DESC, id DESC LIMIT ?",
+                params + [limit]).fetchall()
+        elif after is None:
+            rows = self.connection().execute(SQL_SELECT_FIRST_PAGE, (limit,)).fetchall()
+        else:
+            date, id_ = after
+            rows = self.connection().execute(SQL_SELECT_NEXT_PAGE, (date, id_, limit)).fetchall()
+        return [_entry_from_row(row) for row in rows]
+
+    @instrumented("database.get_summary", rows=lambda result, *_: len(result[0]))
+    def get_summary(self):
+        """
+        Return (summary, totals, recorded_totals) from summary_totals:
+        summary is a list of (type, hours, travel) per type, totals is
+        (hours, travel) over everything and recorded_totals maps
+        True/False to the (hours, travel) of recorded/unrecorded entries.
+        The result is cached in self.results; don't modify it.
+        """
+        return self.results.get("summary", self._get_summary)
+
+    def _get_summary(self):
+        by_type = {}
+        recorded_totals = {True: (0.0, 0.0), False: (0.0, 0.0)}
+        for type_, recorded, hours, travel in self.connection().execute(SQL_SUMMARY):
+            h, t = by_type.get(type_, (0.0, 0.0))
+            by_type[type_] = (h + hours, t + travel)
+            h, t = recorded_totals[bool(recorded)]
+            recorded_totals[bool(recorded)] = (h + hours, t + travel)
+        summary = [(type_, h, t) for type_, (h, t) in by_type.items()]
+        totals = tuple(recorded_totals[True][i] + recorded_totals[False][i] for i in range(2))
+        return summary, totals, recorded_totals
+
+    def count_entries(self, entry_filter=None):
+        """
+        Number of entries, read from summary_totals rather than counted
+        unless entry_filter narrows them.
+        """
+        if entry_filter:
+            where, params = self._where(entry_filter)
+            return self.connection().execute(f"SELECT COUNT(*) FROM entries WHERE {where}", params).fetchone()[0]
+        return self.connection().execute("SELECT COALESCE(SUM(entries), 0) FROM summary_totals").fetchone()[0]
+
+    def verify_summary(self):
+        """
+        Compare summary_totals with totals computed from entries. Returns a
+        list of (type, recorded, stored, actual) for every row that differs,
+        where stored/actual are (hours, travel, entries) or None.
+        """
+        conn = self.connection()
+        stored = {(type_, bool(rec)): (h, t, n) for type_, rec, h, t, n in conn.execute(
+            "SELECT type, recorded, hours, travel, entries FROM summary_totals")}
+        actual = {(type_, bool(rec)): (h, t, n) for type_, rec, h, t, n in conn.execute(
+            SQL_SUMMARY_FROM_ENTRIES)}
+        mismatches = []
+        for key in sorted(stored.keys() | actual.keys()):
+            a, b = stored.get(key), actual.get(key)
+            if a is None or b is None or a[2] != b[2] or any(
+                    abs(x - y) > SUMMARY_TOLERANCE for x, y in zip(a[:2], b[:2])):
+                mismatches.append((key[0], key[1], a, b))
+        return mismatches
+
+    def rebuild_summary(self):
+        """Recompute summary_totals from the entries table."""
+        with self.transaction() as conn:
+            _rebuild_summary(conn)
+        # No entry changed, so the generation hasn't moved to invalidate
+        # a get_summary() cached from the old totals
+        self.results.clear()
+
+    def vacuum(self):
+        """Checkpoint the WAL, rebuild the file to reclaim space and refresh planner statistics."""
+        conn = self.connection()
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        conn.execute("VACUUM")
+        conn.execute("PRAGMA optimize")
+
+    def reset_all_entries(self):
+        self.connection().execute("DELETE FROM entries")
+
+    def backup(self, path, progress=None):
+        """
+        Copy the whole database to path with SQLite's online backup API.
+        Other connections can keep reading and writing while it runs.
+        progress, if given, is called with (pages_copied, total_pages).
+        """
+        target = sqlite3.connect(path)
+        try:
+            self.connection().backup(target, pages=BACKUP_STEP_PAGES, progress=_backup_progress(progress))
+        finally:
+            target.close()
+
+    def restore_backup(self, path, progress=None):
+        """
+        Replace every table in this database with the copy at path, made by
+        backup(), then migrate it if it came from an older version.
+        progress, if given, is called with (pages_copied, total_pages).
+        """
+        source = sqlite3.connect(f"{Path(path).resolve().as_uri()}?mode=ro", uri=True)
+        try:
+            try:
+                has_entries = source.execute("SELECT 1 FROM sqlite_master WHERE name = 'entries'").fetchone()
+            except sqlite3.DatabaseError:
+                has_entries = None
+            if has_entries is None:
+                raise ValueError(f"{path} is not an Hour Tracker database")
+            source.backup(self.connection(), pages=BACKUP_STEP_PAGES, progress=_backup_progress(progress))
+        finally:
+            source.close()
+        self._has_fts = None
+        # The restored change generation may repeat one already cached
+        self.results.clear()
+        self.init_db()
+        # Generations count again from the backup's, so exports tracked
+        # against this database must not take them for ones they've seen
+        with self.transaction() as conn:
+            _new_database_id(conn)
+
+
+_default_repository = None
+_backend = None
+_default_lock = threading.Lock()
+
+def get_repository():
+    """Return the process-wide repository for DB_FILE."""
+    global _default_repository
+    with _default_lock:
+        if _default_repository is None:
+            _default_repository = Repository(DB_FILE)
+        return _default_repository
+
+def get_backend():
+    """
+    Return the StorageBackend behind the module-level helpers below: a
+    RemoteBackend for the entry service named by SERVER_ENV if it is set,
+    otherwise get_repository().
+    """
+    global _backend
+    if _backend is None:
+        url = os.getenv(SERVER_ENV)
+        if url:
+            from .entry_service import RemoteBackend
+            backend = RemoteBackend(url)
+        else:
+            backend = get_repository()
+        with _default_lock:
+            if _backend is None:
+                _backend = backend
+    return _backend
+
+def set_backend(backend):
+    """Send the module-level helpers to backend; None goes back to the default."""
+    global _backend
+    with _default_lock:
+        _backend = backend
+
+# Module-level helpers kept for existing callers; they all go through the
+# shared backend rather than opening a connection per call.
+def init_db():
+    get_backend().init_db()
 
 def add_entry(date, name, type_, hours, travel_time, recorded=False, notes=None):
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute("INSERT INTO entries (date, name, type, hours, travel_time, recorded, notes) VALUES (?, ?, ?, ?, ?, ?, ?)",
-                   (date, name, type_, hours, travel_time, int(recorded), notes))
-    conn.commit()
-    conn.close()
+    return get_backend().add_entry(date, name, type_, hours, travel_time, recorded, notes)
 
 def delete_entry(entry_id):
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM entries WHERE id = ?", (entry_id,))
-    conn.commit()
-    conn.close()
+    get_backend().delete_entry(entry_id)
 
 def update_entry(entry_id, date, name, type_, hours, travel_time, recorded=False, notes=None):
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute("""
-        UPDATE entries
-        SET date = ?, name = ?, type = ?, hours = ?, travel_time = ?, recorded = ?, notes = ?
-        WHERE id = ?
-    """, (date, name, type_, hours, travel_time, int(recorded), notes, entry_id))
-    conn.commit()
-    conn.close()
+    get_backend().update_entry(entry_id, date, name, type_, hours, travel_time, recorded, notes)
 
 def fetch_entries():
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, date, name, type, hours, travel_time, recorded, notes FROM entries ORDER BY date DESC")
-    entries = cursor.fetchall()
-    conn.close()
-    # Convert recorded from int to bool
-    return [(id_, date, name, type_, hours, travel, bool(recorded), notes) for id_, date, name, type_, hours, travel, recorded, notes in entries]
+    return get_backend().fetch_entries()
 
 def get_summary():
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute("SELECT type, SUM(hours) as total_hours, SUM(travel_time) as total_travel FROM entries GROUP BY type")
-    summary = cursor.fetchall()
-
-    cursor.execute("SELECT SUM(hours), SUM(travel_time) FROM entries")
-    totals = cursor.fetchone()
-    conn.close()
-    return summary, totals
+    return get_backend().get_summary()
 
 def reset_all_entries():
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM entries")
-    conn.commit()
-    conn.close()
+    get_backend().reset_all_entries()
@@ -0,0 +1,85 @@
+# diagnostics.py
+from PySide6.QtCore import Qt, QTimer
+from PySide6.QtGui import QFontDatabase
+from PySide6.QtWidgets import QCheckBox, QHBoxLayout, QPlainTextEdit, QPushButton, QVBoxLayout, QWidget
+
+from .instrumentation import RECORDER
+
+# How often the open panel re-reads the recorder
+REFRESH_INTERVAL_MS = 1000
+
+
+class DiagnosticsPanel(QWidget):
+    """
+    Tool window showing instrumentation.RECORDER's call and SQL timings.
+    Its checkboxes switch recording and SQL tracing for repo on and off;
+    the report refreshes while the panel is visible. repo is None for a
+    window on an entry service, whose SQL and result cache are the
+    server's: only the call timings are shown then.
+    """
+
+    def __init__(self, repo, parent=None):
+        super().__init__(parent, Qt.Tool)
+        self.repo = repo
+        self.setWindowTitle("Diagnostics")
+        self.resize(760, 420)
+
+        self.record_check = QCheckBox("Record timings")
+        self.record_check.setChecked(RECORDER.enabled)
+        self.record_check.toggled.connect(self.set_recording)
+        self.trace_check = QCheckBox("Trace SQL statements")
+        self.trace_check.setChecked(RECORDER.trace_sql)
+        self.trace_check.setEnabled(RECORDER.enabled and repo is not None)
+        if repo is None:
+            self.trace_check.setToolTip("Not supported in remote mode")
+        self.trace_check.toggled.connect(self.set_tracing)
+        reset_btn = QPushButton("Reset")
+        reset_btn.clicked.connect(self.reset)
+        controls = QHBoxLayout()
+        controls.addWidget(self.record_check)
+        controls.addWidget(self.trace_check)
+        controls.addStretch()
+        controls.addWidget(reset_btn)
+
+        self.report_view = QPlainTextEdit()
+        self.report_view.setReadOnly(True)
+        self.report_view.setLineWrapMode(QPlainTextEdit.NoWrap)
+        self.report_view.setFont(QFontDatabase.systemFont(QFontDatabase.FixedFont))
+
+        layout = QVBoxLayout()
+        layout.addLayout(controls)
+        layout.addWidget(self.report_view)
+        self.setLayout(layout)
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(REFRESH_INTERVAL_MS)
+        self.timer.timeout.connect(self.refresh)
+
+    def set_recording(self, enabled):
+        RECORDER.enabled = enabled
+        self.trace_check.setEnabled(enabled and self.repo is not None)
+        self.set_tracing(enabled and self.trace_check.isChecked())
+
+    def set_tracing(self, enabled):
+        RECORDER.trace_sql = enabled
+        if self.repo is not None:
+            self.repo.set_trace_callback(RECORDER.trace_statement if enabled else None)
+
+    def reset(self):
+        RECORDER.reset()
+        self.refresh()
+
+    def refresh(self):
+        if self.repo is None:
+            self.report_view.setPlainText(RECORDER.report())
+        else:
+            self.report_view.setPlainText(f"{self.repo.results.stats()}\n\n{RECORDER.report()}")
+
+    def showEvent(self, event):
+        self.refresh()
+        self.timer.start()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.timer.stop()
+        super().hideEvent(event)
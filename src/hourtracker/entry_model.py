@@ -0,0 +1,247 @@
+# entry_model.py
+from PySide6.QtCore import QAbstractTableModel, QModelIndex, Qt, Signal
+
+from .database import PAGE_SIZE
+from .entry_store import EntryStore
+from .instrumentation import instrumented
+
+# entry: (id, date, name, type, hours, travel, recorded, notes)
+COLUMNS = ["Date", "Name", "Type", "Hours", "Travel", "Total", "Recorded", "Notes"]
+RECORDED_COLUMN = 6
+NUMERIC_COLUMNS = (3, 4, 5)
+
+
+def _key(entry):
+    return (entry[1], entry[0])
+
+
+def _row_key(store, row):
+    return (store.date(row), store.ids[row])
+
+
+def _runs(rows):
+    """Group sorted row numbers into (first, last) runs of adjacent rows."""
+    runs = []
+    for row in rows:
+        if runs and row == runs[-1][1] + 1:
+            runs[-1][1] = row
+        else:
+            runs.append([row, row])
+    return runs
+
+
+class EntryTableModel(QAbstractTableModel):
+    """
+    Table model over an EntryStore of entries, kept in (date, id)
+    descending order like fetch_entries(). Mutations touch only the affected
+    rows and emit the matching dataChanged/rowsInserted/rowsRemoved signals,
+    so the view never has to rebuild the whole table.
+
+    Given a fetch_page(after, limit) callable the model loads lazily: the
+    view pulls further pages through canFetchMore/fetchMore as the user
+    scrolls.
+    """
+
+    # Emitted when the user toggles a Recorded checkbox: (entry id, recorded)
+    recordedToggled = Signal(int, bool)
+
+    def __init__(self, fetch_page=None, page_size=PAGE_SIZE, parent=None):
+        super().__init__(parent)
+        self._fetch_page = fetch_page
+        self._page_size = page_size
+        self.store = EntryStore()
+        self._row_by_id = None  # rebuilt lazily after rows move
+        self._cursor = None  # (date, id) of the last row fetched
+        self._exhausted = fetch_page is None
+
+    # --- Qt model interface
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.store)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return COLUMNS[section]
+        return section + 1
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        store, row, column = self.store, index.row(), index.column()
+        if role == Qt.DisplayRole:
+            if column == 0:
+                return store.date(row)
+            if column == 1:
+                return store.names[store.name_codes[row]]
+            if column == 2:
+                return store.types[store.type_codes[row]]
+            if column == 3:
+                return f"{store.hours[row]:.2f}"
+            if column == 4:
+                return f"{store.travel[row]:.2f}"
+            if column == 5:
+                return f"{store.hours[row] + store.travel[row]:.2f}"
+            if column == 7:
+                return store.notes.get(store.ids[row], "")
+        elif role == Qt.CheckStateRole and column == RECORDED_COLUMN:
+            return Qt.Checked if store.is_recorded(row) else Qt.Unchecked
+        elif role == Qt.TextAlignmentRole and column in NUMERIC_COLUMNS:
+            return int(Qt.AlignRight | Qt.AlignVCenter)
+        return None
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self._exhausted
+
+    @instrumented("model.fetchMore")
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self._exhausted:
+            return
+        page = self._fetch_page(self._cursor, self._page_size)
+        if len(page) < self._page_size:
+            self._exhausted = True
+        if not page:
+            return
+        self._cursor = _key(page[-1])
+        first = len(self.store)
+        self.beginInsertRows(QModelIndex(), first, first + len(page) - 1)
+        self.store.extend(page)
+        self._row_by_id = None
+        self.endInsertRows()
+
+    def flags(self, index):
+        flags = super().flags(index)
+        if index.isValid() and index.column() == RECORDED_COLUMN:
+            flags |= Qt.ItemIsUserCheckable
+        return flags
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if not index.isValid() or role != Qt.CheckStateRole or index.column() != RECORDED_COLUMN:
+            return False
+        row = index.row()
+        recorded = Qt.CheckState(value) == Qt.Checked
+        if recorded == self.store.is_recorded(row):
+            return False
+        self.store.set_recorded(row, recorded)
+        self.dataChanged.emit(index, index, [Qt.CheckStateRole])
+        self.recordedToggled.emit(self.store.ids[row], recorded)
+        return True
+
+    # --- Row store
+
+    def entry_at(self, row):
+        """Return an EntryRow view of row; read it before the rows change."""
+        return self.store[row]
+
+    def row_of(self, entry_id):
+        """Return the row holding entry_id, or None if it isn't loaded."""
+        if self._row_by_id is None:
+            self._row_by_id = {entry_id: row for row, entry_id in enumerate(self.store.ids)}
+        return self._row_by_id.get(entry_id)
+
+    def _insert_position(self, key):
+        # Rows are sorted by (date, id) descending
+        lo, hi = 0, len(self.store)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if _row_key(self.store, mid) > key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def set_entries(self, entries):
+        """Replace the rows with a fully loaded list of entries."""
+        self.beginResetModel()
+        self.store = EntryStore(entries)
+        self._row_by_id = None
+        self._cursor = None
+        self._exhausted = True
+        self.endResetModel()
+
+    def reload(self):
+        """Drop all loaded rows and fetch the first page again."""
+        self.beginResetModel()
+        self.store = EntryStore()
+        self._row_by_id = None
+        self._cursor = None
+        self._exhausted = self._fetch_page is None
+        self.endResetModel()
+        self.fetchMore()
+
+    def set_fetch_page(self, fetch_page):
+        """Page through a different source, such as a newly filtered query, from the top."""
+        self._fetch_page = fetch_page
+        self.reload()
+
+    def insert_entry(self, entry):
+        key = _key(entry)
+        if not self._exhausted and self._cursor is not None and key < self._cursor:
+            # Sorts into the part of the table that hasn't been fetched yet;
+            # it will arrive with a later page.
+            return None
+        row = self._insert_position(key)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.store.insert(row, entry)
+        self._row_by_id = None
+        self.endInsertRows()
+        return row
+
+    def update_entry(self, entry):
+        row = self.row_of(entry[0])
+        if row is None:
+            return self.insert_entry(entry)
+        if _row_key(self.store, row) != _key(entry):
+            # The date changed, so the row moves to keep the sort order
+            self.remove_entry(entry[0])
+            return self.insert_entry(entry)
+        self.store.replace(row, entry)
+        self.dataChanged.emit(self.index(row, 0), self.index(row, len(COLUMNS) - 1))
+        return row
+
+    def set_recorded(self, entry_id, recorded):
+        """Change one loaded row's Recorded checkbox without emitting recordedToggled."""
+        row = self.row_of(entry_id)
+        if row is None or self.store.is_recorded(row) == recorded:
+            return
+        self.store.set_recorded(row, recorded)
+        index = self.index(row, RECORDED_COLUMN)
+        self.dataChanged.emit(index, index, [Qt.CheckStateRole])
+
+    def update_entries(self, entries):
+        """
+        Apply many saved entries at once. Rows that keep their place are
+        rewritten and announced with one dataChanged per run of adjacent
+        rows; entries whose date moved them, or that aren't loaded yet, go
+        through update_entry.
+        """
+        in_place, moved = [], []
+        for entry in entries:
+            row = self.row_of(entry[0])
+            if row is not None and _row_key(self.store, row) == _key(entry):
+                in_place.append((row, entry))
+            else:
+                moved.append(entry)
+        for row, entry in in_place:
+            self.store.replace(row, entry)
+        for first, last in _runs(sorted(row for row, _ in in_place)):
+            self.dataChanged.emit(self.index(first, 0), self.index(last, len(COLUMNS) - 1))
+        for entry in moved:
+            self.update_entry(entry)
+
+    def remove_entry(self, entry_id):
+        self.remove_entries([entry_id])
+
+    def remove_entries(self, entry_ids):
+        """Remove the loaded rows of entry_ids, one rowsRemoved per run of adjacent rows."""
+        rows = sorted(row for row in map(self.row_of, entry_ids) if row is not None)
+        # Last run first, so the earlier row numbers stay valid
+        for first, last in reversed(_runs(rows)):
+            self.beginRemoveRows(QModelIndex(), first, last)
+            self.store.delete_range(first, last + 1)
+            self._row_by_id = None
+            self.endRemoveRows()
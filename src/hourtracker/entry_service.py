@@ -0,0 +1,596 @@
+# entry_service.py
+"""
+A small HTTP/JSON service that puts one entries database behind a single
+process, so several people can log hours into a shared unit database
+without each of them taking SQLite's file lock over a network drive.
+
+    python -m hourtracker --db unit.db serve --host 0.0.0.0
+
+Reads run on a fixed pool of worker threads, each keeping its own SQLite
+connection. Writes from every client go to one writer thread, which
+commits whatever has queued up in a single transaction, so a burst of
+saves from several people costs one commit rather than one each.
+
+RemoteBackend is the blocking client and a database.StorageBackend, so the
+module-level database functions and the window can be pointed at a server
+(see database.SERVER_ENV). AsyncEntryClient makes the same calls as coroutines.
+serve_local() runs a server on a free localhost port in a background
+thread, as a stand-in for a real one in tests and benchmarks.
+
+There is no authentication; only listen on a network you trust.
+"""
+import asyncio
+import http.client
+import json
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+from . import analytics
+from .database import PAGE_SIZE, EntryFilter, StorageBackend
+
+DEFAULT_PORT = 8765
+# Worker threads, and so SQLite connections, serving reads
+READ_WORKERS = 4
+# How long, in seconds, the writer waits for more writes to share a commit
+BATCH_DELAY = 0.002
+# Most write operations committed together
+MAX_BATCH = 1000
+# Idle keep-alive connections each client holds on to
+CLIENT_POOL_SIZE = 4
+# Seconds an idle client connection is kept open by the server
+IDLE_TIMEOUT = 60
+# Rows per request when a client fetches every entry
+FETCH_PAGE_SIZE = 5000
+# Ids per GET /entries/by-id request, keeping the URL a sensible length
+IDS_PER_REQUEST = 500
+
+# Operations accepted by POST /batch, with the Repository method each runs
+WRITE_OPERATIONS = {
+    "add": "add_entry",
+    "update": "update_entry",
+    "set_recorded": "set_recorded",
+    "delete": "delete_entry",
+    "reset": "reset_all_entries",
+}
+# EntryFilter arguments by query parameter
+FILTER_PARAMETERS = {"text": "text", "type": "type_", "name": "name", "recorded": "recorded",
+                     "from": "date_from", "to": "date_to"}
+
+
+class ServiceError(Exception):
+    """The entry service refused or failed a request."""
+
+
+# --- Server
+
+class _WriteBatcher:
+    """Commits the write requests queued by handler threads, many per transaction, on one thread."""
+
+    def __init__(self, repo, delay=BATCH_DELAY, max_batch=MAX_BATCH):
+        self.repo = repo
+        self.delay = delay
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="entry-service-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, operations):
+        """Queue a request's (name, args) operations; returns a Future of their results."""
+        future = Future()
+        self._queue.put((operations, future))
+        return future
+
+    def close(self):
+        """Commit everything already queued, then stop the writer thread."""
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            request = self._queue.get()
+            if request is None:
+                return
+            batch = [request]
+            size = len(request[0])
+            deadline = time.monotonic() + self.delay
+            closing = False
+            while size < self.max_batch:
+                try:
+                    request = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if request is None:
+                    closing = True
+                    break
+                batch.append(request)
+                size += len(request[0])
+            self._commit(batch)
+            if closing:
+                return
+
+    def _commit(self, batch):
+        try:
+            with self.repo.transaction() as conn:
+                results = [self._apply(conn, operations) for operations, _ in batch]
+        except BaseException as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def _apply(self, conn, operations):
+        # Each request is all or nothing without failing the rest of the batch
+        conn.execute("SAVEPOINT request")
+        try:
+            results = [getattr(self.repo, WRITE_OPERATIONS[name])(*args) for name, args in operations]
+        except Exception as e:
+            conn.execute("ROLLBACK TO request")
+            conn.execute("RELEASE request")
+            return e
+        conn.execute("RELEASE request")
+        return results
+
+
+def _entry_filter(query):
+    arguments = {}
+    for parameter, argument in FILTER_PARAMETERS.items():
+        if parameter in query:
+            value = query[parameter][-1]
+            arguments[argument] = value == "1" if parameter == "recorded" else value
+    return EntryFilter(**arguments)
+
+
+def _summary_json(summary):
+    by_type, totals, recorded_totals = summary
+    return {"summary": by_type, "totals": totals,
+            "recorded": {"true": recorded_totals[True], "false": recorded_totals[False]}}
+
+
+def _overview_json(overview):
+    return dict(_summary_json(overview[:3]), year=overview.year, month=overview.month)
+
+
+def _ids(query):
+    return [int(id_) for id_ in query["ids"][-1].split(",") if id_]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "HourTracker"
+    timeout = IDLE_TIMEOUT
+    # Headers and body go out as separate writes; don't let the body wait
+    # for the client's delayed ACK
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle(self, route):
+        try:
+            self._send(200, route())
+        except (ValueError, TypeError, KeyError, ServiceError, sqlite3.IntegrityError) as e:
+            self._send(400, {"error": str(e)})
+        except Exception as e:
+            self._send(500, {"error": f"{type(e).__name__}: {e}"})
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        routes = {
+            "/entries": lambda: self._entries(query),
+            "/count": lambda: {"count": self.server.read(self.server.repo.count_entries, _entry_filter(query))},
+            "/summary": lambda: _summary_json(self.server.read(self.server.repo.get_summary)),
+            "/generation": lambda: {"generation": self.server.read(self.server.repo.change_generation)},
+            "/entries/by-id": lambda: {"entries": self.server.read(
+                self.server.repo.fetch_entries_by_id, _ids(query), _entry_filter(query))},
+            "/overview": lambda: _overview_json(self.server.read(
+                analytics.overview, self.server.repo, date.fromisoformat(query["today"][-1]))),
+        }
+        route = routes.get(url.path)
+        if route is None:
+            self._send(404, {"error": f"no such resource: {url.path}"})
+        else:
+            self._handle(route)
+
+    def _entries(self, query):
+        after = None
+        if "after_date" in query:
+            after = (query["after_date"][-1], int(query["after_id"][-1]))
+        limit = int(query.get("limit", [PAGE_SIZE])[-1])
+        entries = self.server.read(self.server.repo.fetch_entries_page, after, limit, _entry_filter(query))
+        return {"entries": entries}
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length)
+        if self.path != "/batch":
+            self._send(404, {"error": f"no such resource: {self.path}"})
+            return
+        self._handle(lambda: {"results": self.server.write(json.loads(body)["operations"])})
+
+
+class EntryServer(ThreadingHTTPServer):
+    """
+    Serves repo, an open database.Repository, over HTTP. Each client
+    connection gets a handler thread, but the database is only touched by
+    the READ_WORKERS reader threads and the writer thread.
+    """
+    daemon_threads = True
+
+    def __init__(self, repo, host="127.0.0.1", port=DEFAULT_PORT, read_workers=READ_WORKERS,
+                 batch_delay=BATCH_DELAY, verbose=False):
+        super().__init__((host, port), _Handler)
+        self.repo = repo
+        self.verbose = verbose
+        self._readers = ThreadPoolExecutor(read_workers, thread_name_prefix="entry-service-reader")
+        self._writer = _WriteBatcher(repo, batch_delay)
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def read(self, function, *args):
+        """Run function(*args) on a reader thread and return its result."""
+        return self._readers.submit(function, *args).result()
+
+    def write(self, operations):
+        """Commit a list of [name, args] operations as one unit and return their results."""
+        operations = [(name, list(args)) for name, args in operations]
+        for name, _ in operations:
+            if name not in WRITE_OPERATIONS:
+                raise ServiceError(f"unknown operation: {name}")
+        return self._writer.submit(operations).result()
+
+    def server_close(self):
+        super().server_close()
+        self._writer.close()
+        self._readers.shutdown()
+
+
+@contextmanager
+def serve_local(repo, **options):
+    """
+    Run an EntryServer for repo on a free localhost port in a background
+    thread for the duration of the block, yielding the server; its url
+    attribute is what clients connect to.
+    """
+    server = EntryServer(repo, host="127.0.0.1", port=0, **options)
+    thread = threading.Thread(target=server.serve_forever, name="entry-service", daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        thread.join()
+        server.server_close()
+
+
+# --- Clients
+
+def _split_url(url):
+    parts = urlsplit(url)
+    if parts.scheme != "http" or not parts.hostname:
+        raise ValueError(f"not an http:// entry service URL: {url}")
+    return parts.hostname, parts.port or 80
+
+
+def _query(path, after=None, limit=None, entry_filter=None, ids=None):
+    params = {}
+    if ids is not None:
+        params["ids"] = ",".join(str(id_) for id_ in ids)
+    if after is not None:
+        params["after_date"], params["after_id"] = after
+    if limit is not None:
+        params["limit"] = limit
+    if entry_filter:
+        for parameter, argument in FILTER_PARAMETERS.items():
+            value = getattr(entry_filter, "type" if argument == "type_" else argument)
+            if value not in (None, ""):
+                params[parameter] = int(value) if parameter == "recorded" else value
+    return f"{path}?{urlencode(params)}" if params else path
+
+
+def _decode(status, data):
+    payload = json.loads(data)
+    if status != 200:
+        raise ServiceError(payload.get("error", f"HTTP {status}"))
+    return payload
+
+
+def _entries(payload):
+    return [tuple(entry) for entry in payload["entries"]]
+
+
+def _summary(payload):
+    recorded = payload["recorded"]
+    return ([tuple(row) for row in payload["summary"]], tuple(payload["totals"]),
+            {True: tuple(recorded["true"]), False: tuple(recorded["false"])})
+
+
+def _overview(payload):
+    return analytics.Overview(*_summary(payload), analytics.Bucket(*payload["year"]),
+                              analytics.Bucket(*payload["month"]))
+
+
+def _by_id_queries(entry_ids, entry_filter):
+    entry_ids = list(entry_ids)
+    for start in range(0, len(entry_ids), IDS_PER_REQUEST):
+        yield _query("/entries/by-id", entry_filter=entry_filter, ids=entry_ids[start:start + IDS_PER_REQUEST])
+
+
+def _by_id_order(entries):
+    # fetch_entries() order across the merged requests
+    entries.sort(key=lambda entry: (entry[1], entry[0]), reverse=True)
+    return entries
+
+
+def _entry_operations(rows):
+    return [("add", [date, name, type_, hours, travel, bool(recorded), notes])
+            for date, name, type_, hours, travel, recorded, notes in rows]
+
+
+class RemoteBackend(StorageBackend):
+    """
+    A StorageBackend served by an EntryServer at url. Connections are kept
+    alive and reused, up to pool_size idle at once, so it is safe to share
+    between threads.
+    """
+
+    def __init__(self, url, pool_size=CLIENT_POOL_SIZE, timeout=30):
+        self.url = url
+        self.host, self.port = _split_url(url)
+        self.timeout = timeout
+        self._idle = queue.LifoQueue(pool_size)
+
+    def _request(self, method, path, payload=None):
+        body = None if payload is None else json.dumps(payload).encode("utf-8")
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        while True:
+            try:
+                conn, reused = self._idle.get_nowait(), True
+            except queue.Empty:
+                conn, reused = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout), False
+            try:
+                conn.request(method, path, body, headers)
+                response = conn.getresponse()
+                data = response.read()
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                if reused:
+                    continue  # the server dropped an idle connection; try another
+                raise
+            if response.will_close:
+                conn.close()
+            else:
+                try:
+                    self._idle.put_nowait(conn)
+                except queue.Full:
+                    conn.close()
+            return _decode(response.status, data)
+
+    def apply(self, operations):
+        """
+        Commit a list of (name, args) operations, named as in
+        WRITE_OPERATIONS, as one unit and return the result of each.
+        """
+        return self._request("POST", "/batch", {"operations": operations})["results"]
+
+    def init_db(self):
+        pass  # the server migrates its own database
+
+    def add_entry(self, date, name, type_, hours, travel_time, recorded=False, notes=None):
+        return self.apply([("add", [date, name, type_, hours, travel_time, recorded, notes])])[0]
+
+    def add_entries(self, rows):
+        return len(self.apply(_entry_operations(rows)))
+
+    def update_entry(self, entry_id, date, name, type_, hours, travel_time, recorded=False, notes=None):
+        self.apply([("update", [entry_id, date, name, type_, hours, travel_time, recorded, notes])])
+
+    def set_recorded(self, entry_id, recorded):
+        self.apply([("set_recorded", [entry_id, bool(recorded)])])
+
+    def delete_entry(self, entry_id):
+        self.apply([("delete", [entry_id])])
+
+    def delete_entries(self, entry_ids):
+        self.apply([("delete", [entry_id]) for entry_id in entry_ids])
+
+    def reset_all_entries(self):
+        self.apply([("reset", [])])
+
+    def fetch_entries_page(self, after=None, limit=PAGE_SIZE, entry_filter=None):
+        return _entries(self._request("GET", _query("/entries", after, limit, entry_filter)))
+
+    def fetch_entries(self):
+        entries = []
+        page = self.fetch_entries_page(limit=FETCH_PAGE_SIZE)
+        while page:
+            entries += page
+            page = self.fetch_entries_page((page[-1][1], page[-1][0]), FETCH_PAGE_SIZE)
+        return entries
+
+    def fetch_entries_by_id(self, entry_ids, entry_filter=None):
+        entries = []
+        for path in _by_id_queries(entry_ids, entry_filter):
+            entries += _entries(self._request("GET", path))
+        return _by_id_order(entries)
+
+    def fetch_entry(self, entry_id):
+        entries = self.fetch_entries_by_id([entry_id])
+        return entries[0] if entries else None
+
+    def count_entries(self, entry_filter=None):
+        return self._request("GET", _query("/count", entry_filter=entry_filter))["count"]
+
+    def get_summary(self):
+        return _summary(self._request("GET", "/summary"))
+
+    def overview(self, today=None):
+        """The server's analytics.overview(), for today (default: the client's date)."""
+        today = today or date.today()
+        return _overview(self._request("GET", f"/overview?today={today.isoformat()}"))
+
+    def change_generation(self):
+        return self._request("GET", "/generation")["generation"]
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+async def _read_response(reader):
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionResetError("the entry service closed the connection")
+    status = int(status_line.split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    data = await reader.readexactly(int(headers.get("content-length", 0)))
+    return status, headers, data
+
+
+class AsyncEntryClient:
+    """
+    The RemoteBackend calls as coroutines, for asyncio code. At most
+    pool_size requests are in flight at once, each on its own kept-alive
+    connection.
+
+        async with AsyncEntryClient(server.url) as client:
+            ids = await asyncio.gather(*(client.add_entry(...) for ...))
+    """
+
+    def __init__(self, url, pool_size=CLIENT_POOL_SIZE):
+        self.url = url
+        self.host, self.port = _split_url(url)
+        self._idle = []  # (reader, writer) pairs
+        self._slots = asyncio.Semaphore(pool_size)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def _request(self, method, path, payload=None):
+        body = b"" if payload is None else json.dumps(payload).encode("utf-8")
+        head = (f"{method} {path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n"
+                f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n").encode("latin-1")
+        async with self._slots:
+            while True:
+                reused = bool(self._idle)
+                if reused:
+                    reader, writer = self._idle.pop()
+                else:
+                    reader, writer = await asyncio.open_connection(self.host, self.port)
+                try:
+                    writer.write(head + body)
+                    await writer.drain()
+                    status, headers, data = await _read_response(reader)
+                except (OSError, asyncio.IncompleteReadError):
+                    writer.close()
+                    if reused:
+                        continue  # the server dropped an idle connection; try another
+                    raise
+                if headers.get("connection", "").lower() == "close":
+                    writer.close()
+                else:
+                    self._idle.append((reader, writer))
+                return _decode(status, data)
+
+    async def apply(self, operations):
+        return (await self._request("POST", "/batch", {"operations": operations}))["results"]
+
+    async def add_entry(self, date, name, type_, hours, travel_time, recorded=False, notes=None):
+        return (await self.apply([("add", [date, name, type_, hours, travel_time, recorded, notes])]))[0]
+
+    async def add_entries(self, rows):
+        return len(await self.apply(_entry_operations(rows)))
+
+    async def update_entry(self, entry_id, date, name, type_, hours, travel_time, recorded=False, notes=None):
+        await self.apply([("update", [entry_id, date, name, type_, hours, travel_time, recorded, notes])])
+
+    async def set_recorded(self, entry_id, recorded):
+        await self.apply([("set_recorded", [entry_id, bool(recorded)])])
+
+    async def delete_entry(self, entry_id):
+        await self.apply([("delete", [entry_id])])
+
+    async def delete_entries(self, entry_ids):
+        await self.apply([("delete", [entry_id]) for entry_id in entry_ids])
+
+    async def reset_all_entries(self):
+        await self.apply([("reset", [])])
+
+    async def fetch_entries_page(self, after=None, limit=PAGE_SIZE, entry_filter=None):
+        return _entries(await self._request("GET", _query("/entries", after, limit, entry_filter)))
+
+    async def fetch_entries(self):
+        entries = []
+        page = await self.fetch_entries_page(limit=FETCH_PAGE_SIZE)
+        while page:
+            entries += page
+            page = await self.fetch_entries_page((page[-1][1], page[-1][0]), FETCH_PAGE_SIZE)
+        return entries
+
+    async def fetch_entries_by_id(self, entry_ids, entry_filter=None):
+        entries = []
+        for path in _by_id_queries(entry_ids, entry_filter):
+            entries += _entries(await self._request("GET", path))
+        return _by_id_order(entries)
+
+    async def fetch_entry(self, entry_id):
+        entries = await self.fetch_entries_by_id([entry_id])
+        return entries[0] if entries else None
+
+    async def count_entries(self, entry_filter=None):
+        return (await self._request("GET", _query("/count", entry_filter=entry_filter)))["count"]
+
+    async def get_summary(self):
+        return _summary(await self._request("GET", "/summary"))
+
+    async def overview(self, today=None):
+        today = today or date.today()
+        return _overview(await self._request("GET", f"/overview?today={today.isoformat()}"))
+
+    async def change_generation(self):
+        return (await self._request("GET", "/generation"))["generation"]
+
+    async def close(self):
+        idle, self._idle = self._idle, []
+        for _, writer in idle:
+            writer.close()
+        for _, writer in idle:
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
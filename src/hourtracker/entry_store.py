@@ -0,0 +1,200 @@
+# entry_store.py
+"""
+Columnar in-memory storage for entries.
+
+A list of 8-tuples costs several Python objects per entry. EntryStore keeps
+one typed array per column instead: ids and day ordinals as machine
+integers, hours and travel as doubles, type and name as indexes into an
+interned string table, the recorded flags as a bitset and notes in a
+sparse dict, since most entries have none. Rows are read through EntryRow
+views or converted back to the tuples the database layer uses.
+"""
+from array import array
+from datetime import date
+
+
+class StringTable:
+    """Interns strings as small integer codes."""
+
+    __slots__ = ("_codes", "_strings")
+
+    def __init__(self):
+        self._codes = {}
+        self._strings = []
+
+    def code(self, value):
+        value = value or ""
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self._strings)
+            self._strings.append(value)
+        return code
+
+    def __getitem__(self, code):
+        return self._strings[code]
+
+
+class EntryRow:
+    """A read-only view of one row of an EntryStore."""
+
+    __slots__ = ("_store", "_index")
+
+    def __init__(self, store, index):
+        self._store = store
+        self._index = index
+
+    @property
+    def id(self) -> int:
+        return self._store.ids[self._index]
+
+    @property
+    def date(self) -> str:
+        return self._store.date(self._index)
+
+    @property
+    def day(self) -> int:
+        """Date as a proleptic Gregorian ordinal, or 0 if it didn't parse."""
+        return self._store.days[self._index]
+
+    @property
+    def name(self) -> str:
+        return self._store.names[self._store.name_codes[self._index]]
+
+    @property
+    def type(self) -> str:
+        return self._store.types[self._store.type_codes[self._index]]
+
+    @property
+    def hours(self) -> float:
+        return self._store.hours[self._index]
+
+    @property
+    def travel(self) -> float:
+        return self._store.travel[self._index]
+
+    @property
+    def total(self) -> float:
+        return self.hours + self.travel
+
+    @property
+    def recorded(self) -> bool:
+        return self._store.is_recorded(self._index)
+
+    @property
+    def notes(self) -> str:
+        return self._store.notes.get(self.id, "")
+
+    def as_tuple(self):
+        """(id, date, name, type, hours, travel, recorded, notes), as fetch_entries returns."""
+        return self._store.entry(self._index)
+
+
+class EntryStore:
+    """
+    Column arrays holding entries in a fixed order chosen by the caller.
+    Rows are addressed by position; EntryRow views go stale when rows are
+    inserted or removed before them.
+    """
+
+    def __init__(self, entries=()):
+        self.ids = array("q")
+        self.days = array("l")
+        self.hours = array("d")
+        self.travel = array("d")
+        self.type_codes = array("I")
+        self.name_codes = array("I")
+        self.types = StringTable()
+        self.names = StringTable()
+        self.notes = {}  # id -> note, only for entries that have one
+        self._raw_dates = {}  # id -> date text that isn't YYYY-MM-DD
+        self._recorded = 0  # bit i is row i's recorded flag
+        self.extend(entries)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, index):
+        if not -len(self.ids) <= index < len(self.ids):
+            raise IndexError(index)
+        return EntryRow(self, index % len(self.ids) if index < 0 else index)
+
+    def __iter__(self):
+        return (EntryRow(self, i) for i in range(len(self.ids)))
+
+    # --- Column access
+
+    def date(self, index):
+        day = self.days[index]
+        if day:
+            return date.fromordinal(day).isoformat()
+        return self._raw_dates.get(self.ids[index], "")
+
+    def is_recorded(self, index):
+        return bool(self._recorded >> index & 1)
+
+    def entry(self, index):
+        id_ = self.ids[index]
+        return (id_, self.date(index), self.names[self.name_codes[index]],
+                self.types[self.type_codes[index]], self.hours[index], self.travel[index],
+                self.is_recorded(index), self.notes.get(id_, ""))
+
+    # --- Mutation
+
+    def _parse_day(self, id_, date_text):
+        try:
+            return date.fromisoformat(date_text).toordinal()
+        except (TypeError, ValueError):
+            self._raw_dates[id_] = date_text or ""
+            return 0
+
+    def _insert_columns(self, index, entry):
+        # Everything but the recorded bit, which is returned for the caller to place
+        id_, date_text, name, type_, hours, travel, recorded, notes = entry
+        self.ids.insert(index, id_)
+        self.days.insert(index, self._parse_day(id_, date_text))
+        self.name_codes.insert(index, self.names.code(name))
+        self.type_codes.insert(index, self.types.code(type_))
+        self.hours.insert(index, hours or 0.0)
+        self.travel.insert(index, travel or 0.0)
+        if notes:
+            self.notes[id_] = notes
+        return bool(recorded)
+
+    def extend(self, entries):
+        """Append entry tuples, setting their recorded bits in one operation."""
+        start = len(self.ids)
+        bits = [self._insert_columns(len(self.ids), entry) for entry in entries]
+        if any(bits):
+            self._recorded |= int("".join("1" if bit else "0" for bit in reversed(bits)), 2) << start
+
+    def insert(self, index, entry):
+        """Insert an (id, date, name, type, hours, travel, recorded, notes) tuple at index."""
+        recorded = self._insert_columns(index, entry)
+        low = self._recorded & ((1 << index) - 1)
+        self._recorded = ((self._recorded >> index) << (index + 1)) | (recorded << index) | low
+
+    def replace(self, index, entry):
+        self.delete(index)
+        self.insert(index, entry)
+
+    def delete(self, index):
+        self.delete_range(index, index + 1)
+
+    def delete_range(self, start, stop):
+        """Remove rows start to stop - 1 in one pass over each column."""
+        for id_ in self.ids[start:stop]:
+            self.notes.pop(id_, None)
+            self._raw_dates.pop(id_, None)
+        for column in (self.ids, self.days, self.name_codes, self.type_codes, self.hours, self.travel):
+            del column[start:stop]
+        low = self._recorded & ((1 << start) - 1)
+        self._recorded = ((self._recorded >> stop) << start) | low
+
+    def clear(self):
+        self.__init__()
+
+    def set_recorded(self, index, recorded):
+        if recorded:
+            self._recorded |= 1 << index
+        else:
+            self._recorded &= ~(1 << index)
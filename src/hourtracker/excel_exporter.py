@@ -1,120 +1,433 @@
 # excel_exporter.py
 import openpyxl
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.chart import BarChart, Reference, PieChart
 from openpyxl.styles import Font, Alignment
 from openpyxl.utils import get_column_letter
-from datetime import datetime
-from collections import defaultdict
-from PySide6.QtWidgets import QMessageBox
+from openpyxl.xml.constants import PKG_REL_NS, REL_NS, SHEET_MAIN_NS
+from array import array
+from datetime import date
+from itertools import zip_longest
+from typing import NamedTuple
+from xml.etree import ElementTree
+from xml.sax.saxutils import unescape
+import io
+import os
+import re
+import shutil
+import tempfile
+import zipfile
 
-def export_to_excel(path, entries, parent_widget=None):
+from .analytics import Accumulator, Bucket, Report, database_report, month_buckets, type_buckets
+from .instrumentation import instrumented
+
+HOURS_HEADERS = ["Date", "Type", "Hours", "Travel", "Total"]
+HOURS_COLUMN_WIDTHS = [15, 20, 10, 12, 10]
+# Rows between progress callbacks
+PROGRESS_EVERY = 1000
+# Months in the Summary sheet's rolling average
+ROLLING_MONTHS = 3
+# Hidden sheet recording what a tracked export holds, so update_excel_export
+# can bring it up to date: the entry ids of the Hours rows in order, the
+# month totals behind the Summary sheet, and the change generation it was
+# exported at with the database_id() that generation belongs to
+STATE_SHEET = "Export State"
+STATE_HEADERS = ["Ids", "Month", "Hours", "Travel", "Entries", "Generation", "Database"]
+# Entry ids are stored comma separated, this many to a cell, which keeps
+# each cell well under Excel's 32767 character limit
+STATE_IDS_PER_CELL = 2000
+# Bytes of the old Hours sheet XML read at a time while splicing
+SPLICE_CHUNK = 1 << 20
+
+# Hours rows as written by openpyxl: inline strings, no shared string table
+_ROW_START = re.compile(rb"<row[ >]")
+_CELL_REFERENCE = re.compile(rb'<(row|c) r="[A-Z]*[0-9]+"')
+_FIRST_TEXT = re.compile(rb"<t>([^<]*)</t>")
+
+
+def _cell(ws, value, bold=False, center=False):
+    # WriteOnlyCell works for both write-only and regular worksheets
+    cell = WriteOnlyCell(ws, value=value)
+    if bold:
+        cell.font = Font(bold=True)
+    if center:
+        cell.alignment = Alignment(horizontal='center')
+    return cell
+
+
+@instrumented("excel.export_to_excel", rows=lambda written, *_: written)
+def export_to_excel(path, entries, write_only=True, progress=None, report=None, generation=None,
+                    database_id=None):
     """
     Export hourtracker entries to Excel with two sheets:
     - 'Hours' sheet: raw entries (date, type, hours, travel, total)
     - 'Summary' sheet: totals, monthly avg, year-to-date, charts
+
+    entries is any iterable of (id, date, name, type, hours, travel, recorded,
+    notes) tuples and is consumed exactly once, so it can be a database
+    cursor. Rows are streamed into a write-only workbook while an
+    analytics.Accumulator groups them in the same pass, keeping memory
+    bounded by the number of months and types rather than entries. A
+    precomputed analytics.Report may be passed instead, in which case no
+    grouping is done here. Pass write_only=False to build a regular,
+    editable workbook.
+
+    Passing the Repository.change_generation() read before entries was
+    queried, with the repository's database_id(), makes this a tracked
+    export that update_excel_export() can later refresh in place; entries
+    must then be every entry, unfiltered.
+
+    progress, if given, is called with the number of rows written so far;
+    it may raise to abandon the export before anything is saved. Errors are
+    raised to the caller; this module never touches the GUI. Returns the
+    number of entries written.
     """
+    wb = openpyxl.Workbook(write_only=write_only)
+    if not write_only:
+        wb.remove(wb.active)
+    ws = _hours_sheet(wb)
+
+    accumulator = Accumulator() if report is None else None
+    ids = array("q") if generation is not None else None
+    written = 0
+    for written, entry in enumerate(entries, start=1):
+        ws.append(hours_row(entry))
+        if accumulator is not None:
+            accumulator.add(entry)
+        if ids is not None:
+            ids.append(entry[0])
+        if progress is not None and written % PROGRESS_EVERY == 0:
+            progress(written)
+    if accumulator is not None:
+        report = accumulator.report()
+
+    _write_summary(wb, report)
+    if ids is not None:
+        _write_state(wb, ids, report.months, generation, database_id)
+    wb.save(path)
+    return written
+
+
+def _hours_sheet(wb):
+    ws = wb.create_sheet(title="Hours")
+    # Column widths must be set before any rows in write-only mode
+    for i, width in enumerate(HOURS_COLUMN_WIDTHS, start=1):
+        ws.column_dimensions[get_column_letter(i)].width = width
+    ws.append([_cell(ws, header, bold=True, center=True) for header in HOURS_HEADERS])
+    return ws
+
+
+def hours_row(entry):
+    """The Hours sheet cells for entry: date, type, hours, travel and their total."""
+    _, date_str, _, type_, hours, travel = entry[:6]
+    return [date_str, type_, hours, travel, hours + travel]
+
+
+def sheet_part(archive, title):
+    """
+    The name of the member of archive, an open zipfile.ZipFile of a
+    workbook, holding the worksheet called title. Raises KeyError if there
+    is no such sheet.
+    """
+    workbook = ElementTree.fromstring(archive.read("xl/workbook.xml"))
+    relations = ElementTree.fromstring(archive.read("xl/_rels/workbook.xml.rels"))
+    for sheet in workbook.iter(f"{{{SHEET_MAIN_NS}}}sheet"):
+        if sheet.get("name") == title:
+            relation_id = sheet.get(f"{{{REL_NS}}}id")
+            break
+    else:
+        raise KeyError(title)
+    for relation in relations.iter(f"{{{PKG_REL_NS}}}Relationship"):
+        if relation.get("Id") == relation_id:
+            target = relation.get("Target")
+            return target[1:] if target.startswith("/") else f"xl/{target}"
+    raise KeyError(title)
+
+
+class SummaryLayout(NamedTuple):
+    """Where things sit on the Summary sheet; row numbers start at 1."""
+    rows: list  # lists of cell values, top to bottom; None cells are left empty
+    bold_row: int  # the year-to-date line
+    last_month_row: int
+    type_start_row: int  # the Type/Hours/Travel header above the per-type rows
+
+
+def summary_layout(report):
+    """The Summary sheet's contents; only report.months and report.types are used."""
+    rows = [["Month", "Total Hours (incl. travel)", "Entries Count", "Average Hours per Entry",
+             f"Rolling {ROLLING_MONTHS}-Month Average"]]
+    for month, (_, rolling) in zip(report.months, report.rolling_average(ROLLING_MONTHS)):
+        avg = month.total / month.entries if month.entries else 0
+        rows.append([month.key, month.total, month.entries, avg, rolling])
+    last_month_row = len(rows)
+
+    # YTD summary below the monthly table
+    current_year = date.today().year
+    rows.append([])
+    rows.append([f"Year-to-date total hours for {current_year}", report.ytd(current_year).total])
+    bold_row = len(rows)
+
+    # Type summary for the pie chart
+    rows.append([])
+    rows.append(["Type", "Hours", "Travel"])
+    type_start_row = len(rows)
+    for bucket in report.types:
+        rows.append([bucket.key, bucket.hours, bucket.travel])
+
+    # Year-over-year comparison below the type table
+    rows.append([])
+    rows.append([f"Month ({current_year})", "Total Hours", f"Total Hours {current_year - 1}", "Change"])
+    for number, current, previous, change in report.year_over_year(current_year):
+        rows.append([date(current_year, number, 1).strftime("%b"), current, previous, change])
+    return SummaryLayout(rows, bold_row, last_month_row, type_start_row)
+
+
+def _write_summary(wb, report):
+    """Add the Summary sheet and its charts; only report.months and report.types are used."""
+    summary_ws = wb.create_sheet(title="Summary")
+    layout = summary_layout(report)
+    for number, row in enumerate(layout.rows, start=1):
+        if number == layout.bold_row:
+            row = [_cell(summary_ws, value, bold=True) for value in row]
+        summary_ws.append(row)
+
+    # Create bar chart for monthly total hours
+    bar_chart = BarChart()
+    bar_chart.title = "Monthly Total Hours"
+    bar_chart.y_axis.title = "Hours"
+    bar_chart.x_axis.title = "Month"
+
+    data = Reference(summary_ws, min_col=2, min_row=1, max_row=layout.last_month_row)
+    cats = Reference(summary_ws, min_col=1, min_row=2, max_row=layout.last_month_row)
+    bar_chart.add_data(data, titles_from_data=True)
+    bar_chart.set_categories(cats)
+    summary_ws.add_chart(bar_chart, "F2")
+
+    # Pie chart for type hours (excluding travel)
+    pie = PieChart()
+    pie.title = "Hours by Type (excluding travel)"
+    type_start_row = layout.type_start_row
+    labels = Reference(summary_ws, min_col=1, min_row=type_start_row + 1, max_row=type_start_row + len(report.types))
+    data = Reference(summary_ws, min_col=2, min_row=type_start_row, max_row=type_start_row + len(report.types))
+    pie.add_data(data, titles_from_data=True)
+    pie.set_categories(labels)
+    summary_ws.add_chart(pie, "F20")
+
+
+def _write_state(wb, ids, months, generation, database_id):
+    ws = wb.create_sheet(title=STATE_SHEET)
+    ws.sheet_state = "hidden"
+    ws.append(STATE_HEADERS)
+    id_cells = (",".join(map(str, ids[i:i + STATE_IDS_PER_CELL])) for i in range(0, len(ids), STATE_IDS_PER_CELL))
+    for index, (id_cell, month) in enumerate(zip_longest(id_cells, months)):
+        row = [id_cell]
+        row += [None] * 4 if month is None else [month.key, month.hours, month.travel, month.entries]
+        if index == 0:
+            row += [generation, database_id]
+        ws.append(row)
+
+
+class _ExportState:
+    """What a tracked export holds, read back from its STATE_SHEET."""
+
+    def __init__(self, ids, months, generation, database_id):
+        self.ids = ids  # array of entry ids, one per Hours row
+        self.months = months  # month key -> Bucket
+        self.generation = generation
+        self.database_id = database_id
+
+
+def _read_state(path):
+    """The _ExportState of the workbook at path, or None if it isn't a tracked export."""
+    # Read straight from the zip: openpyxl would scan every sheet first
     try:
-        wb = openpyxl.Workbook()
-        # --- Hours sheet ---
-        ws = wb.active
-        ws.title = "Hours"
-        headers = ["Date", "Type", "Hours", "Travel", "Total"]
-        ws.append(headers)
-
-        for entry in entries:
-            id_, date, type_, hours, travel = entry
-            total = hours + travel
-            ws.append([date, type_, hours, travel, total])
-            
-        # Set column widths
-        column_widths = [15, 20, 10, 12, 10]  # Adjust as needed
-        for i, width in enumerate(column_widths, start=1):
-            ws.column_dimensions[get_column_letter(i)].width = width
-            
-        # Style headers
-        for col in range(1, len(headers) + 1):
-            cell = ws.cell(row=1, column=col)
-            cell.font = Font(bold=True)
-            cell.alignment = Alignment(horizontal='center')
-
-        # --- Summary sheet ---
-        summary_ws = wb.create_sheet(title="Summary")
-
-        # Calculate monthly totals, averages and YTD
-        monthly_hours = defaultdict(float)
-        monthly_counts = defaultdict(int)
-        type_hours = defaultdict(float)
-        type_travel = defaultdict(float)
-
-        for entry in entries:
-            _, date_str, type_, hours, travel = entry
-            date_obj = datetime.strptime(date_str, "%Y-%m-%d")
-            month_key = date_obj.strftime("%Y-%m")
-            monthly_hours[month_key] += hours + travel
-            monthly_counts[month_key] += 1
-            type_hours[type_] += hours
-            type_travel[type_] += travel
-
-        # Write monthly summary table
-        summary_ws.append(["Month", "Total Hours (incl. travel)", "Entries Count", "Average Hours per Entry"])
-        for month in sorted(monthly_hours.keys()):
-            total = monthly_hours[month]
-            count = monthly_counts[month]
-            avg = total / count if count else 0
-            summary_ws.append([month, total, count, avg])
-
-        # Calculate YTD (year-to-date) totals
-        current_year = datetime.now().year
-        ytd_total = 0
-        for month in monthly_hours:
-            year = int(month.split("-")[0])
-            if year == current_year:
-                ytd_total += monthly_hours[month]
-
-        # Add YTD summary below monthly table
-        ytd_row = summary_ws.max_row + 2
-        summary_ws.cell(row=ytd_row, column=1, value=f"Year-to-date total hours for {current_year}")
-        summary_ws.cell(row=ytd_row, column=2, value=ytd_total)
-        summary_ws.cell(row=ytd_row, column=1).font = Font(bold=True)
-        summary_ws.cell(row=ytd_row, column=2).font = Font(bold=True)
-
-        # Create bar chart for monthly total hours
-        bar_chart = BarChart()
-        bar_chart.title = "Monthly Total Hours"
-        bar_chart.y_axis.title = "Hours"
-        bar_chart.x_axis.title = "Month"
-
-        data = Reference(summary_ws, min_col=2, min_row=1, max_row=summary_ws.max_row-3)
-        cats = Reference(summary_ws, min_col=1, min_row=2, max_row=summary_ws.max_row-3)
-        bar_chart.add_data(data, titles_from_data=True)
-        bar_chart.set_categories(cats)
-        summary_ws.add_chart(bar_chart, "F2")
-
-        # Write type summary for pie chart
-        type_start_row = summary_ws.max_row + 2
-        summary_ws.cell(row=type_start_row, column=1, value="Type")
-        summary_ws.cell(row=type_start_row, column=2, value="Hours")
-        summary_ws.cell(row=type_start_row, column=3, value="Travel")
-        for i, (t, h) in enumerate(type_hours.items(), start=type_start_row + 1):
-            summary_ws.cell(row=i, column=1, value=t)
-            summary_ws.cell(row=i, column=2, value=h)
-            summary_ws.cell(row=i, column=3, value=type_travel[t])
-
-        # Pie chart for type hours (excluding travel)
-        pie = PieChart()
-        pie.title = "Hours by Type (excluding travel)"
-        labels = Reference(summary_ws, min_col=1, min_row=type_start_row + 1, max_row=type_start_row + len(type_hours))
-        data = Reference(summary_ws, min_col=2, min_row=type_start_row, max_row=type_start_row + len(type_hours))
-        pie.add_data(data, titles_from_data=True)
-        pie.set_categories(labels)
-        summary_ws.add_chart(pie, "F20")
-
-        wb.save(path)
-        if parent_widget:
-            QMessageBox.information(parent_widget, "Export Complete", f"Excel file saved to:\n{path}")
-
-    except Exception as e:
-        if parent_widget:
-            QMessageBox.critical(parent_widget, "Error", f"Could not save Excel file:\n{e}")
+        with zipfile.ZipFile(path) as archive:
+            if "xl/sharedStrings.xml" in archive.namelist():
+                return None
+            sheet = ElementTree.fromstring(archive.read(sheet_part(archive, STATE_SHEET)))
+    except (zipfile.BadZipFile, KeyError):
+        return None
+    ids = array("q")
+    months = {}
+    generation = database_id = None
+    for index, row in enumerate(sheet.iter(f"{{{SHEET_MAIN_NS}}}row")):
+        if index == 0:
+            continue  # headers
+        values = {}
+        for cell in row.iter(f"{{{SHEET_MAIN_NS}}}c"):
+            if cell.get("t") == "inlineStr":
+                value = "".join(cell.itertext())
+            else:
+                value = cell.findtext(f"{{{SHEET_MAIN_NS}}}v")
+                value = None if value is None else float(value)
+            values[cell.get("r", "").rstrip("0123456789")] = value
+        if values.get("A"):
+            ids.extend(map(int, values["A"].split(",")))
+        if values.get("E"):
+            key = values.get("B") or ""
+            months[key] = Bucket(key, values.get("C") or 0.0, values.get("D") or 0.0, int(values["E"]))
+        if index == 1 and values.get("F") is not None:
+            generation, database_id = int(values["F"]), values.get("G")
+    return None if generation is None else _ExportState(ids, months, generation, database_id)
+
+
+class _StaleState(Exception):
+    """The Hours sheet no longer lines up with the export state."""
+
+
+def _splice_rows(stream, out, ids, dropped, affected, progress):
+    """
+    Copy the data rows of the Hours sheet XML read from stream to out,
+    leaving out the rows at the indexes in dropped and adding their months
+    to affected. Once a row has been left out the rest lose their cell
+    references, so that they are numbered by position.
+    """
+    buffer = b""
+    index = -2  # the header row is index -1 and is never copied
+    started = renumber = False
+    while True:
+        chunk = stream.read(SPLICE_CHUNK)
+        buffer += chunk
+        if not started:
+            start = buffer.find(b"<sheetData>")
+            if start < 0:
+                if not chunk:
+                    raise _StaleState()
+                continue
+            buffer = buffer[start + len(b"<sheetData>"):]
+            started = True
+        end = buffer.find(b"</sheetData>")
+        if end >= 0:
+            part, buffer = buffer[:end], b""
+        else:
+            # Everything before the last row start is whole rows
+            cut = buffer.rfind(b"<row")
+            if cut <= 0:
+                if not chunk:
+                    raise _StaleState()
+                continue
+            part, buffer = buffer[:cut], buffer[cut:]
+
+        count = part.count(b"<row")
+        if index >= -1 and not any(k in dropped for k in range(index + 1, index + count + 1)):
+            out.write(_CELL_REFERENCE.sub(rb"<\1", part) if renumber else part)
+        else:
+            starts = [match.start() for match in _ROW_START.finditer(part)] + [len(part)]
+            for row_start, row_end in zip(starts, starts[1:]):
+                index += 1
+                row = part[row_start:row_end]
+                if index < 0:
+                    continue
+                if index in dropped:
+                    text = _FIRST_TEXT.search(row)
+                    affected.add(unescape(text.group(1).decode("utf-8"))[:7] if text else "")
+                    renumber = True
+                    continue
+                out.write(_CELL_REFERENCE.sub(rb"<\1", row) if renumber else row)
+            index -= count
+        index += count
+        if progress is not None:
+            progress(index + 1)
+        if end >= 0:
+            break
+    if index + 1 != len(ids):
+        raise _StaleState()
+
+
+@instrumented("excel.update_excel_export", rows=lambda written, *_: written)
+def update_excel_export(path, repo, progress=None):
+    """
+    Bring the tracked export at path up to date with repo, writing only
+    what changed since it was made. Rows of entries deleted or edited since
+    then are dropped from the Hours sheet and the current version of every
+    new or edited entry is appended after the rest, so unlike a full export
+    the Hours sheet is in export order rather than date order. The rows that
+    are kept are copied across as XML without being parsed, and only the
+    Summary months that gained or lost rows are recomputed; the charts are
+    redrawn from them.
+
+    Falls back to a full tracked export when path doesn't exist, wasn't
+    written by a tracked export of this database (see
+    Repository.database_id()), is from a later change generation than the
+    database has reached or has been resaved or edited out of step with its
+    state. progress is called with the number of old rows looked
+    at, then as for export_to_excel(). Returns the number of rows in the
+    Hours sheet.
+    """
+    generation = repo.change_generation()
+    database_id = repo.database_id()
+    state = _read_state(path) if os.path.exists(path) else None
+    if state is not None and state.database_id == database_id and state.generation <= generation:
+        temp_path = f"{path}.partial"
+        try:
+            written = _update_export(path, temp_path, repo, state, generation, database_id, progress)
+        except _StaleState:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
         else:
-            print(f"Error exporting Excel: {e}")
+            os.replace(temp_path, path)
+            return written
+    # A Summary the panel or an earlier export already computed costs nothing
+    return export_to_excel(path, repo.iter_entries(), progress=progress, report=database_report(repo),
+                           generation=generation, database_id=database_id)
+
+
+def _update_export(path, temp_path, repo, state, generation, database_id, progress):
+    changed = list(repo.iter_entries_modified_since(state.generation))
+    changed_ids = {entry[0] for entry in changed}
+    current_ids = repo.entry_ids()
+    affected = {(entry[1] or "")[:7] for entry in changed}
+    dropped = {index for index, id_ in enumerate(state.ids) if id_ in changed_ids or id_ not in current_ids}
+    ids = array("q", (id_ for index, id_ in enumerate(state.ids) if index not in dropped))
+
+    with tempfile.TemporaryFile() as kept_rows:
+        with zipfile.ZipFile(path) as source:
+            # Resaving in Excel moves text to a shared string table the
+            # copied rows would point into
+            if "xl/sharedStrings.xml" in source.namelist():
+                raise _StaleState()
+            try:
+                old_hours = sheet_part(source, "Hours")
+            except KeyError:
+                raise _StaleState()
+            with source.open(old_hours) as stream:
+                _splice_rows(stream, kept_rows, state.ids, dropped, affected, progress)
+
+        # A fresh workbook holding only the new rows, the Summary and the state
+        wb = openpyxl.Workbook(write_only=True)
+        ws = _hours_sheet(wb)
+        for entry in changed:
+            ws.append(hours_row(entry))
+            ids.append(entry[0])
+        months = {key: bucket for key, bucket in state.months.items() if key not in affected}
+        months.update((bucket.key, bucket) for bucket in month_buckets(repo, affected))
+        report = Report(months=[months[key] for key in sorted(months)], weeks=[], types=type_buckets(repo),
+                        names=[], recorded=[])
+        _write_summary(wb, report)
+        _write_state(wb, ids, report.months, generation, database_id)
+        fresh = io.BytesIO()
+        wb.save(fresh)
+
+        # Its Hours sheet gets the kept rows spliced in after the header
+        with zipfile.ZipFile(fresh) as new, zipfile.ZipFile(temp_path, "w", zipfile.ZIP_DEFLATED) as target:
+            hours_part = sheet_part(new, "Hours")
+            for info in new.infolist():
+                data = new.read(info.filename)
+                if info.filename != hours_part:
+                    target.writestr(info, data)
+                    continue
+                header_end = data.index(b"</row>") + len(b"</row>")
+                rows_end = data.index(b"</sheetData>")
+                with target.open(hours_part, "w", force_zip64=True) as out:
+                    out.write(data[:header_end])
+                    kept_rows.seek(0)
+                    shutil.copyfileobj(kept_rows, out)
+                    out.write(_CELL_REFERENCE.sub(rb"<\1", data[header_end:rows_end]))
+                    out.write(data[rows_end:])
+    if progress is not None:
+        progress(len(ids))
+    return len(ids)
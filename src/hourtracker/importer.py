@@ -0,0 +1,179 @@
+# importer.py
+import csv
+import io
+import os
+from datetime import datetime
+from itertools import islice
+from typing import NamedTuple
+
+from .database import get_repository
+
+# Header spellings accepted for each column. Files exported by older versions
+# of the app use "Date, Type, Hours, Travel, Recorded".
+COLUMN_ALIASES = {
+    "date": "date",
+    "name": "name",
+    "type": "type",
+    "hours": "hours",
+    "travel": "travel",
+    "travel_time": "travel",
+    "travel time": "travel",
+    "recorded": "recorded",
+    "notes": "notes",
+    "note": "notes",
+}
+# Column order assumed when the file has no recognisable header
+LEGACY_COLUMNS = ["date", "type", "hours", "travel", "recorded"]
+
+DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y")
+TRUE_VALUES = {"1", "true", "yes", "y"}
+FALSE_VALUES = {"0", "false", "no", "n", ""}
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+class ImportProblem(NamedTuple):
+    line: int
+    message: str
+
+
+class ImportResult(NamedTuple):
+    imported: int
+    problems: list
+
+
+class ImportAborted(Exception):
+    """Raised when an import is rolled back; carries the problems found so far."""
+
+    def __init__(self, message, problems=()):
+        super().__init__(message)
+        self.problems = list(problems)
+
+
+def parse_date(value):
+    """Return value as a YYYY-MM-DD string, or raise ValueError."""
+    value = value.strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).strftime("%Y-%m-%d")
+        except ValueError:
+            pass
+    raise ValueError(f"invalid date {value!r}")
+
+
+def _parse_hours(value, column):
+    value = value.strip()
+    if not value:
+        return 0.0
+    try:
+        hours = float(value)
+    except ValueError:
+        raise ValueError(f"invalid {column} {value!r}") from None
+    if hours < 0:
+        raise ValueError(f"negative {column} {value!r}")
+    return hours
+
+
+def _parse_recorded(value):
+    value = value.strip().lower()
+    if value in TRUE_VALUES:
+        return 1
+    if value in FALSE_VALUES:
+        return 0
+    raise ValueError(f"invalid recorded flag {value!r}")
+
+
+def coerce_record(record):
+    """
+    Turn a dict of raw CSV strings into an insertable
+    (date, name, type, hours, travel_time, recorded, notes) tuple.
+    Raises ValueError describing the first bad field.
+    """
+    if not record.get("date"):
+        raise ValueError("missing date")
+    type_ = (record.get("type") or "").strip()
+    if not type_:
+        raise ValueError("missing type")
+    return (
+        parse_date(record["date"]),
+        (record.get("name") or "").strip(),
+        type_,
+        _parse_hours(record.get("hours") or "", "hours"),
+        _parse_hours(record.get("travel") or "", "travel"),
+        _parse_recorded(record.get("recorded") or ""),
+        (record.get("notes") or "").strip() or None,
+    )
+
+
+def iter_csv_records(path, on_position=None):
+    """
+    Yield (line_number, record) pairs from a CSV file one row at a time.
+
+    The header row is matched against COLUMN_ALIASES; files without a known
+    header are read with the legacy positional layout. on_position, if given,
+    is called with (bytes_read, total_bytes) after each row.
+    """
+    total = os.path.getsize(path)
+    with open(path, "rb") as raw:
+        text = io.TextIOWrapper(raw, encoding="utf-8-sig", newline="")
+        reader = csv.reader(text)
+        first = next(reader, None)
+        if first is None:
+            return
+        keys = [COLUMN_ALIASES.get(cell.strip().lower()) for cell in first]
+        if "date" not in keys:
+            # No header, so the first row is already data
+            keys = LEGACY_COLUMNS
+            yield reader.line_num, dict(zip(keys, first))
+        for row in reader:
+            if not any(cell.strip() for cell in row):
+                continue
+            yield reader.line_num, {key: value for key, value in zip(keys, row) if key}
+            if on_position is not None:
+                on_position(raw.tell(), total)
+
+
+def iter_batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def import_csv(path, repo=None, batch_size=DEFAULT_BATCH_SIZE, strict=False, progress=None):
+    """
+    Import entries from a CSV file in a single transaction.
+
+    Rows are parsed lazily, validated in batches and inserted with
+    executemany. Invalid rows are skipped and reported in the result; with
+    strict=True the first invalid row aborts the import instead. Any error
+    (including one raised by the progress callback) rolls back every row
+    inserted so far.
+
+    progress, if given, is called with (bytes_read, total_bytes).
+    """
+    repo = repo or get_repository()
+    problems = []
+    imported = 0
+    records = iter_csv_records(path, on_position=progress)
+    try:
+        with repo.transaction():
+            for batch in iter_batches(records, batch_size):
+                rows = []
+                for line, record in batch:
+                    try:
+                        rows.append(coerce_record(record))
+                    except ValueError as e:
+                        problems.append(ImportProblem(line, str(e)))
+                        if strict:
+                            raise ImportAborted(f"line {line}: {e}", problems)
+                if rows:
+                    repo.add_entries(rows)
+                    imported += len(rows)
+    except ImportAborted:
+        raise
+    except Exception as e:
+        raise ImportAborted(f"Import rolled back: {e}", problems) from e
+    return ImportResult(imported, problems)
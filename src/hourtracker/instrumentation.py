@@ -0,0 +1,158 @@
+# instrumentation.py
+"""
+Call counts, latencies and row counts for the hot paths, plus optional
+per-statement SQLite timings. Nothing is recorded until RECORDER.enabled is
+set, so instrumented functions cost one attribute check when it is off.
+Nothing here imports Qt.
+"""
+import functools
+import re
+import threading
+import time
+
+# Statement text kept per SQL stat; longer statements are cut off
+SQL_KEY_LENGTH = 120
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_SPACE = re.compile(r"\s+")
+
+
+class Stat:
+    """Running totals for one instrumented name or SQL statement."""
+
+    __slots__ = ("calls", "seconds", "max_seconds", "rows")
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.rows = 0
+
+    def add(self, seconds, rows=None):
+        self.calls += 1
+        self.seconds += seconds
+        if seconds > self.max_seconds:
+            self.max_seconds = seconds
+        if rows:
+            self.rows += rows
+
+    @property
+    def mean_seconds(self):
+        return self.seconds / self.calls if self.calls else 0.0
+
+
+def _sql_key(statement):
+    # Bound values are expanded into the traced text; fold them back to ?
+    # so one statement with different parameters is one entry
+    return _SPACE.sub(" ", _LITERALS.sub("?", statement)).strip()[:SQL_KEY_LENGTH]
+
+
+class Recorder:
+    """
+    Collects Stats by name. record() may be called from any thread.
+
+    SQL statement timings come from sqlite3's trace callback, which only
+    reports when a statement starts: each statement is charged the time until
+    the next statement on the same thread, or until the instrumented call it
+    ran in returns. That includes the Python work done on its rows, which is
+    usually what matters when looking for where the time goes.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.trace_sql = False
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.stats = {}
+        self.sql_stats = {}
+
+    def reset(self):
+        with self._lock:
+            self.stats = {}
+            self.sql_stats = {}
+
+    def record(self, name, seconds, rows=None):
+        with self._lock:
+            stat = self.stats.get(name)
+            if stat is None:
+                stat = self.stats[name] = Stat()
+            stat.add(seconds, rows)
+
+    def trace_statement(self, statement):
+        """sqlite3 trace callback; see Repository.set_trace_callback()."""
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self._end_statement(now)
+        self._local.statement = (_sql_key(statement), now)
+
+    def _end_statement(self, now):
+        pending = getattr(self._local, "statement", None)
+        if pending is None:
+            return
+        self._local.statement = None
+        key, started = pending
+        with self._lock:
+            stat = self.sql_stats.get(key)
+            if stat is None:
+                stat = self.sql_stats[key] = Stat()
+            stat.add(now - started)
+
+    def report(self, limit=15):
+        """The collected stats as a plain text table, slowest total first."""
+        with self._lock:
+            stats = sorted(self.stats.items(), key=lambda item: item[1].seconds, reverse=True)
+            sql_stats = sorted(self.sql_stats.items(), key=lambda item: item[1].seconds, reverse=True)
+        lines = [f"{'call':<32} {'calls':>7} {'total ms':>10} {'mean ms':>9} {'max ms':>9} {'rows':>9}"]
+        for name, stat in stats:
+            lines.append(f"{name:<32} {stat.calls:>7} {stat.seconds * 1000:>10.1f} "
+                         f"{stat.mean_seconds * 1000:>9.2f} {stat.max_seconds * 1000:>9.2f} {stat.rows:>9}")
+        if sql_stats:
+            lines.append("")
+            lines.append(f"{'calls':>7} {'total ms':>10} {'max ms':>9}  SQL")
+            for key, stat in sql_stats[:limit]:
+                lines.append(f"{stat.calls:>7} {stat.seconds * 1000:>10.1f} {stat.max_seconds * 1000:>9.2f}  {key}")
+            if len(sql_stats) > limit:
+                lines.append(f"... and {len(sql_stats) - limit} more statements")
+        return "\n".join(lines)
+
+
+RECORDER = Recorder()
+
+
+def instrumented(name, rows=None):
+    """
+    Decorator recording each call's latency under name while RECORDER is
+    enabled. rows, if given, is called as rows(result, *args) to count the
+    rows the call produced.
+    """
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not RECORDER.enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            finally:
+                end = time.perf_counter()
+                if RECORDER.trace_sql:
+                    RECORDER._end_statement(end)
+            RECORDER.record(name, end - start, rows(result, *args) if rows else None)
+            return result
+        return wrapper
+    return decorate
+
+
+def profile_report(profiler, path, limit=30):
+    """
+    Save a cProfile.Profile's stats to path (readable with pstats or
+    snakeviz) and return them as text, the limit most expensive functions by
+    cumulative time, followed by RECORDER's timing report.
+    """
+    import io
+    import pstats
+
+    profiler.dump_stats(path)
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(limit)
+    return f"{out.getvalue()}\n{RECORDER.report()}\n\ncProfile stats saved to {path}\n"
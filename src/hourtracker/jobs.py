@@ -0,0 +1,109 @@
+# jobs.py
+import threading
+import time
+import traceback
+
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal
+
+# Minimum seconds between progress signals, so per-row reports from an
+# import don't flood the GUI thread's event queue
+PROGRESS_INTERVAL = 0.05
+
+
+class JobCancelled(Exception):
+    """Raised inside a job's work function once cancel() has been called."""
+
+
+class JobSignals(QObject):
+    progress = Signal(int, int)  # done, total (0 when unknown)
+    finished = Signal(object)  # the work function's return value
+    failed = Signal(str, str)  # error message, traceback
+    cancelled = Signal()
+
+
+class Job(QRunnable):
+    """
+    A unit of background work. func is called on a pool thread as
+    func(report), where report(done, total) publishes progress and raises
+    JobCancelled if the job has been cancelled. Results come back to the GUI
+    thread through self.signals.
+    """
+
+    def __init__(self, name, func):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.name = name
+        self.func = func
+        self.signals = JobSignals()
+        self._cancel = threading.Event()
+        self._last_report = 0.0
+
+    def cancel(self):
+        self._cancel.set()
+
+    def is_cancelled(self):
+        return self._cancel.is_set()
+
+    def report(self, done, total=0):
+        if self._cancel.is_set():
+            raise JobCancelled(f"{self.name} cancelled")
+        now = time.monotonic()
+        if now - self._last_report >= PROGRESS_INTERVAL or (total and done >= total):
+            self._last_report = now
+            self.signals.progress.emit(int(done), int(total or 0))
+
+    def run(self):
+        if self._cancel.is_set():
+            self.signals.cancelled.emit()
+            return
+        try:
+            result = self.func(self.report)
+        except Exception as e:
+            # Work functions may wrap JobCancelled in their own error type
+            if self._cancel.is_set():
+                self.signals.cancelled.emit()
+            else:
+                self.signals.failed.emit(str(e), traceback.format_exc())
+        else:
+            self.signals.finished.emit(result)
+
+
+class JobScheduler(QObject):
+    """
+    Runs jobs on a private thread pool. By default the pool has a single
+    thread, so jobs run one at a time in submission order and an export can
+    never race an import on the database.
+    """
+
+    def __init__(self, parent=None, max_workers=1):
+        super().__init__(parent)
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(max_workers)
+        # Keep idle workers alive: Repository connections are per thread
+        # and stay open until close(), so a fresh thread per job after an
+        # idle spell would leave one more connection behind each time
+        self._pool.setExpiryTimeout(-1)
+        self._jobs = []
+
+    def submit(self, name, func):
+        job = Job(name, func)
+        self._jobs.append(job)
+        for signal in (job.signals.finished, job.signals.failed, job.signals.cancelled):
+            signal.connect(lambda *_, job=job: self._forget(job))
+        self._pool.start(job)
+        return job
+
+    def _forget(self, job):
+        if job in self._jobs:
+            self._jobs.remove(job)
+
+    def pending(self):
+        """Jobs that are queued or running."""
+        return list(self._jobs)
+
+    def cancel_all(self):
+        for job in self._jobs:
+            job.cancel()
+
+    def wait(self, msecs=-1):
+        return self._pool.waitForDone(msecs)
@@ -1,14 +1,40 @@
+# Where --profile saves its cProfile stats unless given --profile=PATH
+PROFILE_FILE = "hourtracker.prof"
+
+
 def main():
     import sys
     from PySide6.QtWidgets import QApplication
+
+    # --profile runs the whole session under cProfile with the hot-path
+    # timings and SQL trace on, and prints both when the window closes
+    profile = next((arg for arg in sys.argv[1:] if arg.split("=")[0] == "--profile"), None)
+    if profile:
+        import cProfile
+        from .instrumentation import RECORDER
+        RECORDER.enabled = RECORDER.trace_sql = True
+        profiler = cProfile.Profile()
+        profiler.enable()
+
     from .ui_main import TimeTrackerUI
-    from .database import init_db
-    
-    init_db()
+    from .database import Repository, get_backend
+
+    # The entry service named by SERVER_ENV if it is set, else the local database
+    backend = get_backend()
+    if profile and isinstance(backend, Repository):
+        backend.set_trace_callback(RECORDER.trace_statement)
+    backend.init_db()
     app = QApplication(sys.argv)
-    window = TimeTrackerUI()
+    app.aboutToQuit.connect(backend.close)
+    window = TimeTrackerUI(backend)
     window.show()
-    sys.exit(app.exec())
+    status = app.exec()
+    if profile:
+        from .instrumentation import profile_report
+        profiler.disable()
+        path = profile.partition("=")[2] or PROFILE_FILE
+        sys.stderr.write(profile_report(profiler, path))
+    sys.exit(status)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
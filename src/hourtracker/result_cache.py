@@ -0,0 +1,72 @@
+# result_cache.py
+"""
+Memoised query results for one database, kept for as long as the entries
+table is unchanged.
+
+Every lookup first reads the database's change generation (see
+database.MODIFIED_SCHEMA), a single-row SELECT. The triggers bump it on
+every insert, update and delete of an entry, from this process or any
+other using the same file, so a new generation means the cached results
+are out of date and they are all dropped; until then repeated redraws and
+exports reuse them.
+"""
+import threading
+from collections import OrderedDict
+
+# Results kept per repository; the least recently used goes first
+CACHE_SIZE = 64
+
+
+class ResultCache:
+    """
+    An LRU of results keyed by whatever the caller passes to get().
+    generation is a callable returning the current change generation.
+    """
+
+    def __init__(self, generation, size=CACHE_SIZE):
+        self._generation = generation
+        self.size = size
+        self._results = OrderedDict()
+        self._results_generation = None
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def get(self, key, compute):
+        """
+        Return the result cached under key, or compute() it and cache it.
+        compute runs after the generation is read, so a write racing with
+        it can only make the result newer than its generation; the next
+        lookup sees the write's generation and misses.
+        """
+        generation = self._generation()
+        with self._lock:
+            if generation != self._results_generation:
+                self._results.clear()
+                self._results_generation = generation
+            elif key in self._results:
+                self._results.move_to_end(key)
+                self.hits += 1
+                return self._results[key]
+            self.misses += 1
+        value = compute()
+        with self._lock:
+            if generation == self._results_generation:
+                self._results[key] = value
+                while len(self._results) > self.size:
+                    self._results.popitem(last=False)
+        return value
+
+    def clear(self):
+        """Drop every result, for changes the generation doesn't track such as restoring a backup."""
+        with self._lock:
+            self._results.clear()
+            self._results_generation = None
+
+    def __len__(self):
+        return len(self._results)
+
+    def stats(self):
+        """One line of hit and miss counts for the diagnostics panel."""
+        lookups = self.hits + self.misses
+        rate = self.hits / lookups if lookups else 0.0
+        return f"result cache: {len(self)} results, {self.hits} hits, {self.misses} misses ({rate:.0%} hit)"
@@ -0,0 +1,119 @@
+# save_queue.py
+"""
+Write-behind queue for small, frequent edits made in the table.
+
+Edits are merged per entry in memory, so toggling the same checkbox five
+times costs one write, and flush() saves everything pending in a single
+transaction with UPDATEs naming only the columns that changed. Before an
+edit is queued it is appended to a journal file next to the database and
+synced to disk; the journal is emptied once the edits are committed, in
+a durable transaction so that the commit is on disk first. If the app
+dies in between, recover() replays the journal at the next start.
+Replaying is safe to repeat because every edit stores absolute values.
+"""
+import json
+import os
+from pathlib import Path
+
+from .database import check_date
+
+# Columns an edit may set, by their names in the entries table
+EDITABLE_COLUMNS = ("date", "name", "type", "hours", "travel_time", "recorded", "notes")
+
+
+class SaveQueue:
+    def __init__(self, repo, journal_path=None, fsync=True):
+        self.repo = repo
+        if journal_path is None:
+            journal_path = repo.db_file.with_name(repo.db_file.name + "-edits")
+        self.journal_path = Path(journal_path)
+        self.fsync = fsync
+        self._pending = {}  # entry id -> {column: value}
+        self._journal = None
+
+    def __len__(self):
+        return len(self._pending)
+
+    def pending(self, entry_id):
+        """The unsaved column values for entry_id."""
+        return dict(self._pending.get(entry_id, {}))
+
+    def set(self, entry_id, **columns):
+        """Queue new values for some of entry_id's columns."""
+        unknown = columns.keys() - set(EDITABLE_COLUMNS)
+        if unknown:
+            raise ValueError(f"not editable: {', '.join(sorted(unknown))}")
+        if "date" in columns:
+            check_date(columns["date"])
+        self._append_journal({"id": entry_id, "set": columns})
+        self._pending.setdefault(entry_id, {}).update(columns)
+
+    def _journal_file(self):
+        if self._journal is None:
+            self.journal_path.parent.mkdir(parents=True, exist_ok=True)
+            self._journal = open(self.journal_path, "a", encoding="utf-8")
+        return self._journal
+
+    def _sync(self, journal):
+        journal.flush()
+        if self.fsync:
+            os.fsync(journal.fileno())
+
+    def _append_journal(self, record):
+        journal = self._journal_file()
+        journal.write(json.dumps(record) + "\n")
+        self._sync(journal)
+
+    def flush(self):
+        """
+        Save every pending edit in one transaction and empty the journal.
+        Returns the number of entries written. On error nothing is lost:
+        the edits stay pending and journalled.
+        """
+        if not self._pending:
+            return 0
+        # One executemany per distinct set of changed columns
+        statements = {}
+        for entry_id, columns in self._pending.items():
+            names = tuple(sorted(columns))
+            statements.setdefault(names, []).append([columns[name] for name in names] + [entry_id])
+        # The journal is about to be emptied, so the commit must reach the disk
+        with self.repo.transaction(durable=True) as conn:
+            for names, rows in statements.items():
+                assignments = ", ".join(f"{name} = ?" for name in names)
+                conn.executemany(f"UPDATE entries SET {assignments} WHERE id = ?", rows)
+        written = len(self._pending)
+        self._pending.clear()
+        journal = self._journal_file()
+        journal.truncate(0)
+        self._sync(journal)
+        return written
+
+    def recover(self):
+        """
+        Apply edits journalled by a session that ended before saving them.
+        Returns the number of entries written.
+        """
+        if not self.journal_path.exists():
+            return 0
+        with open(self.journal_path, encoding="utf-8") as journal:
+            for line in journal:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break  # a write torn by the crash; nothing after it was acknowledged
+                columns = {name: value for name, value in record["set"].items() if name in EDITABLE_COLUMNS}
+                if columns:
+                    self._pending.setdefault(record["id"], {}).update(columns)
+        written = self.flush()
+        if not written:
+            self._journal_file().truncate(0)
+        return written
+
+    def close(self):
+        """Flush, then remove the empty journal."""
+        self.flush()
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        self.journal_path.unlink(missing_ok=True)
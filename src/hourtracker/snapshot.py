@@ -0,0 +1,225 @@
+# snapshot.py
+"""
+Compact binary snapshots of the entries table, for moving hours between
+machines much faster than through CSV.
+
+A snapshot file is a header followed by zlib-compressed blocks:
+
+    header  MAGIC, FORMAT_VERSION (u16), column list length (u16), column list
+    block   rows (u32), raw length (u32), compressed length (u32), payload
+    ...     a block with zero rows ends the file
+
+Each payload holds the strings first seen in that block, then the rows as
+fixed-width records, then the notes. Dates, names and types repeat a lot,
+so they are stored once and referred to by number. All integers are little
+endian.
+"""
+import struct
+import zlib
+from itertools import chain
+from typing import NamedTuple
+
+from .database import SQL_INSERT_ENTRY, SQL_RESTORE_ENTRY, checked_dates
+
+MAGIC = b"HTSNAP\r\n"
+SNAPSHOT_SUFFIX = ".htsnap"
+FORMAT_VERSION = 1
+SNAPSHOT_COLUMNS = "id,date,name,type,hours,travel_time,recorded,notes"
+# Rows per block; bounds memory on both sides
+BLOCK_ROWS = 65536
+# zlib level 1 compresses the repetitive row data well and is fast
+COMPRESS_LEVEL = 1
+
+HEADER = struct.Struct("<8sHH")
+BLOCK = struct.Struct("<III")
+# id, date code, name code, type code, hours, travel, recorded
+ROW = struct.Struct("<qIIIddB")
+# Stands for None in place of a string code or a notes length
+NO_STRING = NO_NOTES = 0xFFFFFFFF
+CONFLICT_MODES = ("renumber", "skip", "replace")
+
+
+class SnapshotError(Exception):
+    """The file is not a snapshot this version can read."""
+
+
+class RestoreResult(NamedTuple):
+    restored: int  # rows in the snapshot that were written
+    skipped: int  # rows left out because their id was taken (on_conflict="skip")
+
+
+class _Strings:
+    """Numbers strings in the order they are first seen."""
+
+    def __init__(self):
+        self.codes = {}
+        self.new = []
+
+    def code(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.codes)
+            self.new.append(value)
+        return code
+
+    def take_new(self):
+        new, self.new = self.new, []
+        return new
+
+
+def _pack_block(rows, strings):
+    fixed = bytearray()
+    note_lengths = []
+    notes = bytearray()
+    for id_, date, name, type_, hours, travel, recorded, note in rows:
+        name_code = NO_STRING if name is None else strings.code(name)
+        fixed += ROW.pack(id_, strings.code(date), name_code, strings.code(type_),
+                          hours, travel or 0.0, 1 if recorded else 0)
+        if note is None:
+            note_lengths.append(NO_NOTES)
+        else:
+            encoded = note.encode("utf-8")
+            note_lengths.append(len(encoded))
+            notes += encoded
+    new = [value.encode("utf-8") for value in strings.take_new()]
+    payload = b"".join([
+        struct.pack(f"<I{len(new)}I", len(new), *map(len, new)), *new,
+        fixed,
+        struct.pack(f"<{len(note_lengths)}I", *note_lengths), notes,
+    ])
+    compressed = zlib.compress(payload, COMPRESS_LEVEL)
+    return BLOCK.pack(len(rows), len(payload), len(compressed)) + compressed
+
+
+def _unpack_block(count, payload, strings):
+    offset = 0
+    (new_count,) = struct.unpack_from("<I", payload, offset)
+    lengths = struct.unpack_from(f"<{new_count}I", payload, offset + 4)
+    offset += 4 + 4 * new_count
+    for length in lengths:
+        strings.append(payload[offset:offset + length].decode("utf-8"))
+        offset += length
+
+    end = offset + ROW.size * count
+    fixed = ROW.iter_unpack(payload[offset:end])
+    note_lengths = struct.unpack_from(f"<{count}I", payload, end)
+    offset = end + 4 * count
+    rows = []
+    for (id_, date, name, type_, hours, travel, recorded), length in zip(fixed, note_lengths):
+        if length == NO_NOTES:
+            note = None
+        else:
+            note = payload[offset:offset + length].decode("utf-8")
+            offset += length
+        rows.append((id_, strings[date], None if name == NO_STRING else strings[name], strings[type_],
+                     hours, travel, recorded, note))
+    return rows
+
+
+def write_snapshot(path, entries, progress=None):
+    """
+    Write entries, any iterable of (id, date, name, type, hours, travel,
+    recorded, notes) tuples such as Repository.iter_entries(), to a snapshot
+    file. progress, if given, is called with the number of rows written
+    after each block. Returns the number of rows written.
+    """
+    strings = _Strings()
+    columns = SNAPSHOT_COLUMNS.encode("ascii")
+    written = 0
+    with open(path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(columns)) + columns)
+        block = []
+        for entry in entries:
+            block.append(entry)
+            if len(block) == BLOCK_ROWS:
+                file.write(_pack_block(block, strings))
+                written += len(block)
+                block = []
+                if progress is not None:
+                    progress(written)
+        if block:
+            file.write(_pack_block(block, strings))
+            written += len(block)
+        file.write(BLOCK.pack(0, 0, 0))
+    if progress is not None:
+        progress(written)
+    return written
+
+
+def iter_snapshot_blocks(path):
+    """Yield the rows of a snapshot file one block (a list of entry tuples) at a time."""
+    with open(path, "rb") as file:
+        header = file.read(HEADER.size)
+        if len(header) < HEADER.size:
+            raise SnapshotError(f"{path} is not an Hour Tracker snapshot")
+        magic, version, columns_length = HEADER.unpack(header)
+        if magic != MAGIC:
+            raise SnapshotError(f"{path} is not an Hour Tracker snapshot")
+        if version != FORMAT_VERSION:
+            raise SnapshotError(f"{path} is snapshot format {version}; this version reads format {FORMAT_VERSION}")
+        columns = file.read(columns_length).decode("ascii")
+        if columns != SNAPSHOT_COLUMNS:
+            raise SnapshotError(f"{path} has unexpected columns: {columns}")
+
+        strings = []
+        while True:
+            block = file.read(BLOCK.size)
+            if len(block) < BLOCK.size:
+                raise SnapshotError(f"{path} is truncated")
+            count, raw_length, compressed_length = BLOCK.unpack(block)
+            if count == 0:
+                return
+            compressed = file.read(compressed_length)
+            if len(compressed) < compressed_length:
+                raise SnapshotError(f"{path} is truncated")
+            try:
+                payload = zlib.decompress(compressed)
+            except zlib.error as e:
+                raise SnapshotError(f"{path} is corrupt: {e}")
+            if len(payload) != raw_length:
+                raise SnapshotError(f"{path} is corrupt: block length mismatch")
+            yield _unpack_block(count, payload, strings)
+
+
+def restore_snapshot(path, repo, on_conflict="renumber", progress=None):
+    """
+    Merge a snapshot into repo in a single transaction.
+
+    Rows keep their snapshot ids where those are free. on_conflict decides
+    what happens to a row whose id is already taken: "renumber" inserts it
+    under a new id, "skip" leaves the existing row alone and "replace"
+    overwrites it. The file is checked as it is read, dates included (a
+    date that isn't YYYY-MM-DD raises ValueError, as for add_entries); an
+    error part way through rolls back every row.
+
+    progress, if given, is called with the number of rows read after each
+    block.
+    """
+    if on_conflict not in CONFLICT_MODES:
+        raise ValueError(f"on_conflict must be one of {', '.join(CONFLICT_MODES)}")
+    blocks = iter_snapshot_blocks(path)
+    first = next(blocks, [])
+    # Past one block, rebuilding the summary and search index once beats
+    # updating them row by row
+    loading = repo.bulk_load() if len(first) == BLOCK_ROWS else repo.transaction()
+    restored = skipped = read = 0
+    with loading as conn:
+        for rows in chain([first], blocks):
+            rows = list(checked_dates(rows, 1))
+            read += len(rows)
+            if on_conflict == "replace":
+                conn.executemany(SQL_RESTORE_ENTRY, rows)
+                restored += len(rows)
+            else:
+                taken = repo.existing_ids(row[0] for row in rows)
+                conn.executemany(SQL_RESTORE_ENTRY, (row for row in rows if row[0] not in taken))
+                clashing = [row[1:] for row in rows if row[0] in taken]
+                if on_conflict == "renumber":
+                    conn.executemany(SQL_INSERT_ENTRY, clashing)
+                    restored += len(rows)
+                else:
+                    restored += len(rows) - len(clashing)
+                    skipped += len(clashing)
+            if progress is not None:
+                progress(read)
+    return RestoreResult(restored, skipped)
@@ -1,31 +1,84 @@
 from PySide6.QtWidgets import (
     QWidget, QVBoxLayout, QLabel, QPushButton, QComboBox, QDateEdit,
-    QDoubleSpinBox, QTableWidget, QTableWidgetItem, QLineEdit, QHBoxLayout, 
-    QFileDialog, QMessageBox, 
+    QDoubleSpinBox, QTableView, QLineEdit, QHBoxLayout, 
+    QFileDialog, QMessageBox, QProgressDialog, QInputDialog,
+    QCheckBox, QDialog, QDialogButtonBox,
 )
-from PySide6.QtGui import QIcon
-from PySide6.QtCore import Qt, QDate
-from .database import add_entry, fetch_entries, get_summary, delete_entry, update_entry, reset_all_entries
-import csv
-from .excel_exporter import export_to_excel
+from PySide6.QtGui import QAction, QIcon, QKeySequence, QUndoStack
+from PySide6.QtCore import Qt, QDate, QTimer
+from . import analytics
+from .bulk_commands import DeleteEntriesCommand, SetRecordedCommand, SetTypeCommand, ToggleRecordedCommand
+from .database import EntryFilter, Repository, get_repository
+from .entry_model import EntryTableModel
+from .csv_exporter import COLUMNS as CSV_COLUMNS, DEFAULT_COLUMNS as DEFAULT_CSV_COLUMNS, export_to_csv
+from .importer import import_csv
+from .instrumentation import instrumented
+from .jobs import JobScheduler
+from .save_queue import EDITABLE_COLUMNS, SaveQueue
+from .snapshot import SNAPSHOT_SUFFIX, restore_snapshot, write_snapshot
+from functools import partial
 from pathlib import Path
+import sqlite3
 
+# Longest an edit waits in the save queue before it is written
+SAVE_INTERVAL_MS = 500
+# Tooltip on the controls a window on an entry service can't offer
+REMOTE_UNSUPPORTED = "Not supported in remote mode"
 
 
 class TimeTrackerUI(QWidget):
-    def __init__(self):
+    """
+    The main window, on backend (default: the local database). Given any
+    other StorageBackend, i.e. an entry service's RemoteBackend, it runs
+    in remote mode: edits are saved as they are made, deletes can't be
+    undone, and bulk changes, undo/redo and the Export/Import jobs, which
+    need the database file, are disabled.
+    """
+
+    def __init__(self, backend=None):
         super().__init__()
-        self.setWindowTitle("Hour Tracker")
+        self.repo = backend or get_repository()
+        self.remote = not isinstance(self.repo, Repository)
+        self.setWindowTitle(f"Hour Tracker - {self.repo.url}" if self.remote else "Hour Tracker")
         self.setMinimumSize(700, 500)
         self.categories = ["Event Cover", "Community Outreach", "Unit Running", "Other"]
         icon_path = Path(__file__).parent.parent.parent / "icons" / "icon.ico"
         icon = QIcon(str(icon_path.resolve()))
         self.setWindowIcon(icon)
 
+        self.jobs = JobScheduler(self)
         self.editing_id = None  # Keep track of whether we're editing
+        self.diagnostics = None  # Created the first time it is opened
+        self.csv_columns = DEFAULT_CSV_COLUMNS  # Columns picked for the last CSV export
+        self.entry_filter = EntryFilter()  # What the table and exports show
+        self.undo_stack = QUndoStack(self)
+        self.writing_jobs = 0  # Running or queued jobs that write; see run_job
+
+        # Checkbox and note edits are written behind, a batch at a time;
+        # anything a previous session left in the journal is applied first.
+        # An entry service commits each edit as it comes, so there the
+        # edits go straight to it instead.
+        if self.remote:
+            from .entry_service import ServiceError
+            self.save_queue = None
+            self.write_errors = (ServiceError, OSError)
+        else:
+            self.save_queue = SaveQueue(self.repo)
+            self.save_queue.recover()
+            self.write_errors = (sqlite3.Error,)
+        self.save_timer = QTimer(self)
+        self.save_timer.setSingleShot(True)
+        self.save_timer.setInterval(SAVE_INTERVAL_MS)
+        self.save_timer.timeout.connect(self.save_pending_edits)
 
 
         self.init_ui()
+        if self.remote:
+            self.export_import_btn.setEnabled(False)
+            for widget in (self.export_import_btn, self.mark_recorded_btn, self.mark_unrecorded_btn,
+                           self.set_type_btn, self.undo_btn, self.redo_btn):
+                widget.setToolTip(REMOTE_UNSUPPORTED)
+            self.update_write_actions()
         self.refresh_table()
 
     def init_ui(self):
@@ -78,19 +131,93 @@ class TimeTrackerUI(QWidget):
         row3_layout.addWidget(self.note_input)
         row3_layout.addWidget(self.submit_btn)
 
-        # --- Table (Row 4)
-        self.table = QTableWidget(0, 8)
-        self.table.setHorizontalHeaderLabels(["Date", "Name", "Type", "Hours", "Travel", "Total", "Recorded", "Notes"])
-        self.table.itemChanged.connect(self.handle_recorded_change)
+        # --- Filter bar
+        filter_layout = QHBoxLayout()
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("Search notes and names")
+        self.search_input.setClearButtonEnabled(True)
+        self.filter_type = QComboBox()
+        self.filter_type.addItem("All types")
+        self.filter_type.addItems(self.categories)
+        self.filter_name = QLineEdit()
+        self.filter_name.setPlaceholderText("Name")
+        self.filter_recorded = QComboBox()
+        self.filter_recorded.addItems(["Recorded or not", "Recorded", "Unrecorded"])
+        self.filter_from = self._filter_date_edit()
+        self.filter_to = self._filter_date_edit()
+        self.clear_filter_btn = QPushButton("Clear")
+        self.clear_filter_btn.clicked.connect(self.clear_filter)
+        filter_layout.addWidget(QLabel("Filter:"))
+        filter_layout.addWidget(self.search_input, stretch=2)
+        filter_layout.addWidget(self.filter_type)
+        filter_layout.addWidget(self.filter_name, stretch=1)
+        filter_layout.addWidget(self.filter_recorded)
+        filter_layout.addWidget(QLabel("From:"))
+        filter_layout.addWidget(self.filter_from)
+        filter_layout.addWidget(QLabel("To:"))
+        filter_layout.addWidget(self.filter_to)
+        filter_layout.addWidget(self.clear_filter_btn)
+
+        # Typing restarts the timer, so the query runs once the user pauses
+        self.filter_timer = QTimer(self)
+        self.filter_timer.setSingleShot(True)
+        self.filter_timer.setInterval(250)
+        self.filter_timer.timeout.connect(self.apply_filter)
+        self.search_input.textChanged.connect(self.filter_timer.start)
+        self.filter_name.textChanged.connect(self.filter_timer.start)
+        self.filter_type.currentIndexChanged.connect(self.apply_filter)
+        self.filter_recorded.currentIndexChanged.connect(self.apply_filter)
+        self.filter_from.dateChanged.connect(self.apply_filter)
+        self.filter_to.dateChanged.connect(self.apply_filter)
 
-        # --- Row 5: Delete, Edit
+        # --- Table (Row 4)
+        self.model = EntryTableModel(self.repo.fetch_entries_page, parent=self)
+        self.model.recordedToggled.connect(self.handle_recorded_change)
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.table.setSelectionBehavior(QTableView.SelectRows)
+        self.table.setSelectionMode(QTableView.ExtendedSelection)
+
+        # --- Row 5: Delete, Edit, bulk changes to the selection, Undo/Redo
         row5_layout = QHBoxLayout()
         self.delete_btn = QPushButton("Delete Selected")
         self.edit_btn = QPushButton("Edit Selected")
+        self.mark_recorded_btn = QPushButton("Mark Recorded")
+        self.mark_unrecorded_btn = QPushButton("Mark Unrecorded")
+        self.set_type_btn = QPushButton("Set Type...")
+        self.undo_btn = QPushButton("Undo")
+        self.redo_btn = QPushButton("Redo")
         self.delete_btn.clicked.connect(self.handle_delete)
         self.edit_btn.clicked.connect(self.handle_edit)
-        row5_layout.addWidget(self.delete_btn)
-        row5_layout.addWidget(self.edit_btn)
+        self.mark_recorded_btn.clicked.connect(lambda: self.mark_selected_recorded(True))
+        self.mark_unrecorded_btn.clicked.connect(lambda: self.mark_selected_recorded(False))
+        self.set_type_btn.clicked.connect(self.set_selected_type)
+        self.undo_btn.clicked.connect(self.undo_stack.undo)
+        self.redo_btn.clicked.connect(self.undo_stack.redo)
+        self.undo_btn.setEnabled(False)
+        self.redo_btn.setEnabled(False)
+        self.undo_stack.canUndoChanged.connect(self.update_write_actions)
+        self.undo_stack.canRedoChanged.connect(self.update_write_actions)
+        for button in (self.delete_btn, self.edit_btn, self.mark_recorded_btn, self.mark_unrecorded_btn,
+                       self.set_type_btn, self.undo_btn, self.redo_btn):
+            row5_layout.addWidget(button)
+
+        # Ctrl+Z / Ctrl+Shift+Z (or the platform's equivalents) anywhere in
+        # the window; they click the buttons, which do nothing while disabled
+        undo_action = QAction("Undo", self)
+        undo_action.setShortcut(QKeySequence.Undo)
+        undo_action.triggered.connect(self.undo_btn.click)
+        redo_action = QAction("Redo", self)
+        redo_action.setShortcut(QKeySequence.Redo)
+        redo_action.triggered.connect(self.redo_btn.click)
+        self.addAction(undo_action)
+        self.addAction(redo_action)
+
+        # F12 shows or hides the timing diagnostics panel
+        diagnostics_action = QAction("Diagnostics", self)
+        diagnostics_action.setShortcut(QKeySequence(Qt.Key_F12))
+        diagnostics_action.triggered.connect(self.toggle_diagnostics)
+        self.addAction(diagnostics_action)
 
         # --- Summary (Totals)
         self.summary_left = QLabel()
@@ -104,23 +231,31 @@ class TimeTrackerUI(QWidget):
         layout.addLayout(row1_layout)
         layout.addLayout(row2_layout)
         layout.addLayout(row3_layout)
+        layout.addLayout(filter_layout)
         layout.addWidget(self.table)
         layout.addLayout(row5_layout)
         layout.addLayout(summary_layout)
         self.setLayout(layout)
     def handle_export_import(self):
         # Dialog to choose Export or Import
-        from PySide6.QtWidgets import QInputDialog
-        choice, ok = QInputDialog.getText(self, "Export/Import", "Type 'export' to export or 'import' to import:")
+        choice, ok = QInputDialog.getText(
+            self, "Export/Import", "Type 'export' to export to Excel, 'csv' to export CSV/TSV, 'import' to import,\n"
+                                   "'backup' to save a backup or 'restore' to load one:")
         if not ok:
             return
         choice = choice.strip().lower()
         if choice == "export":
             self.export_excel()
+        elif choice == "csv":
+            self.export_data()
         elif choice == "import":
             self.import_data()
+        elif choice == "backup":
+            self.backup_data()
+        elif choice == "restore":
+            self.restore_data()
         else:
-            QMessageBox.warning(self, "Invalid Choice", "Please type 'export' or 'import'.")
+            QMessageBox.warning(self, "Invalid Choice", "Please type 'export', 'csv', 'import', 'backup' or 'restore'.")
 
     def handle_submit(self):
         date = self.date_input.date().toString("yyyy-MM-dd")
@@ -133,218 +268,461 @@ class TimeTrackerUI(QWidget):
         notes = self.note_input.text()
         if hours == 0 and travel == 0:
             return
+        self.flush_edits()
         recorded = False  # New entries default to unrecorded
-        if self.editing_id:
-            # If editing, get the current state of the Recorded checkbox from the table
-            row = None
-            for i, entry in enumerate(self.entries):
-                if entry[0] == self.editing_id:
-                    row = i
-                    break
-            if row is not None:
-                recorded_item = self.table.item(row, 6)
-                if recorded_item is not None:
-                    recorded = recorded_item.checkState() == Qt.Checked
+        try:
+            if self.editing_id:
+                # If editing, keep the current state of the Recorded checkbox
+                entry_id = self.editing_id
+                old_entry = self.repo.fetch_entry(entry_id)
+                if old_entry is not None:
+                    recorded = old_entry[6]
+                self.repo.update_entry(entry_id, date, name, type_, hours, travel, recorded, notes)
             else:
-                # fallback to old entry value
-                old_entry = next((e for e in self.entries if e[0] == self.editing_id), None)
-                recorded = old_entry[6] if old_entry else False
-            update_entry(self.editing_id, date, name, type_, hours, travel, recorded, notes)
+                entry_id = self.repo.add_entry(date, name, type_, hours, travel, recorded, notes)
+        except self.write_errors as e:
+            # The form keeps its values, so it can be submitted again
+            QMessageBox.warning(self, "Save Failed", f"Could not save the entry:\n{e}")
+            return
+        if self.editing_id:
             self.submit_btn.setText("Add Entry")
             self.editing_id = None
-        else:
-            add_entry(date, name, type_, hours, travel, recorded, notes)
+        self.sync_entries([entry_id])
         self.custom_tag.clear()
         self.note_input.clear()
         self.name_input.clear()
-        self.refresh_table()
         self.hours_input.setValue(0)
         self.travel_input.setValue(0)
 
     def handle_edit(self):
-        selected = self.table.currentRow()
+        selected = self.table.currentIndex().row()
         if selected < 0:
             return
 
-        entry = self.entries[selected]
-        self.editing_id = entry[0]  # Save ID
+        entry = self.model.entry_at(selected)
+        self.editing_id = entry.id  # Save ID
 
         # Populate form
-        self.date_input.setDate(QDate.fromString(entry[1], "yyyy-MM-dd"))
+        self.date_input.setDate(QDate.fromString(entry.date, "yyyy-MM-dd"))
         if hasattr(self, "name_input"):
-            self.name_input.setText(entry[2])
-        if entry[3] in self.categories:
-            self.type_input.setCurrentText(entry[3])
+            self.name_input.setText(entry.name)
+        if entry.type in self.categories:
+            self.type_input.setCurrentText(entry.type)
             self.custom_tag.clear()
         else:
             self.type_input.setCurrentText("Other")
-            self.custom_tag.setText(entry[3])
+            self.custom_tag.setText(entry.type)
 
-        self.hours_input.setValue(entry[4])
-        self.travel_input.setValue(entry[5])
+        self.hours_input.setValue(entry.hours)
+        self.travel_input.setValue(entry.travel)
         self.submit_btn.setText("Update Entry")
     
+    def selected_entries(self):
+        """The selected rows' entries, fresh from the database."""
+        self.flush_edits()
+        rows = self.table.selectionModel().selectedRows()
+        return self.repo.fetch_entries_by_id([self.model.entry_at(index.row()).id for index in rows])
+
     def handle_delete(self):
-        selected = self.table.currentRow()
-        if selected < 0:
+        if self.remote:
+            self.delete_selected_remote()
+            return
+        entries = self.selected_entries()
+        if not entries:
             return  # Nothing selected
+        self.undo_stack.push(DeleteEntriesCommand(self, entries))
 
-        entry_id = self.entries[selected][0]
-        delete_entry(entry_id)
-        self.refresh_table()
+    def delete_selected_remote(self):
+        # Undo isn't supported in remote mode, so ask first
+        entry_ids = [self.model.entry_at(index.row()).id for index in self.table.selectionModel().selectedRows()]
+        if not entry_ids:
+            return
+        confirm = QMessageBox.question(
+            self,
+            "Confirm Delete",
+            f"Delete {len(entry_ids)} selected entries? This can't be undone in remote mode.",
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+        )
+        if confirm != QMessageBox.StandardButton.Yes:
+            return
+        try:
+            self.repo.delete_entries(entry_ids)
+        except self.write_errors as e:
+            QMessageBox.warning(self, "Delete Failed", f"Could not delete the entries:\n{e}")
+            return
+        self.sync_entries(entry_ids)
+
+    def mark_selected_recorded(self, recorded):
+        entries = [entry for entry in self.selected_entries() if entry[6] != recorded]
+        if entries:
+            self.undo_stack.push(SetRecordedCommand(self, entries, recorded))
+
+    def set_selected_type(self):
+        entries = self.selected_entries()
+        if not entries:
+            return
+        types = list(dict.fromkeys(self.categories + [type_ for type_, _, _ in self.repo.get_summary()[0]]))
+        type_, ok = QInputDialog.getItem(
+            self, "Set Type", f"Type for {len(entries)} selected entries:", types, 0, True)
+        type_ = type_.strip()
+        if ok and type_:
+            self.undo_stack.push(SetTypeCommand(self, entries, type_))
+
+    def sync_entries(self, entry_ids):
+        """
+        Bring the table up to date after entry_ids were saved or deleted:
+        one model update for all of them, then the summary.
+        """
+        self.flush_edits()
+        entries = self.repo.fetch_entries_by_id(entry_ids, self.entry_filter or None)
+        shown = {entry[0] for entry in entries}
+        self.model.remove_entries([entry_id for entry_id in entry_ids if entry_id not in shown])
+        self.model.update_entries(entries)
+        self.refresh_summary()
+
+    def _filter_date_edit(self):
+        # The minimum date stands for "no bound" and is shown as "Any"
+        edit = QDateEdit()
+        edit.setCalendarPopup(True)
+        edit.setMinimumDate(QDate(1900, 1, 1))
+        edit.setSpecialValueText("Any")
+        edit.setDate(edit.minimumDate())
+        return edit
+
+    def current_filter(self):
+        def bound(edit):
+            return None if edit.date() == edit.minimumDate() else edit.date().toString("yyyy-MM-dd")
+
+        recorded = {1: True, 2: False}.get(self.filter_recorded.currentIndex())
+        return EntryFilter(
+            text=self.search_input.text(),
+            type_=self.filter_type.currentText() if self.filter_type.currentIndex() > 0 else None,
+            name=self.filter_name.text().strip(),
+            recorded=recorded,
+            date_from=bound(self.filter_from),
+            date_to=bound(self.filter_to),
+        )
 
+    def apply_filter(self):
+        self.filter_timer.stop()
+        entry_filter = self.current_filter()
+        if entry_filter == self.entry_filter:
+            return
+        self.entry_filter = entry_filter
+        self.model.set_fetch_page(partial(self.repo.fetch_entries_page, entry_filter=entry_filter))
+
+    def clear_filter(self):
+        for widget in (self.search_input, self.filter_name, self.filter_type, self.filter_recorded,
+                       self.filter_from, self.filter_to):
+            widget.blockSignals(True)
+        self.search_input.clear()
+        self.filter_name.clear()
+        self.filter_type.setCurrentIndex(0)
+        self.filter_recorded.setCurrentIndex(0)
+        self.filter_from.setDate(self.filter_from.minimumDate())
+        self.filter_to.setDate(self.filter_to.minimumDate())
+        for widget in (self.search_input, self.filter_name, self.filter_type, self.filter_recorded,
+                       self.filter_from, self.filter_to):
+            widget.blockSignals(False)
+        self.apply_filter()
+
+    @instrumented("ui.refresh_table", rows=lambda _, window: window.model.rowCount())
     def refresh_table(self):
-        self.table.blockSignals(True)
-        self.table.setRowCount(0)
-        self.entries = fetch_entries()
-        for row_idx, entry in enumerate(self.entries):
-            # entry: (id, date, name, type, hours, travel, recorded, notes)
-            if len(entry) == 8:
-                id_, date, name, type_, hours, travel, recorded, notes = entry
-            else:
-                # fallback for old entries
-                id_, date, type_, hours, travel = entry
-                name = ""
-                recorded = False
-                notes = ""
-
-            self.table.insertRow(row_idx)
-            total = hours + travel
-            for col_idx, value in enumerate([date, name, type_, f"{hours:.2f}", f"{travel:.2f}", f"{total:.2f}"]):
-                self.table.setItem(row_idx, col_idx, QTableWidgetItem(str(value)))
-
-            # Recorded checkbox
-            item = QTableWidgetItem()
-            item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
-            item.setCheckState(Qt.Checked if recorded else Qt.Unchecked)
-            self.table.setItem(row_idx, 6, item)
-
-            # Notes column
-            self.table.setItem(row_idx, 7, QTableWidgetItem(notes or ""))
-
-        self.table.blockSignals(False)
+        # Full reload, used at startup and after bulk changes like import/reset.
+        # Only the first page is fetched; the view pulls more as it scrolls.
+        self.flush_edits()
+        self.model.reload()
         self.refresh_summary()
+
     def handle_edit_note(self):
-        selected = self.table.currentRow()
+        selected = self.table.currentIndex().row()
         if selected < 0:
             return
-        entry = self.entries[selected]
-        note, ok = QMessageBox.getText(self, "Edit Note", "Enter note:", text=entry[7] if len(entry) == 8 else "")
+        entry = self.model.entry_at(selected).as_tuple()
+        note, ok = QInputDialog.getText(self, "Edit Note", "Enter note:", text=entry[7])
         if ok:
             # Update note in database
-            if len(entry) == 8:
-                update_entry(entry[0], entry[1], entry[2], entry[3], entry[4], entry[5], entry[6], note)
-            else:
-                # fallback for old entries
-                update_entry(entry[0], entry[1], "", entry[2], entry[3], entry[4], False, note)
-            self.refresh_table()
+            self.queue_edit(entry[0], notes=note)
+            self.model.update_entry(entry[:7] + (note,))
 
+    @instrumented("ui.refresh_summary")
     def refresh_summary(self):
-        summary, totals = get_summary()
+        if self.remote:
+            summary, totals, recorded_totals, year, month = self.repo.overview()
+        else:
+            summary, totals, recorded_totals, year, month = analytics.overview(self.repo)
         # Category totals (right column)
         cat_lines = ["<b>Category Totals:</b>"]
         for type_, h, t in summary:
-            cat_lines.append(f"{type_}: {h or 0:.2f} hrs + {t or 0:.2f} travel")
+            cat_lines.append(f"{type_}: {h:.2f} hrs + {t:.2f} travel")
         self.summary_right.setText("<br>".join(cat_lines))
 
+        # Offer custom tags in the type filter once entries use them
+        known = {self.filter_type.itemText(i) for i in range(self.filter_type.count())}
+        for type_, _, _ in summary:
+            if type_ not in known:
+                self.filter_type.addItem(type_)
+
         # Overall/recorded/unrecorded totals (left column)
         left_lines = []
-        recorded_hours = recorded_travel = unrec_hours = unrec_travel = 0.0
-        for entry in self.entries:
-            if len(entry) == 5:
-                # old format: id, date, type, hours, travel
-                _, _, _, h, t = entry
-                rec = False
-            elif len(entry) == 8:
-                # new format: id, date, name, type, hours, travel, recorded, notes
-                _, _, _, _, h, t, rec, _ = entry
-            else:
-                # fallback: try to get hours/travel/recorded
-                h = entry[4] if len(entry) > 4 else 0
-                t = entry[5] if len(entry) > 5 else 0
-                rec = entry[6] if len(entry) > 6 else False
-            if rec:
-                recorded_hours += h
-                recorded_travel += t
-            else:
-                unrec_hours += h
-                unrec_travel += t
+        recorded_hours, recorded_travel = recorded_totals[True]
+        unrec_hours, unrec_travel = recorded_totals[False]
 
         left_lines.append(f"<b>Recorded:</b> {recorded_hours:.2f} hrs + {recorded_travel:.2f} travel")
         left_lines.append(f"<b>Unrecorded:</b> {unrec_hours:.2f} hrs + {unrec_travel:.2f} travel")
 
-        if totals:
-            total_hours = totals[0] if totals[0] is not None else 0
-            total_travel = totals[1] if totals[1] is not None else 0
-            overall = total_hours + total_travel
-
-            left_lines.append(f"<b>Overall (excluding travel):</b> {total_hours:.2f} hrs")
-            left_lines.append(f"<b>Total (including travel):</b> {overall:.2f} hrs")
+        total_hours, total_travel = totals
+        overall = total_hours + total_travel
+        left_lines.append(f"<b>Overall (excluding travel):</b> {total_hours:.2f} hrs")
+        left_lines.append(f"<b>Total (including travel):</b> {overall:.2f} hrs")
+        left_lines.append(f"<b>Year to date ({year.key}):</b> {year.total:.2f} hrs")
+        left_lines.append(f"<b>This month:</b> {month.total:.2f} hrs")
 
         self.summary_left.setText("<br>".join(left_lines))
 
-    def handle_recorded_change(self, item):
-        # Only handle changes in the Recorded column (column 6)
-        if item.column() != 6:
-            return
-        row = item.row()
-        entry = self.entries[row]
-        recorded = item.checkState() == Qt.Checked
-        # Update entry in database, preserving all other fields
-        if len(entry) == 8:
-            id_, date, name, type_, hours, travel, _, notes = entry
-            update_entry(id_, date, name, type_, hours, travel, recorded, notes)
-        elif len(entry) == 5:
-            id_, date, type_, hours, travel = entry
-            update_entry(id_, date, '', type_, hours, travel, recorded, '')
+    def toggle_diagnostics(self):
+        if self.diagnostics is None:
+            from .diagnostics import DiagnosticsPanel
+            self.diagnostics = DiagnosticsPanel(None if self.remote else self.repo, self)
+        self.diagnostics.setVisible(not self.diagnostics.isVisible())
+
+    def handle_recorded_change(self, entry_id, recorded):
+        # The model has already updated its row, so pushing (which runs the
+        # command) only has to queue the write
+        if self.remote:
+            self.queue_recorded(entry_id, recorded)
         else:
-            # fallback for any other format
-            id_ = entry[0]
-            date = entry[1] if len(entry) > 1 else ''
-            name = entry[2] if len(entry) > 2 else ''
-            type_ = entry[3] if len(entry) > 3 else ''
-            hours = entry[4] if len(entry) > 4 else 0
-            travel = entry[5] if len(entry) > 5 else 0
-            notes = entry[7] if len(entry) > 7 else ''
-            update_entry(id_, date, name, type_, hours, travel, recorded, notes)
-        self.refresh_table()
-        
+            self.undo_stack.push(ToggleRecordedCommand(self, entry_id, recorded))
+
+    def queue_recorded(self, entry_id, recorded):
+        self.model.set_recorded(entry_id, recorded)
+        self.queue_edit(entry_id, recorded=int(recorded))
+
+    def queue_edit(self, entry_id, **columns):
+        """Queue a column-level edit; it is saved within SAVE_INTERVAL_MS, or right away in remote mode."""
+        if self.save_queue is None:
+            self.save_remote_edit(entry_id, columns)
+            return
+        self.save_queue.set(entry_id, **columns)
+        if not self.save_timer.isActive():
+            self.save_timer.start()
+
+    def save_remote_edit(self, entry_id, columns):
+        try:
+            if columns.keys() == {"recorded"}:
+                self.repo.set_recorded(entry_id, columns["recorded"])
+            else:
+                entry = self.repo.fetch_entry(entry_id)
+                if entry is None:
+                    return  # deleted by someone else meanwhile
+                values = dict(zip(EDITABLE_COLUMNS, entry[1:]), **columns)
+                self.repo.update_entry(entry_id, *(values[column] for column in EDITABLE_COLUMNS))
+        except self.write_errors as e:
+            QMessageBox.warning(self, "Save Failed", f"Could not save the change:\n{e}")
+            return
+        self.refresh_summary()
+
+    def flush_edits(self):
+        """Save queued edits now, before anything reads or rewrites the same rows."""
+        self.save_timer.stop()
+        if self.save_queue is None:
+            return  # remote mode saves each edit as it is made
+        if self.writing_jobs:
+            # The job holds the write lock; the edits stay queued and
+            # journalled until it is done
+            self.save_timer.start()
+            return
+        if self.save_queue.flush():
+            self.refresh_summary()
+
+    def save_pending_edits(self):
+        try:
+            self.flush_edits()
+        except sqlite3.Error as e:
+            # The edits stay queued and journalled; try again shortly
+            self.save_timer.start()
+            QMessageBox.warning(self, "Save Failed", f"Could not save changes yet:\n{e}")
+
+    def update_write_actions(self):
+        """
+        Enable the controls that write to the database unless a writing job
+        is queued or running. Such a job holds SQLite's write lock, so a
+        write from the GUI thread would block for the busy timeout and then
+        fail. Bulk changes and undo/redo stay disabled in remote mode.
+        """
+        enabled = not self.writing_jobs
+        for widget in (self.submit_btn, self.reset_btn, self.delete_btn):
+            widget.setEnabled(enabled)
+        bulk = enabled and not self.remote
+        for widget in (self.mark_recorded_btn, self.mark_unrecorded_btn, self.set_type_btn):
+            widget.setEnabled(bulk)
+        self.undo_btn.setEnabled(bulk and self.undo_stack.canUndo())
+        self.redo_btn.setEnabled(bulk and self.undo_stack.canRedo())
+
+    def run_job(self, title, func, on_finished, writes=False):
+        """
+        Run func(report) on the background job queue. A non-modal progress
+        dialog follows the job and its Cancel button cancels it; on_finished
+        is called on the GUI thread with the result. Pass writes=True for a
+        job that writes to the database, to hold GUI writes off until it ends.
+        """
+        # Jobs read and write through their own connection
+        self.flush_edits()
+        if writes:
+            self.writing_jobs += 1
+            self.update_write_actions()
+        dialog = QProgressDialog(f"{title}...", "Cancel", 0, 0, self)
+        dialog.setWindowTitle(title)
+        dialog.setWindowModality(Qt.NonModal)
+        dialog.setMinimumDuration(500)
+        job = self.jobs.submit(title, func)
+        dialog.canceled.connect(job.cancel)
+
+        def on_progress(done, total):
+            if total:
+                dialog.setMaximum(total)
+                dialog.setValue(min(done, total))
+
+        def ended():
+            dialog.close()
+            if writes:
+                self.writing_jobs -= 1
+                self.update_write_actions()
+
+        def done(result):
+            ended()
+            on_finished(result)
+
+        def failed(message, _traceback):
+            ended()
+            QMessageBox.critical(self, "Error", f"{title} failed:\n{message}")
+
+        def cancelled():
+            ended()
+            QMessageBox.information(self, title, f"{title} cancelled.")
+
+        job.signals.progress.connect(on_progress)
+        job.signals.finished.connect(done)
+        job.signals.failed.connect(failed)
+        job.signals.cancelled.connect(cancelled)
+        return job
+
+    def choose_csv_columns(self):
+        """Ask which columns to export; returns them in CSV_COLUMNS order, or None if cancelled."""
+        dialog = QDialog(self)
+        dialog.setWindowTitle("Export Columns")
+        layout = QVBoxLayout(dialog)
+        checks = {}
+        for column, (header, _) in CSV_COLUMNS.items():
+            checks[column] = QCheckBox(header)
+            checks[column].setChecked(column in self.csv_columns)
+            layout.addWidget(checks[column])
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        buttons.accepted.connect(dialog.accept)
+        buttons.rejected.connect(dialog.reject)
+        layout.addWidget(buttons)
+        if dialog.exec() != QDialog.Accepted:
+            return None
+        return tuple(column for column, check in checks.items() if check.isChecked()) or None
+
     def export_data(self):
-        path, _ = QFileDialog.getSaveFileName(self, "Export to CSV", "hours.csv", "CSV Files (*.csv)")
+        # The extension picks the format: .tsv for tabs, .gz for gzip
+        path, _ = QFileDialog.getSaveFileName(
+            self, "Export to CSV", "hours.csv",
+            "CSV Files (*.csv);;TSV Files (*.tsv);;Compressed CSV (*.csv.gz);;Compressed TSV (*.tsv.gz)")
         if not path:
             return
-        try:
-            with open(path, "w", newline="", encoding="utf-8") as file:
-                writer = csv.writer(file)
-                writer.writerow(["Date", "Type", "Hours", "Travel", "Recorded"])
-                for entry in self.entries:
-                    # skip the ID, add recorded as 1/0
-                    row = list(entry[1:5]) + [1 if len(entry) > 5 and entry[5] else 0]
-                    writer.writerow(row)
-            QMessageBox.information(self, "Export Complete", f"Data exported to:\n{path}")
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Could not export:\n{e}")
+        columns = self.choose_csv_columns()
+        if not columns:
+            return
+        self.csv_columns = columns
+        entry_filter = self.entry_filter
+
+        def work(report):
+            total = self.repo.count_entries(entry_filter)
+            export_to_csv(path, self.repo.iter_entries(entry_filter=entry_filter),
+                          progress=lambda written: report(written, total), columns=columns)
+
+        self.run_job("Export CSV", work, lambda _: QMessageBox.information(
+            self, "Export Complete", f"Data exported to:\n{path}"))
 
     def import_data(self):
         path, _ = QFileDialog.getOpenFileName(self, "Import CSV", "", "CSV Files (*.csv)")
         if not path:
             return
-        try:
-            with open(path, newline="", encoding="utf-8") as file:
-                reader = csv.reader(file)
-                next(reader)  # Skip header
-                for row in reader:
-                    if len(row) < 4:
-                        continue
-                    date, type_, hours, travel = row[:4]
-                    recorded = False
-                    if len(row) > 4:
-                        recorded = bool(int(row[4]))
-                    add_entry(date, type_, float(hours), float(travel), recorded)
+
+        def work(report):
+            # Progress comes in bytes; scale it so large files fit a Qt int
+            return import_csv(path, self.repo, progress=lambda done, total: report(
+                done * 1000 // total if total else 1000, 1000))
+
+        def finished(result):
             self.refresh_table()
-            QMessageBox.information(self, "Import Complete", f"Data loaded from:\n{path}")
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Could not import:\n{e}")
+            message = f"Imported {result.imported} entries from:\n{path}"
+            if result.problems:
+                message += f"\n\nSkipped {len(result.problems)} invalid rows:"
+                message += "".join(f"\nline {p.line}: {p.message}" for p in result.problems[:10])
+                if len(result.problems) > 10:
+                    message += f"\n... and {len(result.problems) - 10} more"
+            QMessageBox.information(self, "Import Complete", message)
+
+        self.run_job("Import CSV", work, finished, writes=True)
+
+    def backup_data(self):
+        # A .db file is a full copy made with SQLite's backup API; a snapshot
+        # holds just the entries, for merging into another database
+        path, _ = QFileDialog.getSaveFileName(
+            self, "Save Backup", "hours-backup.db",
+            f"Database Backup (*.db);;Entries Snapshot (*{SNAPSHOT_SUFFIX})")
+        if not path:
+            return
+
+        if path.endswith(SNAPSHOT_SUFFIX):
+            def work(report):
+                total = self.repo.count_entries()
+                write_snapshot(path, self.repo.iter_entries(), progress=lambda written: report(written, total))
+        else:
+            def work(report):
+                self.repo.backup(path, progress=report)
+
+        self.run_job("Backup", work, lambda _: QMessageBox.information(
+            self, "Backup Complete", f"Backup saved to:\n{path}"))
+
+    def restore_data(self):
+        path, _ = QFileDialog.getOpenFileName(
+            self, "Restore Backup", "", f"Backups (*.db *{SNAPSHOT_SUFFIX})")
+        if not path:
+            return
+
+        if path.endswith(SNAPSHOT_SUFFIX):
+            # Snapshot rows are added to what is already here; any whose id
+            # is taken get a new one
+            def work(report):
+                return restore_snapshot(path, self.repo, progress=lambda read: report(read, 0))
+
+            def finished(result):
+                self.undo_stack.clear()
+                self.refresh_table()
+                QMessageBox.information(self, "Restore Complete", f"Added {result.restored} entries from:\n{path}")
+        else:
+            confirm = QMessageBox.question(
+                self,
+                "Confirm Restore",
+                "Restoring a database backup replaces ALL current entries. Continue?",
+                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+            )
+            if confirm != QMessageBox.StandardButton.Yes:
+                return
+
+            def work(report):
+                self.repo.restore_backup(path, progress=report)
+
+            def finished(_):
+                self.undo_stack.clear()
+                self.refresh_table()
+                QMessageBox.information(self, "Restore Complete", f"Database restored from:\n{path}")
+
+        self.run_job("Restore", work, finished, writes=True)
 
     def reset_data(self):
         confirm = QMessageBox.question(
@@ -354,11 +732,38 @@ class TimeTrackerUI(QWidget):
             QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
         )
         if confirm == QMessageBox.StandardButton.Yes:
-            reset_all_entries()
+            self.flush_edits()
+            self.repo.reset_all_entries()
+            self.undo_stack.clear()
             self.refresh_table()
             
     def export_excel(self):
         path, _ = QFileDialog.getSaveFileName(self, "Export Excel", "hours.xlsx", "Excel Files (*.xlsx)")
         if not path:
             return
-        export_to_excel(path, self.entries, parent_widget=self)
+        # openpyxl and its chart modules are slow to import, so they are
+        # loaded on the first export rather than at startup
+        from .excel_exporter import export_to_excel, update_excel_export
+
+        entry_filter = self.entry_filter
+
+        def work(report):
+            total = self.repo.count_entries(entry_filter)
+            progress = lambda written: report(written, total)
+            if entry_filter:
+                export_to_excel(path, self.repo.iter_entries(entry_filter=entry_filter), progress=progress)
+            else:
+                # Unfiltered exports are tracked, so exporting to the same
+                # file again only writes what changed
+                update_excel_export(path, self.repo, progress=progress)
+
+        self.run_job("Export Excel", work, lambda _: QMessageBox.information(
+            self, "Export Complete", f"Excel file saved to:\n{path}"))
+
+    def closeEvent(self, event):
+        # Don't leave a half-finished import or export running past shutdown
+        self.jobs.cancel_all()
+        self.jobs.wait()
+        if self.save_queue is not None:
+            self.save_queue.close()
+        super().closeEvent(event)
@@ -0,0 +1,21 @@
+"""Shared fixtures for the tests in this directory."""
+import sys
+from pathlib import Path
+
+import pytest
+
+# Tests run from a source checkout, so make the package importable
+SRC_DIR = Path(__file__).resolve().parent.parent / "src"
+if str(SRC_DIR) not in sys.path:
+    sys.path.insert(0, str(SRC_DIR))
+
+from hourtracker.database import Repository  # noqa: E402
+
+
+@pytest.fixture
+def repo(tmp_path):
+    """An empty, migrated Repository in a temporary directory."""
+    repository = Repository(tmp_path / "hours.db")
+    repository.init_db()
+    yield repository
+    repository.close()
@@ -0,0 +1,12 @@
+"""Repository behaviour not covered through the other modules."""
+
+
+def test_rebuild_summary_drops_cached_summary(repo):
+    repo.add_entry("2024-03-01", "Alex", "Other", 1.0, 0.0)
+    # Totals gone wrong behind the triggers' back, as check-summary finds,
+    # and a summary cached from them
+    repo.connection().execute("UPDATE summary_totals SET hours = 99")
+    repo.results.clear()
+    assert repo.get_summary()[1] == (99.0, 0.0)
+    repo.rebuild_summary()
+    assert repo.get_summary()[1] == (1.0, 0.0)
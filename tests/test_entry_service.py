@@ -0,0 +1,120 @@
+"""The entry service, exercised against serve_local() on a free localhost port."""
+import asyncio
+import http.client
+import json
+from datetime import date
+from urllib.parse import urlsplit
+
+import pytest
+
+from hourtracker import analytics, entry_service
+from hourtracker.database import EntryFilter
+from hourtracker.entry_service import AsyncEntryClient, RemoteBackend, ServiceError, serve_local
+
+
+@pytest.fixture
+def server(repo):
+    with serve_local(repo) as running:
+        yield running
+
+
+@pytest.fixture
+def client(server):
+    backend = RemoteBackend(server.url)
+    yield backend
+    backend.close()
+
+
+def test_add_and_fetch(client, repo):
+    first = client.add_entry("2024-03-01", "Alex", "Event Cover", 4.5, 1.0, recorded=True, notes="fete")
+    client.add_entries([("2024-03-02", "Sam", "Other", 2.0, 0.0, False, None)])
+
+    assert client.count_entries() == 2
+    entries = client.fetch_entries()
+    assert entries == repo.fetch_entries()
+    assert entries[-1] == (first, "2024-03-01", "Alex", "Event Cover", 4.5, 1.0, True, "fete")
+    assert [entry[2] for entry in client.fetch_entries_page(entry_filter=EntryFilter(name="Sam"))] == ["Sam"]
+
+
+def test_update_and_delete(client, repo):
+    entry_id = client.add_entry("2024-03-01", "Alex", "Other", 1.0, 0.0)
+    client.update_entry(entry_id, "2024-03-05", "Alex", "Other", 7.5, 0.5)
+    assert repo.fetch_entry(entry_id)[1:6] == ("2024-03-05", "Alex", "Other", 7.5, 0.5)
+    client.delete_entry(entry_id)
+    assert client.count_entries() == 0
+
+
+def test_fetch_and_delete_by_id(client, repo, monkeypatch):
+    # Small requests, so the ids are split over several of them
+    monkeypatch.setattr(entry_service, "IDS_PER_REQUEST", 2)
+    ids = [client.add_entry(f"2024-03-0{day}", "Alex" if day % 2 else "Sam", "Other", 1.0, 0.0)
+           for day in range(1, 6)]
+
+    assert client.fetch_entries_by_id(ids) == repo.fetch_entries_by_id(ids)
+    sam = EntryFilter(name="Sam")
+    assert client.fetch_entries_by_id(ids, sam) == repo.fetch_entries_by_id(ids, sam)
+    assert client.fetch_entry(ids[0]) == repo.fetch_entry(ids[0])
+
+    client.delete_entries(ids[:3])
+    assert client.fetch_entry(ids[0]) is None
+    assert [entry[0] for entry in client.fetch_entries_by_id(ids)] == ids[:2:-1]
+
+
+def test_overview(client, repo):
+    client.add_entries([
+        ("2024-01-15", "Alex", "Event Cover", 4.0, 1.0, True, None),
+        ("2024-03-02", "Sam", "Other", 2.0, 0.0, False, None),
+        ("2023-12-31", "Sam", "Other", 1.5, 0.5, False, None),
+    ])
+    today = date(2024, 3, 10)
+    overview = client.overview(today)
+    assert overview == analytics.overview(repo, today)
+    assert overview.year == analytics.Bucket(2024, 6.0, 1.0, 2)
+    assert overview.month.key == "2024-03"
+
+
+def test_summary(client, repo):
+    client.add_entries([
+        ("2024-03-01", "Alex", "Event Cover", 4.0, 1.0, True, None),
+        ("2024-03-02", "Sam", "Event Cover", 2.0, 0.0, False, None),
+        ("2024-03-03", "Sam", "Other", 1.5, 0.5, False, None),
+    ])
+    assert client.get_summary() == repo.get_summary()
+    by_type, totals, recorded = client.get_summary()
+    assert dict((type_, (hours, travel)) for type_, hours, travel in by_type) == {
+        "Event Cover": (6.0, 1.0), "Other": (1.5, 0.5)}
+    assert totals == (7.5, 1.5)
+    assert recorded[True] == (4.0, 1.0)
+
+
+def test_bad_date_is_a_400(server, client):
+    parts = urlsplit(server.url)
+    connection = http.client.HTTPConnection(parts.hostname, parts.port, timeout=10)
+    try:
+        body = json.dumps({"operations": [["add", ["31/02/2024", "Alex", "Other", 1.0, 0.0, False, None]]]})
+        connection.request("POST", "/batch", body, {"Content-Type": "application/json"})
+        response = connection.getresponse()
+        assert response.status == 400
+        assert "error" in json.loads(response.read())
+    finally:
+        connection.close()
+
+    with pytest.raises(ServiceError):
+        client.add_entry("2024-13-01", "Alex", "Other", 1.0, 0.0)
+    assert client.count_entries() == 0
+
+
+def test_async_client(server):
+    async def run():
+        async with AsyncEntryClient(server.url) as client:
+            await asyncio.gather(*(client.add_entry(f"2024-04-{day:02d}", "Alex", "Other", 1.0, 0.0)
+                                   for day in range(1, 11)))
+            first = (await client.fetch_entries())[-1]
+            assert await client.fetch_entry(first[0]) == first
+            await client.delete_entries([first[0]])
+            return await client.count_entries(), await client.overview(date(2024, 4, 30))
+
+    count, overview = asyncio.run(run())
+    assert count == 9
+    assert overview.totals == (9.0, 0.0)
+    assert overview.month == analytics.Bucket("2024-04", 9.0, 0.0, 9)
@@ -0,0 +1,91 @@
+"""Tracked Excel exports brought up to date by update_excel_export()."""
+import pytest
+
+openpyxl = pytest.importorskip("openpyxl")
+
+from hourtracker import excel_exporter  # noqa: E402
+from hourtracker.excel_exporter import export_to_excel, update_excel_export  # noqa: E402
+
+
+@pytest.fixture
+def full_exports(monkeypatch):
+    """Counts the full exports update_excel_export() falls back to."""
+    calls = []
+
+    def counting(*args, **kwargs):
+        calls.append(args[0])
+        return export_to_excel(*args, **kwargs)
+    monkeypatch.setattr(excel_exporter, "export_to_excel", counting)
+    return calls
+
+
+def fill(repo):
+    rows = [(f"2024-{month:02d}-{day:02d}", "Alex", type_, float(day), 0.5, False, None)
+            for month in (1, 2, 3) for day in (3, 17) for type_ in ("Event Cover", "Other")]
+    repo.add_entries(rows)
+    return [entry[0] for entry in repo.fetch_entries()]
+
+
+def sheet_rows(path, title):
+    wb = openpyxl.load_workbook(path, read_only=True)
+    try:
+        return [tuple(row) for row in wb[title].iter_rows(values_only=True)]
+    finally:
+        wb.close()
+
+
+def approx_rows(rows):
+    return [tuple(pytest.approx(value) if isinstance(value, float) else value for value in row) for row in rows]
+
+
+def test_incremental_update_matches_full_export(repo, tmp_path, full_exports):
+    ids = fill(repo)
+    path = tmp_path / "hours.xlsx"
+    update_excel_export(path, repo)
+    assert len(full_exports) == 1
+
+    repo.add_entry("2024-04-02", "Sam", "Unit Running", 3.0, 1.0)
+    repo.update_entry(ids[0], "2024-02-20", "Alex", "Other", 9.25, 0.0)
+    repo.delete_entry(ids[5])
+    repo.set_recorded(ids[7], True)
+    written = update_excel_export(path, repo)
+    assert len(full_exports) == 1  # the update was incremental
+
+    expected = tmp_path / "expected.xlsx"
+    assert written == export_to_excel(expected, repo.iter_entries())
+    hours = sheet_rows(path, "Hours")
+    expected_hours = sheet_rows(expected, "Hours")
+    # Changed rows move to the end, so only the header keeps its place
+    assert hours[0] == expected_hours[0]
+    assert sorted(hours[1:]) == sorted(expected_hours[1:])
+    assert sheet_rows(path, "Summary") == approx_rows(sheet_rows(expected, "Summary"))
+
+    # An update with nothing changed keeps every row
+    assert update_excel_export(path, repo) == written
+    assert sheet_rows(path, "Hours") == hours
+    assert len(full_exports) == 1
+
+
+def test_other_database_forces_full_export(repo, tmp_path, full_exports):
+    fill(repo)
+    path = tmp_path / "hours.xlsx"
+    update_excel_export(path, repo)
+    repo.connection().execute("UPDATE meta SET value = 'another database' WHERE key = 'database_id'")
+    repo.add_entry("2024-04-02", "Sam", "Other", 3.0, 0.0)
+    update_excel_export(path, repo)
+    assert len(full_exports) == 2
+    assert len(sheet_rows(path, "Hours")) == repo.count_entries() + 1
+
+
+def test_generation_behind_export_forces_full_export(repo, tmp_path, full_exports):
+    ids = fill(repo)
+    path = tmp_path / "hours.xlsx"
+    update_excel_export(path, repo)
+    # As after restoring an older copy of the file: the generation goes
+    # back, and the next edit lands at one the export has already seen
+    repo.connection().execute("UPDATE change_generation SET value = 1")
+    repo.update_entry(ids[0], "2024-01-03", "Alex", "Other", 2.0, 0.0)
+    update_excel_export(path, repo)
+    assert len(full_exports) == 2
+    expected = sorted(tuple(excel_exporter.hours_row(entry)) for entry in repo.fetch_entries())
+    assert sorted(sheet_rows(path, "Hours")[1:]) == expected
@@ -0,0 +1,28 @@
+"""The write-behind save queue and its journal."""
+from hourtracker.save_queue import SaveQueue
+
+
+def test_flush_commits_durably_before_emptying_journal(repo, tmp_path):
+    entry_id = repo.add_entry("2024-03-01", "Alex", "Other", 1.0, 0.0)
+    queue = SaveQueue(repo, tmp_path / "edits", fsync=False)
+    queue.set(entry_id, recorded=1, notes="fete")
+    statements = []
+    repo.connection().set_trace_callback(statements.append)
+    try:
+        assert queue.flush() == 1
+    finally:
+        repo.connection().set_trace_callback(None)
+
+    assert "PRAGMA synchronous = FULL" in statements
+    assert statements.index("PRAGMA synchronous = FULL") < statements.index("COMMIT")
+    # Other writes go back to the connection's usual setting (1 is NORMAL)
+    assert repo.connection().execute("PRAGMA synchronous").fetchone()[0] == 1
+    assert repo.fetch_entry(entry_id)[6:] == (True, "fete")
+    assert (tmp_path / "edits").read_text() == ""
+
+
+def test_recover_replays_journal(repo, tmp_path):
+    entry_id = repo.add_entry("2024-03-01", "Alex", "Other", 1.0, 0.0)
+    SaveQueue(repo, tmp_path / "edits", fsync=False).set(entry_id, hours=7.5)
+    assert SaveQueue(repo, tmp_path / "edits", fsync=False).recover() == 1
+    assert repo.fetch_entry(entry_id)[4] == 7.5
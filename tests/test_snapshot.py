@@ -0,0 +1,22 @@
+"""Writing and restoring binary entry snapshots."""
+import pytest
+
+from hourtracker.snapshot import restore_snapshot, write_snapshot
+
+
+def test_round_trip(repo, tmp_path):
+    repo.add_entry("2024-03-01", "Alex", "Other", 1.5, 0.5, recorded=True, notes="fete")
+    path = tmp_path / "entries.htsnap"
+    write_snapshot(path, repo.iter_entries())
+    repo.reset_all_entries()
+    assert restore_snapshot(path, repo).restored == 1
+    assert [entry[1:] for entry in repo.fetch_entries()] == [("2024-03-01", "Alex", "Other", 1.5, 0.5, True, "fete")]
+
+
+def test_bad_date_rolls_back(repo, tmp_path):
+    path = tmp_path / "entries.htsnap"
+    write_snapshot(path, [(1, "2024-03-01", "Alex", "Other", 1.0, 0.0, False, None),
+                          (2, "01/03/2024", "Alex", "Other", 1.0, 0.0, False, None)])
+    with pytest.raises(ValueError):
+        restore_snapshot(path, repo)
+    assert repo.count_entries() == 0
@@ -0,0 +1,45 @@
+"""The main window in remote mode, on an entry service from serve_local()."""
+import os
+
+import pytest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+QtWidgets = pytest.importorskip("PySide6.QtWidgets")
+
+from PySide6.QtCore import Qt  # noqa: E402
+
+from hourtracker.entry_model import RECORDED_COLUMN  # noqa: E402
+from hourtracker.entry_service import RemoteBackend, serve_local  # noqa: E402
+from hourtracker.ui_main import REMOTE_UNSUPPORTED, TimeTrackerUI  # noqa: E402
+
+
+@pytest.fixture
+def window(repo):
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+    with serve_local(repo) as server:
+        backend = RemoteBackend(server.url)
+        ui = TimeTrackerUI(backend)
+        yield ui
+        ui.close()
+        backend.close()
+    app.processEvents()
+
+
+def test_remote_window_writes_through_the_service(window, repo):
+    assert window.remote and window.save_queue is None
+    for button in (window.export_import_btn, window.mark_recorded_btn, window.set_type_btn, window.undo_btn):
+        assert not button.isEnabled()
+        assert button.toolTip() == REMOTE_UNSUPPORTED
+
+    window.hours_input.setValue(2.5)
+    window.name_input.setText("Alex")
+    window.handle_submit()
+    (entry,) = repo.fetch_entries()
+    assert entry[2:5] == ("Alex", window.type_input.currentText(), 2.5)
+    assert window.model.rowCount() == 1
+
+    # Checkbox toggles are saved straight away, without an undo step
+    window.model.setData(window.model.index(0, RECORDED_COLUMN), Qt.Checked, Qt.CheckStateRole)
+    assert repo.fetch_entry(entry[0])[6] is True
+    assert window.undo_stack.count() == 0
+    assert "2.50" in window.summary_left.text()